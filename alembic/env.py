@@ -2,15 +2,21 @@
 from logging.config import fileConfig
 from sqlalchemy import engine_from_config
 from alembic import context
+from app.core.config import settings
 from app.db.base import Base
-import app.db.models.job, app.db.models.task
+import app.db.models  # noqa: F401  registers every model (Job, Task, LaunchTemplate) on Base.metadata
 
 config = context.config
 fileConfig(config.config_file_name)
+# Same database as the app (alembic.ini only carries a placeholder URL)
+config.set_main_option("sqlalchemy.url", settings.DATABASE_URL)
 target_metadata = Base.metadata
 
 def run_migrations_offline():
-    pass
+    # `alembic upgrade head --sql`: emit the DDL instead of running it
+    context.configure(url=config.get_main_option("sqlalchemy.url"), target_metadata=target_metadata, literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
 
 def run_migrations_online():
     connectable = engine_from_config(config.get_section(config.config_ini_section), prefix='sqlalchemy.')
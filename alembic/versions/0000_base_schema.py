@@ -0,0 +1,51 @@
+"""Base schema: jobs and tasks
+
+Revision ID: 0000_base_schema
+Revises:
+Create Date: 2026-10-18
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0000_base_schema"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Tables as first shipped; later revisions add columns and indexes on top
+    op.create_table(
+        "jobs",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("submitter", sa.String(), nullable=True),
+        sa.Column("status", sa.String(), nullable=True),
+        sa.Column("total", sa.Integer(), nullable=True),
+        sa.Column("succeeded", sa.Integer(), nullable=True),
+        sa.Column("failed", sa.Integer(), nullable=True),
+        sa.Column("meta", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+    op.create_table(
+        "tasks",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("job_id", sa.String(), sa.ForeignKey("jobs.id"), nullable=True),
+        sa.Column("index", sa.Integer(), nullable=True),
+        sa.Column("params", sa.JSON(), nullable=True),
+        sa.Column("status", sa.String(), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=True),
+        sa.Column("last_error", sa.String(), nullable=True),
+        sa.Column("cloud_instance_id", sa.String(), nullable=True),
+        sa.Column("idempotency_key", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_tasks_job_id", "tasks", ["job_id"])
+    op.create_index("ix_tasks_idempotency_key", "tasks", ["idempotency_key"])
+
+
+def downgrade():
+    op.drop_index("ix_tasks_idempotency_key", table_name="tasks")
+    op.drop_index("ix_tasks_job_id", table_name="tasks")
+    op.drop_table("tasks")
+    op.drop_table("jobs")
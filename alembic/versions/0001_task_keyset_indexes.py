@@ -0,0 +1,24 @@
+"""Composite task indexes for keyset pagination
+
+Revision ID: 0001_task_keyset_indexes
+Revises: 0000_base_schema
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0001_task_keyset_indexes"
+down_revision = "0000_base_schema"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # (job_id, index): one range scan per page of /jobs/{id}/tasks
+    op.create_index("ix_tasks_job_id_index", "tasks", ["job_id", "index"], unique=True, if_not_exists=True)
+    # (job_id, status, index): same for status-filtered pages
+    op.create_index("ix_tasks_job_id_status_index", "tasks", ["job_id", "status", "index"], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index("ix_tasks_job_id_status_index", table_name="tasks", if_exists=True)
+    op.drop_index("ix_tasks_job_id_index", table_name="tasks", if_exists=True)
@@ -0,0 +1,23 @@
+"""Unique jobs.batch_id for idempotent resubmission
+
+Revision ID: 0002_job_batch_id
+Revises: 0001_task_keyset_indexes
+Create Date: 2026-10-18
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0002_job_batch_id"
+down_revision = "0001_task_keyset_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("jobs", sa.Column("batch_id", sa.String(), nullable=True))
+    op.create_index("ix_jobs_batch_id", "jobs", ["batch_id"], unique=True)
+
+
+def downgrade():
+    op.drop_index("ix_jobs_batch_id", table_name="jobs")
+    op.drop_column("jobs", "batch_id")
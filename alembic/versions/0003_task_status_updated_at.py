@@ -0,0 +1,20 @@
+"""Index for the stuck-task reaper (status, updated_at)
+
+Revision ID: 0003_task_status_updated_at
+Revises: 0002_job_batch_id
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0003_task_status_updated_at"
+down_revision = "0002_job_batch_id"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_tasks_status_updated_at", "tasks", ["status", "updated_at"], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index("ix_tasks_status_updated_at", table_name="tasks", if_exists=True)
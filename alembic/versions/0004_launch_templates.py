@@ -0,0 +1,36 @@
+"""Shared launch templates; tasks keep per-row deltas
+
+Revision ID: 0004_launch_templates
+Revises: 0003_task_status_updated_at
+Create Date: 2026-10-18
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0004_launch_templates"
+down_revision = "0003_task_status_updated_at"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "launch_templates",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("params", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+    )
+    # Existing rows keep full params (template_id NULL); the worker handles both shapes.
+    # Batch mode: SQLite cannot ALTER in a foreign key, so the table is recreated there
+    # (plain ALTER TABLE on Postgres). The FK name is Postgres' default, so databases that
+    # ran the earlier inline-FK version of this migration downgrade the same way.
+    with op.batch_alter_table("tasks") as batch:
+        batch.add_column(sa.Column("template_id", sa.String(), nullable=True))
+        batch.create_foreign_key("tasks_template_id_fkey", "launch_templates", ["template_id"], ["id"])
+
+
+def downgrade():
+    with op.batch_alter_table("tasks") as batch:
+        batch.drop_constraint("tasks_template_id_fkey", type_="foreignkey")
+        batch.drop_column("template_id")
+    op.drop_table("launch_templates")
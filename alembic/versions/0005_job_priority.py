@@ -0,0 +1,24 @@
+"""Job priority (fair-share scheduler) and status index
+
+Revision ID: 0005_job_priority
+Revises: 0004_launch_templates
+Create Date: 2026-10-18
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0005_job_priority"
+down_revision = "0004_launch_templates"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("jobs", sa.Column("priority", sa.String(), nullable=True, server_default="normal"))
+    # The scheduler reads active (PENDING/QUEUED/RUNNING) jobs every tick
+    op.create_index("ix_jobs_status", "jobs", ["status"], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index("ix_jobs_status", table_name="jobs", if_exists=True)
+    op.drop_column("jobs", "priority")
@@ -0,0 +1,26 @@
+"""Provider-side instance state (reconciler)
+
+Revision ID: 0006_task_cloud_state
+Revises: 0005_job_priority
+Create Date: 2026-10-18
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0006_task_cloud_state"
+down_revision = "0005_job_priority"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("tasks", sa.Column("cloud_state", sa.String(), nullable=True))
+    op.add_column("tasks", sa.Column("reconciled_at", sa.DateTime(), nullable=True))
+    # Existing rows stay NULL: only instances launched from now on are reconciled
+    op.create_index("ix_tasks_cloud_state_reconciled_at", "tasks", ["cloud_state", "reconciled_at"], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index("ix_tasks_cloud_state_reconciled_at", table_name="tasks", if_exists=True)
+    op.drop_column("tasks", "reconciled_at")
+    op.drop_column("tasks", "cloud_state")
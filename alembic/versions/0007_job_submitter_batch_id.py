@@ -0,0 +1,25 @@
+"""Scope jobs.batch_id to the submitter
+
+Revision ID: 0007_job_submitter_batch_id
+Revises: 0006_task_cloud_state
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0007_job_submitter_batch_id"
+down_revision = "0006_task_cloud_state"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Jobs created before submitters were recorded belong to unauthenticated callers
+    op.execute("UPDATE jobs SET submitter = 'anonymous' WHERE submitter IS NULL")
+    op.drop_index("ix_jobs_batch_id", table_name="jobs")
+    op.create_index("ix_jobs_submitter_batch_id", "jobs", ["submitter", "batch_id"], unique=True)
+
+
+def downgrade():
+    # Fails if two submitters share a batch_id (the global index cannot hold both)
+    op.drop_index("ix_jobs_submitter_batch_id", table_name="jobs")
+    op.create_index("ix_jobs_batch_id", "jobs", ["batch_id"], unique=True)
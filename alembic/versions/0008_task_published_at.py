@@ -0,0 +1,26 @@
+"""Record when a task was last published to the broker (reaper)
+
+Revision ID: 0008_task_published_at
+Revises: 0007_job_submitter_batch_id
+Create Date: 2026-10-18
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0008_task_published_at"
+down_revision = "0007_job_submitter_batch_id"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("tasks", sa.Column("published_at", sa.DateTime(), nullable=True))
+    # Tasks already handed to the broker must not be republished by the reaper
+    op.execute(
+        "UPDATE tasks SET published_at = COALESCE(updated_at, created_at) "
+        "WHERE status IN ('QUEUED', 'RUNNING', 'RETRYING')"
+    )
+
+
+def downgrade():
+    op.drop_column("tasks", "published_at")
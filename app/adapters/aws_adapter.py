@@ -0,0 +1,124 @@
+
+import json
+import logging
+from typing import Dict, List
+from app.adapters.base import CloudAdapter, CreateResult
+from app.core.config import settings
+from app.core.states import CloudState
+from app.errors import TransientError, PermanentError
+
+# EC2 error codes worth retrying (everything else is treated as permanent)
+TRANSIENT_ERROR_CODES = {
+    "RequestLimitExceeded", "Throttling", "ThrottlingException",
+    "InsufficientInstanceCapacity", "InternalError", "ServiceUnavailable", "Unavailable",
+}
+
+# EC2 instance-state-name -> CloudState
+EC2_STATES = {
+    "pending": CloudState.PENDING,
+    "running": CloudState.RUNNING,
+    "stopping": CloudState.STOPPED,
+    "stopped": CloudState.STOPPED,
+    "shutting-down": CloudState.TERMINATED,
+    "terminated": CloudState.TERMINATED,
+}
+
+logger = logging.getLogger(__name__)
+
+
+def password_user_data(password: str) -> str:
+    """cloud-init user data setting the image's default user password (JSON quoting is valid YAML)"""
+    return f"#cloud-config\npassword: {json.dumps(password)}\nchpasswd: {{expire: false}}\nssh_pwauth: true\n"
+
+
+class AwsAdapter(CloudAdapter):
+    """
+    EC2 adapter: one boto3 client per region, reused by every task in the process.
+    Groups are launched with a single RunInstances (MinCount=MaxCount=count);
+    per-instance Name/tags are applied afterwards with CreateTags.
+    login_password (shared by a group) is applied by cloud-init through UserData,
+    so it only takes effect on images that run cloud-init.
+    """
+    cloud = "aws"
+    supports_count = True
+    max_count_per_call = 100
+    # Filter values per DescribeInstances call (unlike InstanceIds, a filter tolerates unknown ids)
+    max_describe_per_call = 200
+
+    def __init__(self, region: str):
+        super().__init__(region)
+        import boto3
+        from botocore.config import Config
+
+        self.client = boto3.client(
+            "ec2",
+            region_name=region,
+            config=Config(
+                max_pool_connections=settings.CLOUD_CLIENT_POOL_SIZE,
+                retries={"max_attempts": 0},  # retries are owned by the worker
+            ),
+        )
+
+    def _translate(self, error: Exception) -> Exception:
+        from botocore.exceptions import ClientError, BotoCoreError
+
+        if isinstance(error, ClientError):
+            code = error.response.get("Error", {}).get("Code", "")
+            status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+            if code in TRANSIENT_ERROR_CODES or status >= 500:
+                return TransientError(f"{code}: {error}")
+            return PermanentError(f"{code}: {error}")
+        if isinstance(error, BotoCoreError):
+            return TransientError(str(error))
+        return error
+
+    def _launch(self, members: List[Dict]) -> List[CreateResult]:
+        shared = members[0]
+        request = {
+            "ImageId": shared["image_id"],
+            "InstanceType": shared["instance_type"],
+            "SubnetId": shared["subnet_id"],
+            "SecurityGroupIds": shared["security_group_ids"],
+            "MinCount": len(members),
+            "MaxCount": len(members),
+        }
+        if shared.get("key_name"):
+            request["KeyName"] = shared["key_name"]
+        if shared.get("login_password"):
+            # boto3 base64-encodes UserData for RunInstances
+            request["UserData"] = password_user_data(shared["login_password"])
+        token = self.client_token(members)
+        if token:
+            # EC2 returns the original reservation for a repeated ClientToken
+            request["ClientToken"] = token
+        try:
+            response = self.client.run_instances(**request)
+        except Exception as e:
+            raise self._translate(e)
+
+        instance_ids = [instance["InstanceId"] for instance in response["Instances"]]
+        for params, instance_id in zip(members, instance_ids):
+            tags = {"Name": params["instance_name"], **(params.get("tags") or {})}
+            try:
+                self.client.create_tags(
+                    Resources=[instance_id],
+                    Tags=[{"Key": k, "Value": v} for k, v in tags.items()],
+                )
+            except Exception:
+                # The instance exists: a tagging failure must not fail (and relaunch) it
+                logger.warning("Tagging %s failed", instance_id, exc_info=True)
+        return [CreateResult(instance_id, None) for instance_id in instance_ids]
+
+    def _describe(self, instance_ids: List[str]) -> Dict[str, str]:
+        states = {}
+        try:
+            pages = self.client.get_paginator("describe_instances").paginate(
+                Filters=[{"Name": "instance-id", "Values": instance_ids}],
+            )
+            for page in pages:
+                for reservation in page["Reservations"]:
+                    for instance in reservation["Instances"]:
+                        states[instance["InstanceId"]] = EC2_STATES.get(instance["State"]["Name"], CloudState.PENDING)
+        except Exception as e:
+            raise self._translate(e)
+        return states
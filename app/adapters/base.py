@@ -0,0 +1,103 @@
+
+import hashlib
+import logging
+from collections import OrderedDict, namedtuple
+from typing import Dict, List, Optional
+from app.core.states import CloudState
+
+# Outcome of one instance in a batch call: exactly one of instance_id / error is set
+CreateResult = namedtuple("CreateResult", ["instance_id", "error"])
+
+# Fields that must match for instances to share one provider launch request
+# (login_password is applied per request, e.g. AWS user data, so it groups too)
+LAUNCH_GROUP_FIELDS = ("image_id", "instance_type", "subnet_id", "security_group_ids", "key_name", "login_password")
+
+
+logger = logging.getLogger(__name__)
+
+
+def launch_group_key(params: Dict) -> tuple:
+    key = []
+    for field in LAUNCH_GROUP_FIELDS:
+        value = params.get(field)
+        key.append(tuple(sorted(value)) if isinstance(value, list) else value)
+    return tuple(key)
+
+
+class CloudAdapter:
+    """
+    Base class for provider adapters (one long-lived instance per cloud + region).
+    Subclasses implement _launch(); create_instances() does the grouping:
+    instances sharing image/type/subnet/security groups/key go out as one request,
+    split into chunks of max_count_per_call when the provider has a "count" parameter.
+    Params may carry "idempotency_key"; adapters should make a repeated launch of the
+    same keys return the original instances (provider client token or equivalent).
+    describe_instances() pages instance ids through _describe() in chunks of max_describe_per_call.
+    """
+    cloud: str = None
+    supports_count: bool = False
+    max_count_per_call: int = 1
+    max_describe_per_call: int = 1
+
+    def __init__(self, region: str):
+        self.region = region
+
+    @staticmethod
+    def client_token(members: List[Dict]) -> Optional[str]:
+        """Deterministic token for one launch request (None if any member lacks a key)"""
+        keys = [params.get("idempotency_key") for params in members]
+        if not all(keys):
+            return None
+        return hashlib.sha256("|".join(keys).encode()).hexdigest()[:64]
+
+    def _launch(self, members: List[Dict]) -> List[CreateResult]:
+        """Launch instances that share one launch_group_key; results align with members"""
+        raise NotImplementedError
+
+    def create_instances(self, params_list: List[Dict]) -> List[CreateResult]:
+        groups: "OrderedDict[tuple, List[int]]" = OrderedDict()
+        for position, params in enumerate(params_list):
+            groups.setdefault(launch_group_key(params), []).append(position)
+
+        results: List[Optional[CreateResult]] = [None] * len(params_list)
+        step = self.max_count_per_call if self.supports_count else 1
+        for positions in groups.values():
+            for offset in range(0, len(positions), step):
+                chunk = positions[offset:offset + step]
+                try:
+                    outcomes = self._launch([params_list[p] for p in chunk])
+                except Exception as e:
+                    # A failed request fails every member of that request only
+                    outcomes = [CreateResult(None, e)] * len(chunk)
+                for position, outcome in zip(chunk, outcomes):
+                    results[position] = outcome
+        return results
+
+    def create_instance(self, params: Dict) -> str:
+        """Single-instance convenience wrapper; raises the adapter error on failure"""
+        result = self.create_instances([params])[0]
+        if result.error is not None:
+            raise result.error
+        return result.instance_id
+
+    def _describe(self, instance_ids: List[str]) -> Dict[str, str]:
+        """{instance_id: CloudState} for the ids the provider knows (unknown ids are left out)"""
+        raise NotImplementedError
+
+    def describe_instances(self, instance_ids: List[str]) -> Dict[str, str]:
+        """
+        Provider state of many instances, max_describe_per_call ids per request.
+        Ids a successful call did not return map to CloudState.MISSING; ids of a
+        failed call are left out (state unknown, check again later).
+        """
+        states: Dict[str, str] = {}
+        for offset in range(0, len(instance_ids), self.max_describe_per_call):
+            chunk = instance_ids[offset:offset + self.max_describe_per_call]
+            try:
+                found = self._describe(chunk)
+            except Exception:
+                logger.warning("Describe of %d %s instances in %s failed", len(chunk), self.cloud, self.region, exc_info=True)
+                continue
+            for instance_id in chunk:
+                states[instance_id] = found.get(instance_id, CloudState.MISSING)
+        return states
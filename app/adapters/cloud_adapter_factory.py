@@ -0,0 +1,58 @@
+
+import importlib
+import os
+import threading
+from typing import Dict, Tuple
+from app.adapters.base import CloudAdapter
+
+# cloud name -> "module:Class" (imported on first use so optional SDKs stay optional)
+ADAPTERS = {
+    "aws": "app.adapters.aws_adapter:AwsAdapter",
+    "fake": "app.adapters.fake_adapter:FakeCloudAdapter",
+}
+
+
+class CloudAdapterFactory:
+    """
+    Process-wide cache of long-lived adapters, one per (cloud, region).
+    Provider clients (HTTP pools, credentials) are built once, not per task.
+    The cache is dropped after fork so prefork children never share sockets.
+    """
+    _adapters: Dict[Tuple[str, str], CloudAdapter] = {}
+    _lock = threading.Lock()
+    _pid = os.getpid()
+
+    @classmethod
+    def get(cls, cloud: str, region: str) -> CloudAdapter:
+        key = (cloud, region)
+        if cls._pid != os.getpid():
+            cls.reset()
+        adapter = cls._adapters.get(key)
+        if adapter is None:
+            with cls._lock:
+                adapter = cls._adapters.get(key)
+                if adapter is None:
+                    adapter = cls._load(cloud)(region)
+                    cls._adapters[key] = adapter
+        return adapter
+
+    @classmethod
+    def register(cls, cloud: str, adapter_cls):
+        """Register an adapter class (or "module:Class" path) under a cloud name"""
+        ADAPTERS[cloud] = adapter_cls
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._adapters = {}
+            cls._pid = os.getpid()
+
+    @staticmethod
+    def _load(cloud: str):
+        target = ADAPTERS.get(cloud)
+        if target is None:
+            raise ValueError(f"Unknown cloud provider: {cloud} (known: {', '.join(sorted(ADAPTERS))})")
+        if isinstance(target, str):
+            module_name, class_name = target.split(":")
+            target = getattr(importlib.import_module(module_name), class_name)
+        return target
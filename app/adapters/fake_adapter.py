@@ -0,0 +1,110 @@
+
+import hashlib
+import itertools
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from app.adapters.base import CloudAdapter, CreateResult
+from app.core.config import settings
+from app.core.states import CloudState
+from app.errors import TransientError, PermanentError
+
+
+class FakeCloudAdapter(CloudAdapter):
+    """
+    Deterministic in-process provider for offline runs and benchmarks.
+    - Latency: FAKE_CLOUD_CALL_LATENCY_MS per request + FAKE_CLOUD_INSTANCE_LATENCY_MS per instance
+    - Failures: decided by hashing (seed, instance_name), so the same rows fail no matter
+      how they are batched; FAKE_CLOUD_TRANSIENT_RATIO of failures are retryable and
+      succeed on the next attempt
+    - Boot: instances turn running FAKE_CLOUD_BOOT_SECONDS after launch, except a hashed
+      FAKE_CLOUD_BOOT_FAILURE_RATE that terminate instead
+    - Instance ids carry their launch time and boot roll, so describe_instances() answers
+      from the id alone in any process (the reconciler never runs in the launching one)
+    """
+    cloud = "fake"
+    supports_count = True
+    max_count_per_call = 100
+    max_describe_per_call = 1000
+
+    def __init__(
+        self,
+        region: str,
+        call_latency_ms: Optional[float] = None,
+        instance_latency_ms: Optional[float] = None,
+        error_rate: Optional[float] = None,
+        transient_ratio: Optional[float] = None,
+        seed: Optional[int] = None,
+        boot_seconds: Optional[float] = None,
+        boot_failure_rate: Optional[float] = None,
+    ):
+        super().__init__(region)
+        self.call_latency = (settings.FAKE_CLOUD_CALL_LATENCY_MS if call_latency_ms is None else call_latency_ms) / 1000
+        self.instance_latency = (settings.FAKE_CLOUD_INSTANCE_LATENCY_MS if instance_latency_ms is None else instance_latency_ms) / 1000
+        self.error_rate = settings.FAKE_CLOUD_ERROR_RATE if error_rate is None else error_rate
+        self.transient_ratio = settings.FAKE_CLOUD_TRANSIENT_RATIO if transient_ratio is None else transient_ratio
+        self.seed = settings.FAKE_CLOUD_SEED if seed is None else seed
+        self.boot_seconds = settings.FAKE_CLOUD_BOOT_SECONDS if boot_seconds is None else boot_seconds
+        self.boot_failure_rate = settings.FAKE_CLOUD_BOOT_FAILURE_RATE if boot_failure_rate is None else boot_failure_rate
+        self.calls = 0
+        self.describe_calls = 0
+        self.instances: Dict[str, Dict] = {}
+        self._ids = itertools.count(1)
+        self._throttled = set()
+        self._by_key: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _roll(self, name: str, salt: str) -> float:
+        digest = hashlib.sha1(f"{self.seed}:{salt}:{name}".encode()).digest()
+        return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+    def _launch(self, members: List[Dict]) -> List[CreateResult]:
+        time.sleep(self.call_latency + self.instance_latency * len(members))
+        results = []
+        with self._lock:
+            self.calls += 1
+            for params in members:
+                name = params.get("instance_name", "")
+                key = params.get("idempotency_key")
+                if key and key in self._by_key:
+                    results.append(CreateResult(self._by_key[key], None))
+                    continue
+                if self._roll(name, "error") < self.error_rate and name not in self._throttled:
+                    if self._roll(name, "kind") < self.transient_ratio:
+                        self._throttled.add(name)
+                        results.append(CreateResult(None, TransientError(f"Throttled creating {name} (fake)")))
+                    else:
+                        results.append(CreateResult(None, PermanentError(f"Invalid configuration for {name} (fake)")))
+                    continue
+                instance_id = self._instance_id(name)
+                self.instances[instance_id] = params
+                if key:
+                    self._by_key[key] = instance_id
+                results.append(CreateResult(instance_id, None))
+        return results
+
+    def _instance_id(self, name: str) -> str:
+        # i-fake + launch ms (11 hex) + boot roll (8 hex) + pid and sequence for uniqueness
+        launched_ms = int(time.time() * 1000)
+        boot_roll = int(self._roll(name, "boot") * 2 ** 32)
+        return f"i-fake{launched_ms:011x}{boot_roll:08x}{os.getpid() & 0xffff:04x}{next(self._ids):06x}"
+
+    def _describe(self, instance_ids: List[str]) -> Dict[str, str]:
+        time.sleep(self.call_latency)
+        now_ms = time.time() * 1000
+        states = {}
+        with self._lock:
+            self.describe_calls += 1
+        for instance_id in instance_ids:
+            if not instance_id.startswith("i-fake") or len(instance_id) != 35:
+                continue  # not an id this adapter made: missing
+            launched_ms = int(instance_id[6:17], 16)
+            boot_roll = int(instance_id[17:25], 16) / 2 ** 32
+            if now_ms - launched_ms < self.boot_seconds * 1000:
+                states[instance_id] = CloudState.PENDING
+            elif boot_roll < self.boot_failure_rate:
+                states[instance_id] = CloudState.TERMINATED
+            else:
+                states[instance_id] = CloudState.RUNNING
+        return states
@@ -1,43 +1,32 @@
-from fastapi import APIRouter, UploadFile, File, Form, Body  # Added Body import
-from pydantic import BaseModel, Field, validator
+import asyncio
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional, Dict
-import pandas as pd
-from io import BytesIO
 import uuid
 from datetime import datetime
+from app.core.auth import submitter_principal
+from app.core.config import settings
+from app.core.metrics import INGEST_PHASE_SECONDS, observe
+from app.core.progress import heartbeat, hub, sse_event
+from app.core.states import JOB_PRIORITIES, TERMINAL_JOB_STATES
+from app.db.repositories.job_repo import AsyncJobRepo
+from app.db.repositories.task_repo import AsyncTaskRepo
+from app.db.session import SessionLocal, get_async_db
+from app.schemas.ecs_schema import ECSInstanceConfig, BatchECSCreateRequest
+from app.services.ingest_service import IngestReport, iter_ndjson_lines, iter_validated_batches, iter_validated_ndjson, parse_ecs_frame
+from app.services.cloud_status_cache import cloud_status_cache
+from app.services.job_service import JobService
+from app.services.submission_queue import encode_submission, get_producer
+from app.services.validation_cache import ValidatedBatch, content_token, redact, validation_cache
+from app.services.validation_service import validate_frame
 
 # Initialize router (matches your project's modular structure)
 router = APIRouter(tags=["ECS Batch Creation"])
 
-# ------------------------------
-# Data Models (Pydantic Validation)
-# ------------------------------
-class ECSInstanceConfig(BaseModel):
-    """Schema for single ECS instance configuration (from JSON/parsed file)"""
-    instance_name: str = Field(..., description="ECS instance name (unique)")
-    instance_type: str = Field(..., description="ECS instance type (e.g., t3.medium, c5.large)")
-    region: str = Field(..., description="AWS region (e.g., us-east-1, eu-west-1)")
-    image_id: str = Field(..., description="AMI ID (e.g., ami-0c55b159cbfafe1f0)")
-    subnet_id: str = Field(..., description="Subnet ID (e.g., subnet-0123456789abcdef0)")
-    security_group_ids: List[str] = Field(..., description="List of security group IDs")
-    key_name: Optional[str] = Field(None, description="SSH key pair name (optional)")
-    tags: Optional[Dict[str, str]] = Field(None, description="Custom tags (optional)")
-    login_password: Optional[str] = Field(None, description="Login password for the instance (optional)")
-
-    # Fix: Add check for regex module (v.match() requires a compiled regex or string pattern)
-    @validator("region")
-    def validate_region_format(cls, v):
-        import re  # Import regex module (critical fix)
-        pattern = re.compile(r"^[a-z]{2}-[a-z]+-\d$")  # Compile regex pattern
-        if not pattern.match(v):
-            raise ValueError("Invalid region format (e.g., cn-north-1)")
-        return v
-
-class BatchECSCreateRequest(BaseModel):
-    """Request model for JSON-based batch ECS creation"""
-    instances: List[ECSInstanceConfig] = Field(..., description="List of ECS instances to create")
-    dry_run: bool = Field(False, description="Dry run (validate only, no actual creation)")
-    batch_id: Optional[str] = Field(None, description="Custom batch ID (auto-generated if not provided)")
+# Dry-run response modes for /ecs_creation/file
+DRY_RUN_RESPONSE_MODES = ("full", "summary", "page")
 
 # ------------------------------
 # Utility Functions
@@ -46,37 +35,90 @@ def generate_batch_id() -> str:
     """Generate unique batch ID for tracking"""
     return f"ecs-batch-{uuid.uuid4().hex[:8]}-{datetime.now().strftime('%Y%m%d%H%M%S')}"
 
-def parse_ecs_file(file_data: bytes, file_type: str) -> List[Dict]:
-    """Parse CSV/Excel file into list of ECS configs (matches ECSInstanceConfig schema)"""
-    try:
-        # Read file with pandas (dtype=str to avoid type conversion errors)
-        if file_type == "csv":
-            df = pd.read_csv(BytesIO(file_data), dtype=str, skip_blank_lines=True)
-        elif file_type in ["xlsx", "xls"]:
-            df = pd.read_excel(BytesIO(file_data), dtype=str, skip_blank_lines=True)
-        else:
-            raise ValueError(f"Unsupported file type: {file_type} (only csv/xlsx/xls allowed)")
+def find_duplicate_names(instances: List[ECSInstanceConfig]) -> List[str]:
+    """instance_name values that appear more than once"""
+    seen, duplicates = set(), []
+    for inst in instances:
+        if inst.instance_name in seen and inst.instance_name not in duplicates:
+            duplicates.append(inst.instance_name)
+        seen.add(inst.instance_name)
+    return duplicates
 
-        # Clean data: remove empty rows/columns, strip whitespace from headers
-        df = df.dropna(how="all").dropna(axis=1, how="all")
-        df.columns = [col.strip() for col in df.columns]
+def parse_form_bool(value: Optional[str], field_name: str) -> bool:
+    """Convert a 'true'/'false' form string to boolean (case-insensitive + whitespace)"""
+    value_clean = (value or "false").strip().lower()
+    if value_clean not in ["true", "false"]:
+        raise ValueError(f"Invalid {field_name} value: {value}. Use 'true' or 'false'")
+    return value_clean == "true"
 
-        # Convert security_group_ids from string (e.g., "sg-1,sg-2") to list
-        if "security_group_ids" in df.columns:
-            df["security_group_ids"] = df["security_group_ids"].apply(
-                lambda x: [sg.strip() for sg in x.split(",")] if pd.notna(x) else []
-            )
+def parse_form_priority(value: Optional[str]) -> str:
+    """Validate the 'priority' form field (high/normal/low, case-insensitive)"""
+    value_clean = (value or "normal").strip().lower()
+    if value_clean not in JOB_PRIORITIES:
+        raise ValueError(f"Invalid priority value: {value}. Use one of: {', '.join(JOB_PRIORITIES)}")
+    return value_clean
 
-        # Convert tags from string (e.g., "env:prod,name:web") to dict
-        if "tags" in df.columns:
-            df["tags"] = df["tags"].apply(
-                lambda x: dict([tag.strip().split(":") for tag in x.split(",")]) if pd.notna(x) else None
-            )
+def parse_response_mode(value: Optional[str]) -> str:
+    """Validate the 'response_mode' form field (full/summary/page)"""
+    value_clean = (value or "full").strip().lower()
+    if value_clean not in DRY_RUN_RESPONSE_MODES:
+        raise ValueError(f"Invalid response_mode value: {value}. Use one of: {', '.join(DRY_RUN_RESPONSE_MODES)}")
+    return value_clean
 
-        # Convert DataFrame to list of dicts (matches ECSInstanceConfig)
-        return df.to_dict("records")
-    except Exception as e:
-        raise ValueError(f"File parsing failed: {str(e)}")
+def validated_page(rows: List[Dict], offset: int, limit: Optional[int]) -> Dict:
+    """One page of validated rows (secrets redacted) plus the offset of the next one (None on the last page)"""
+    limit = min(limit or settings.DRY_RUN_PAGE_SIZE, settings.DRY_RUN_MAX_PAGE_SIZE)
+    next_offset = offset + limit
+    return {
+        "offset": offset,
+        "limit": limit,
+        "next_offset": next_offset if next_offset < len(rows) else None,
+        "validated_instances": redact(rows[offset:next_offset]),
+    }
+
+def dry_run_response(batch_id: str, cached: ValidatedBatch, mode: str, offset: int = 0, limit: Optional[int] = None) -> dict:
+    """Dry-run result with its validation token; rows echoed in full, paged or not at all"""
+    response = {
+        "status": "dry_run_completed",
+        "batch_id": batch_id,
+        "message": f"Successfully validated {len(cached.instances)} ECS configs (no instances created)",
+        "instance_count": len(cached.instances),
+        "validation_token": cached.token,
+        "token_expires_in": settings.VALIDATION_CACHE_TTL_SECONDS,
+        "validated_url": f"/api/v1/jobs/validated/{cached.token}",
+    }
+    if mode == "full":
+        response["validated_instances"] = redact(cached.instances)
+    elif mode == "page":
+        response.update(validated_page(cached.instances, offset, limit))
+    return response
+
+def _run_streaming_ingest(fileobj, file_type: str, dry_run: bool, batch_id: str, priority: str = None, submitter: str = None):
+    """Blocking part of streaming mode: parse, validate and (optionally) persist chunk by chunk"""
+    report = IngestReport()
+    batches = iter_validated_batches(fileobj, file_type, report)
+    if dry_run:
+        for _ in batches:
+            pass
+        return None, False, report
+
+    db = SessionLocal()
+    try:
+        job, created = JobService.create_job_streaming(db, batches, report, submitter=submitter, batch_id=batch_id, priority=priority)
+        return (job.id if job else None), created, report
+    finally:
+        db.close()
+
+def existing_job_response(job) -> dict:
+    """Response for a batch_id that already has a job (nothing parsed or inserted again)"""
+    return {
+        "status": "batch_already_submitted",
+        "batch_id": job.batch_id,
+        "job_id": job.id,
+        "message": f"Batch {job.batch_id} was already submitted ({job.total} ECS instances)",
+        "instance_count": job.total,
+        "tracking_url": f"/api/v1/jobs/{job.id}"
+    }
 
 # ------------------------------
 # Core Endpoint (Fixed JSON + File Upload Support)
@@ -87,13 +129,24 @@ def parse_ecs_file(file_data: bytes, file_type: str) -> List[Dict]:
 # ------------------------------
 @router.post("/ecs_creation/json", summary="Batch create ECS instances (JSON input)")
 async def batch_create_ecs_json(
-    json_request: BatchECSCreateRequest  # Required (no Optional[None])
+    json_request: BatchECSCreateRequest,  # Required (no Optional[None])
+    db: AsyncSession = Depends(get_async_db),
+    submitter: str = Depends(submitter_principal)
 ):
     final_batch_id = json_request.batch_id or generate_batch_id()
-    ecs_configs = [config.dict() for config in json_request.instances]
-    
+
+    # Resubmitted batch_id: return the caller's existing job before any re-validation or insert
+    if json_request.batch_id and not json_request.dry_run:
+        existing = await AsyncJobRepo.get_by_batch_id(db, submitter, json_request.batch_id)
+        if existing is not None:
+            return existing_job_response(existing)
+
     try:
-        validated_instances = [ECSInstanceConfig(**config) for config in ecs_configs]
+        # Request body is already validated by FastAPI; only cross-row rules remain
+        validated_instances = json_request.instances
+        duplicates = find_duplicate_names(validated_instances)
+        if duplicates:
+            raise ValueError(f"Duplicate instance_name: {', '.join(duplicates[:20])}")
         instance_count = len(validated_instances)
         
         if json_request.dry_run:
@@ -101,14 +154,21 @@ async def batch_create_ecs_json(
                 "status": "dry_run_completed",
                 "batch_id": final_batch_id,
                 "message": f"Successfully validated {instance_count} ECS configs",
-                "validated_instances": [inst.dict() for inst in validated_instances]
+                "validated_instances": redact([inst.dict() for inst in validated_instances])
             }
         
-        # Add ECS creation logic here
+        with observe(INGEST_PHASE_SECONDS, endpoint="ecs_creation_json", phase="insert"):
+            job, created = await JobService.create_job_async(
+                db, validated_instances, submitter=submitter, batch_id=final_batch_id, priority=json_request.priority
+            )
+        if not created:
+            return existing_job_response(job)
         return {
             "status": "batch_creation_initiated",
             "batch_id": final_batch_id,
-            "message": f"Started creating {instance_count} ECS instances"
+            "job_id": job.id,
+            "message": f"Started creating {instance_count} ECS instances",
+            "tracking_url": f"/api/v1/jobs/{job.id}"
         }
     except Exception as e:
         return {"error": str(e), "batch_id": final_batch_id}
@@ -119,56 +179,415 @@ async def batch_create_ecs_json(
 # ------------------------------
 @router.post("/ecs_creation/file", summary="Batch create ECS instances (File upload)")
 async def batch_create_ecs_file(
-    file: UploadFile = File(..., description="CSV/Excel file with ECS configs"),
+    file: Optional[UploadFile] = File(None, description="CSV/Excel file with ECS configs (optional with validation_token)"),
     # 👇 Change dry_run to Optional[str] (accept "true"/"false" as text)
     dry_run: Optional[str] = Form("false", description="Dry run (validate only: 'true' or 'false')"),
-    batch_id: Optional[str] = Form(None, description="Custom batch ID")
+    batch_id: Optional[str] = Form(None, description="Custom batch ID"),
+    stream: Optional[str] = Form("false", description="Streaming mode: parse/validate/insert in bounded chunks ('true' or 'false')"),
+    priority: Optional[str] = Form("normal", description="Scheduling priority: 'high', 'normal' or 'low'"),
+    validation_token: Optional[str] = Form(None, description="Token from an earlier dry run: submit its validated rows (file optional)"),
+    response_mode: Optional[str] = Form("full", description="Dry-run response: 'full' (all rows), 'summary' (counts only) or 'page'"),
+    page_offset: int = Form(0, ge=0, description="First row of the page (response_mode=page)"),
+    page_size: Optional[int] = Form(None, ge=1, description="Rows per page (response_mode=page)"),
+    db: AsyncSession = Depends(get_async_db),
+    submitter: str = Depends(submitter_principal)
 ):
     final_batch_id = batch_id or generate_batch_id()
-    file_ext = file.filename.split(".")[-1].lower()
+    if file is None and not validation_token:
+        return {"error": "Upload a file or pass the validation_token of an earlier dry run", "batch_id": final_batch_id}
+    file_ext = file.filename.split(".")[-1].lower() if file is not None else None
     
     # Validate file type
-    if file_ext not in ["csv", "xlsx", "xls"]:
+    if file is not None and file_ext not in ["csv", "xlsx", "xls"]:
         return {"error": f"Unsupported file type: {file_ext}. Allowed: csv, xlsx, xls", "batch_id": final_batch_id}
     
     # 👇 Convert dry_run string to boolean (handle case-insensitive + whitespace)
     try:
-        # Clean input: lowercase + remove whitespace
-        dry_run_clean = dry_run.strip().lower()
-        if dry_run_clean not in ["true", "false"]:
-            raise ValueError(f"Invalid dry_run value: {dry_run}. Use 'true' or 'false'")
-        final_dry_run = dry_run_clean == "true"
+        final_dry_run = parse_form_bool(dry_run, "dry_run")
+        final_stream = parse_form_bool(stream, "stream")
+        final_priority = parse_form_priority(priority)
+        final_response_mode = parse_response_mode(response_mode)
     except Exception as e:
         return {"error": str(e), "batch_id": final_batch_id}
+
+    # Resubmitted batch_id: return the existing job without reading the upload
+    if batch_id and not final_dry_run:
+        existing = await AsyncJobRepo.get_by_batch_id(db, submitter, batch_id)
+        if existing is not None:
+            return existing_job_response(existing)
+
+    # Token only: the rows were validated by an earlier dry run, nothing to upload or parse
+    if file is None:
+        cached = await validation_cache.get(validation_token, submitter)
+        if cached is None:
+            return {"error": "Unknown or expired validation_token; upload the file again", "batch_id": final_batch_id}
+        if final_dry_run:
+            return dry_run_response(final_batch_id, cached, final_response_mode, page_offset, page_size)
+        return await _create_from_validated(db, cached, final_batch_id, final_priority, submitter)
+
+    if final_stream:
+        return await _batch_create_ecs_file_streaming(file, file_ext, final_dry_run, final_batch_id, final_priority, submitter)
     
     try:
-        # Read and parse file
+        # Read the file; an upload validated before (same SHA-256) skips parse + validate
         file_data = await file.read()
-        ecs_configs = parse_ecs_file(file_data, file_ext)
-        
-        # Validate ECS configs
-        validated_instances = [ECSInstanceConfig(**config) for config in ecs_configs]
-        instance_count = len(validated_instances)
+        token = content_token(file_data, submitter)
+        if validation_token and validation_token != token:
+            return {"error": "validation_token does not match the uploaded file", "batch_id": final_batch_id}
+        cached = await validation_cache.get(token, submitter)
+        if cached is not None:
+            if final_dry_run:
+                return dry_run_response(final_batch_id, cached, final_response_mode, page_offset, page_size)
+            return await _create_from_validated(db, cached, final_batch_id, final_priority, submitter)
+
+        with observe(INGEST_PHASE_SECONDS, endpoint="ecs_creation_file", phase="parse"):
+            df = parse_ecs_frame(file_data, file_ext)
         
-        # Dry run logic
-        if final_dry_run:
+        # Validate ECS configs column-wise (models are built only for passing rows)
+        with observe(INGEST_PHASE_SECONDS, endpoint="ecs_creation_file", phase="validate"):
+            result = validate_frame(df)
+        if result.errors:
             return {
-                "status": "dry_run_completed",
+                "error": f"Validation failed for {result.error_rows} rows (no instances created)",
                 "batch_id": final_batch_id,
-                "message": f"Successfully validated {instance_count} ECS configs (no instances created)",
-                "validated_instances": [inst.dict() for inst in validated_instances]
+                "row_count": result.row_count,
+                "error_count": len(result.errors),
+                "errors": result.errors[:settings.INGEST_MAX_REPORTED_ERRORS]
             }
+        validated_instances = result.instances
+        instance_count = len(validated_instances)
+        
+        # Dry run logic: cache the validated rows; the token lets the real submission reuse them
+        if final_dry_run:
+            cached = await validation_cache.put(
+                token, submitter, file_ext, result.row_count, [inst.dict() for inst in validated_instances]
+            )
+            return dry_run_response(final_batch_id, cached, final_response_mode, page_offset, page_size)
         
-        # Actual ECS creation logic (add your boto3 code here)
+        with observe(INGEST_PHASE_SECONDS, endpoint="ecs_creation_file", phase="insert"):
+            job, created = await JobService.create_job_async(
+                db, validated_instances, submitter=submitter, batch_id=final_batch_id, priority=final_priority
+            )
+        if not created:
+            return existing_job_response(job)
         return {
             "status": "batch_creation_initiated",
             "batch_id": final_batch_id,
+            "job_id": job.id,
             "message": f"Started creating {instance_count} ECS instances",
             "instance_count": instance_count,
-            "created_instances": [inst.dict() for inst in validated_instances],
-            "tracking_url": f"/api/v1/jobs/{final_batch_id}"
+            "created_instances": redact([inst.dict() for inst in validated_instances]),
+            "tracking_url": f"/api/v1/jobs/{job.id}"
         }
     except ValueError as e:
         return {"error": f"Validation/parsing failed: {str(e)}", "batch_id": final_batch_id}
     except Exception as e:
         return {"error": f"Batch creation failed: {str(e)}", "batch_id": final_batch_id}
+
+async def _create_from_validated(db: AsyncSession, cached: ValidatedBatch, batch_id: str, priority: str, submitter: str):
+    """Real submission of a cached dry run: rows were validated then, so models are built without re-validation"""
+    try:
+        instances = [ECSInstanceConfig.model_construct(**inst) for inst in cached.instances]
+        with observe(INGEST_PHASE_SECONDS, endpoint="ecs_creation_file", phase="insert"):
+            job, created = await JobService.create_job_async(db, instances, submitter=submitter, batch_id=batch_id, priority=priority)
+    except Exception as e:
+        return {"error": f"Batch creation failed: {str(e)}", "batch_id": batch_id}
+    if not created:
+        return existing_job_response(job)
+    return {
+        "status": "batch_creation_initiated",
+        "batch_id": batch_id,
+        "job_id": job.id,
+        "message": f"Started creating {len(instances)} ECS instances (validated by dry run)",
+        "instance_count": len(instances),
+        "validation_token": cached.token,
+        "created_instances": redact(cached.instances),
+        "tracking_url": f"/api/v1/jobs/{job.id}"
+    }
+
+async def _batch_create_ecs_file_streaming(
+    file: UploadFile, file_ext: str, dry_run: bool, batch_id: str, priority: str = None, submitter: str = None
+):
+    """
+    Streaming mode for /ecs_creation/file:
+    - Reads the spooled upload in INGEST_CHUNK_SIZE chunks (no full-file read, no full DataFrame)
+    - Hands each validated chunk to the job pipeline, all off the event loop
+    - Responses carry counts + capped row errors instead of echoing every instance
+    """
+    try:
+        await file.seek(0)
+        job_id, created, report = await run_in_threadpool(_run_streaming_ingest, file.file, file_ext, dry_run, batch_id, priority, submitter)
+    except ValueError as e:
+        return {"error": f"Validation/parsing failed: {str(e)}", "batch_id": batch_id}
+    except Exception as e:
+        return {"error": f"Batch creation failed: {str(e)}", "batch_id": batch_id}
+
+    if report.error_count:
+        return {
+            "error": f"Validation failed with {report.error_count} errors (no instances created)",
+            "batch_id": batch_id,
+            **report.to_dict()
+        }
+
+    if dry_run:
+        return {
+            "status": "dry_run_completed",
+            "batch_id": batch_id,
+            "message": f"Successfully validated {report.valid_count} ECS configs (no instances created)",
+            **report.to_dict()
+        }
+
+    if job_id is None:
+        return {"error": "No ECS configs found in file", "batch_id": batch_id}
+
+    if not created:
+        return {
+            "status": "batch_already_submitted",
+            "batch_id": batch_id,
+            "job_id": job_id,
+            "message": f"Batch {batch_id} was already submitted",
+            "tracking_url": f"/api/v1/jobs/{job_id}"
+        }
+
+    return {
+        "status": "batch_creation_initiated",
+        "batch_id": batch_id,
+        "job_id": job_id,
+        "message": f"Started creating {report.valid_count} ECS instances",
+        "instance_count": report.valid_count,
+        "tracking_url": f"/api/v1/jobs/{job_id}"
+    }
+
+# ------------------------------
+# Endpoint 2a: NDJSON Batch Creation (streamed request body)
+# ------------------------------
+@router.post("/ecs_creation/ndjson", summary="Batch create ECS instances (NDJSON stream, optionally gzip)")
+async def batch_create_ecs_ndjson(
+    request: Request,
+    batch_id: Optional[str] = Query(None, description="Custom batch ID"),
+    priority: Optional[str] = Query(None, description="Job priority: high, normal or low"),
+    dry_run: bool = Query(False, description="Validate only (nothing created)"),
+    db: AsyncSession = Depends(get_async_db),
+    submitter: str = Depends(submitter_principal)
+):
+    """
+    One ECSInstanceConfig JSON object per line, read from the body as it arrives
+    (Content-Encoding: gzip accepted). Every INGEST_CHUNK_SIZE valid lines are
+    committed and dispatched while the upload continues; the job reports
+    RECEIVING until the body ends. Invalid lines are skipped and reported.
+    """
+    final_batch_id = batch_id or generate_batch_id()
+    try:
+        priority = parse_form_priority(priority)
+    except ValueError as e:
+        return {"error": str(e), "batch_id": final_batch_id}
+
+    if batch_id and not dry_run:
+        existing = await AsyncJobRepo.get_by_batch_id(db, submitter, batch_id)
+        if existing is not None:
+            return existing_job_response(existing)
+
+    report = IngestReport()
+    gzipped = request.headers.get("content-encoding", "").lower() == "gzip"
+    batches = iter_validated_ndjson(iter_ndjson_lines(request.stream(), gzipped=gzipped), report)
+    try:
+        if dry_run:
+            async for _ in batches:
+                pass
+        else:
+            job, created = await JobService.create_job_progressive_async(
+                db, batches, report, submitter=submitter, batch_id=final_batch_id, priority=priority
+            )
+            if not created:
+                return existing_job_response(job)
+    except Exception as e:
+        prefix = "Validation/parsing failed" if isinstance(e, ValueError) else "Batch creation failed"
+        response = {"error": f"{prefix}: {str(e)}", "batch_id": final_batch_id, **report.to_dict()}
+        if not dry_run:
+            # Chunks committed before the failure keep running under the (sealed) job
+            response["tracking_url"] = f"/api/v1/jobs/batch/{final_batch_id}"
+        return response
+
+    if dry_run:
+        return {
+            "status": "dry_run_completed",
+            "batch_id": final_batch_id,
+            "message": f"Validated {report.row_count} lines: {report.valid_count} valid (no instances created)",
+            **report.to_dict()
+        }
+    if not report.valid_count:
+        return {"error": "No valid ECS configs in request body", "batch_id": final_batch_id, "job_id": job.id, **report.to_dict()}
+    return {
+        "status": "batch_creation_initiated",
+        "batch_id": final_batch_id,
+        "job_id": job.id,
+        "message": f"Created {report.valid_count} of {report.row_count} ECS instances ({report.error_count} errors)",
+        "instance_count": report.valid_count,
+        "tracking_url": f"/api/v1/jobs/{job.id}",
+        **report.to_dict()
+    }
+
+# ------------------------------
+# Endpoint 2b: Queued Batch Creation (Kafka)
+# ------------------------------
+@router.post("/ecs_creation/queued", status_code=202, summary="Batch create ECS instances via the submission queue")
+async def batch_create_ecs_queued(
+    json_request: BatchECSCreateRequest,
+    db: AsyncSession = Depends(get_async_db),
+    submitter: str = Depends(submitter_principal)
+):
+    """
+    Validate, append to KAFKA_TOPIC and return; the submission consumer creates the job.
+    Absorbs spikes larger than the DB/broker can take (they wait in the topic).
+    """
+    final_batch_id = json_request.batch_id or generate_batch_id()
+
+    if json_request.batch_id:
+        existing = await AsyncJobRepo.get_by_batch_id(db, submitter, json_request.batch_id)
+        if existing is not None:
+            return existing_job_response(existing)
+
+    duplicates = find_duplicate_names(json_request.instances)
+    if duplicates:
+        return {"error": f"Duplicate instance_name: {', '.join(duplicates[:20])}", "batch_id": final_batch_id}
+    if json_request.dry_run:
+        return {
+            "status": "dry_run_completed",
+            "batch_id": final_batch_id,
+            "message": f"Successfully validated {len(json_request.instances)} ECS configs (nothing queued)"
+        }
+
+    try:
+        producer = await get_producer()
+        await producer.send(final_batch_id, encode_submission(final_batch_id, json_request.instances, submitter=submitter, priority=json_request.priority))
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Submission queue unavailable: {str(e)}")
+    return {
+        "status": "batch_queued",
+        "batch_id": final_batch_id,
+        "message": f"Queued {len(json_request.instances)} ECS instances for creation",
+        "instance_count": len(json_request.instances),
+        "tracking_url": f"/api/v1/jobs/batch/{final_batch_id}"
+    }
+
+@router.get("/batch/{batch_id}", summary="Get job status by batch ID (queued submissions)")
+async def get_batch_status(
+    batch_id: str, db: AsyncSession = Depends(get_async_db), submitter: str = Depends(submitter_principal)
+):
+    # Only the caller's own batches: another submitter's batch_id reads as not persisted yet
+    job = await AsyncJobRepo.get_by_batch_id(db, submitter, batch_id)
+    if job is None:
+        # Not persisted yet (still in the submission queue) or never submitted
+        return {"batch_id": batch_id, "status": "QUEUED", "job_id": None}
+    return await get_job_status(job.id, db)
+
+@router.get("/validated/{token}", summary="Page through the rows of a cached dry run")
+async def get_validated_rows(
+    token: str,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    submitter: str = Depends(submitter_principal),
+):
+    cached = await validation_cache.get(token, submitter)
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired validation_token")
+    return {
+        "validation_token": token,
+        "file_type": cached.file_type,
+        "instance_count": len(cached.instances),
+        **validated_page(cached.instances, offset, limit),
+    }
+
+# ------------------------------
+# Endpoint 3: Job Status / Progress
+# ------------------------------
+@router.get("/{job_id}", summary="Get batch job status and progress")
+async def get_job_status(job_id: str, db: AsyncSession = Depends(get_async_db)):
+    # Single primary-key read: counters are maintained on every task transition
+    job = await AsyncJobRepo.get(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+
+    total = job.total or 0
+    succeeded = job.succeeded or 0
+    failed = job.failed or 0
+    # Provider-side states from the reconciler's cache; a miss costs one GROUP BY over the job's tasks
+    cloud = None
+    if succeeded or failed:
+        cloud = await cloud_status_cache.get(job.id)
+        if cloud is None:
+            cloud = await AsyncTaskRepo.cloud_state_counts(db, job.id)
+            await cloud_status_cache.put(job.id, cloud)
+    return {
+        "job_id": job.id,
+        "batch_id": job.batch_id,
+        "status": job.status,
+        "priority": job.priority,
+        "total": total,
+        "succeeded": succeeded,
+        "failed": failed,
+        "pending": max(total - succeeded - failed, 0),
+        "progress": round((succeeded + failed) / total * 100, 2) if total else 0.0,
+        "cloud_states": cloud,
+        "created_at": job.created_at,
+        "events_url": f"/api/v1/jobs/{job.id}/events"
+    }
+
+def progress_payload(snapshot: dict) -> dict:
+    total = snapshot.get("total") or 0
+    done = (snapshot.get("succeeded") or 0) + (snapshot.get("failed") or 0)
+    return {
+        **snapshot,
+        "pending": max(total - done, 0),
+        "progress": round(done / total * 100, 2) if total else 0.0,
+    }
+
+# ------------------------------
+# Endpoint 4: Job Progress Stream (SSE)
+# ------------------------------
+@router.get("/{job_id}/events", summary="Stream job progress (Server-Sent Events)")
+async def stream_job_progress(job_id: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    text/event-stream of `progress` events (same counters as GET /{job_id}).
+    - One DB read at connect; afterwards updates come from the process-wide
+      Redis subscription, coalesced to at most one per PROGRESS_INTERVAL_SECONDS
+    - The stream ends with a `done` event once the job reaches a terminal status
+    """
+    # Watch before reading so nothing published after the read is missed
+    queue = hub.watch(job_id)
+    job = await AsyncJobRepo.get(db, job_id)
+    if job is None:
+        hub.unwatch(job_id, queue)
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    initial = {
+        "job_id": job.id, "total": job.total or 0, "succeeded": job.succeeded or 0,
+        "failed": job.failed or 0, "status": job.status,
+    }
+    # Release the pooled connection: the stream may stay open for hours
+    await db.close()
+
+    async def events():
+        try:
+            snapshot = initial
+            yield sse_event(progress_payload(snapshot))
+            while snapshot["status"] not in TERMINAL_JOB_STATES:
+                try:
+                    update = await asyncio.wait_for(queue.get(), timeout=settings.PROGRESS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield heartbeat()
+                    continue
+                if update["succeeded"] + update["failed"] < snapshot["succeeded"] + snapshot["failed"]:
+                    continue  # published before our initial read
+                snapshot = update
+                yield sse_event(progress_payload(snapshot))
+            yield sse_event(progress_payload(snapshot), event_name="done")
+        finally:
+            hub.unwatch(job_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.core.auth import submitter_principal
+from app.db.repositories.job_repo import AsyncJobRepo
+from app.db.repositories.task_repo import AsyncTaskRepo, TASK_SELECTABLE_COLUMNS
+from app.db.session import get_async_db
+
+router = APIRouter(tags=["ECS Batch Tasks"])
+
+# ------------------------------
+# Endpoint: Paginated Task Listing (keyset on (job_id, index))
+# ------------------------------
+@router.get("/{job_id}/tasks", summary="List tasks of a batch job (keyset pagination)")
+async def list_job_tasks(
+    job_id: str,
+    after: Optional[int] = Query(None, description="Cursor: return tasks with index > after (use next_cursor)"),
+    limit: int = Query(100, ge=1, le=1000, description="Page size"),
+    status: Optional[str] = Query(None, description="Filter by task status (PENDING, QUEUED, RUNNING, RETRYING, SUCCESS, FAILED)"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return (e.g., id,status,cloud_instance_id)"),
+    db: AsyncSession = Depends(get_async_db),
+    submitter: str = Depends(submitter_principal)
+):
+    # Only the caller's own jobs: another submitter's job reads as not found
+    if not await AsyncJobRepo.owned_by(db, submitter, job_id):
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    columns = None
+    if fields:
+        columns = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = sorted(set(columns) - TASK_SELECTABLE_COLUMNS)
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(sorted(TASK_SELECTABLE_COLUMNS))}"
+            )
+
+    items, has_more = await AsyncTaskRepo.list_page(
+        db, job_id, after_index=after, limit=limit, status=status, columns=columns
+    )
+    return {
+        "job_id": job_id,
+        "items": items,
+        "count": len(items),
+        "next_cursor": items[-1]["index"] if has_more else None
+    }
@@ -1,3 +1,4 @@
+import hashlib
 from typing import Optional
 from fastapi import Request, HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer, APIKeyHeader
@@ -62,3 +63,28 @@ def get_current_user(
     return jwt_user or api_key_user
 
 auth_dependency = Depends(get_current_user)
+
+# === Submitter (job ownership) ===
+ANONYMOUS_SUBMITTER = "anonymous"
+
+def api_key_principal(api_key: str) -> str:
+    """Stable name for a whitelisted API key that never reveals the key itself"""
+    return f"key:{hashlib.sha256(api_key.encode()).hexdigest()[:16]}"
+
+def submitter_principal(request: Request) -> str:
+    """
+    Authenticated caller recorded as jobs.submitter; batch_id dedup is scoped to it.
+    - "user:<jwt sub>" for a valid bearer token, "key:<digest>" for a whitelisted API key
+      (the key itself is never stored)
+    - ANONYMOUS_SUBMITTER when no credentials are sent; invalid ones are rejected
+    """
+    api_key = request.headers.get(API_KEY_HEADER)
+    if api_key:
+        verify_api_key(api_key)
+        return api_key_principal(api_key)
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        return f"user:{verify_jwt_token(authorization[7:])['user_id']}"
+    return ANONYMOUS_SUBMITTER
+
+submitter_dependency = Depends(submitter_principal)
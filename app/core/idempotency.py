@@ -0,0 +1,146 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from app.core.config import settings
+
+# ------------------------------
+# Idempotency keys + worker-side claims
+# (a redelivered/duplicated create_instance message must not launch a second instance)
+# ------------------------------
+
+# Push the expiry back only while the caller still owns the claim
+CLAIM_EXTEND_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]))
+end
+return 0
+"""
+
+def idempotency_key(batch_id: str, index: int, submitter: Optional[str] = None) -> str:
+    """
+    Stable per-instance key: same submitter + batch_id + row index => same key across
+    resubmissions (batch_ids are only unique per submitter)
+    """
+    return f"{submitter}:{batch_id}:{index}" if submitter else f"{batch_id}:{index}"
+
+
+class InMemoryClaimBackend:
+    """Process-local backend (tests / single-process dev)"""
+
+    def __init__(self):
+        self._claims: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def set_if_absent(self, key: str, owner: str, ttl: int) -> str:
+        now = time.monotonic()
+        with self._lock:
+            current = self._claims.get(key)
+            if current is None or current[1] <= now:
+                self._claims[key] = (owner, now + ttl)
+                return owner
+            return current[0]
+
+    def extend(self, key: str, owner: str, ttl: int) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            current = self._claims.get(key)
+            if current is None or current[1] <= now or current[0] != owner:
+                return False
+            self._claims[key] = (owner, now + ttl)
+            return True
+
+    def exists(self, key: str) -> bool:
+        with self._lock:
+            current = self._claims.get(key)
+            return current is not None and current[1] > time.monotonic()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._claims.pop(key, None)
+
+
+class RedisClaimBackend:
+    """Redis backend: SET NX EX, falling back to GET only when the key is taken"""
+
+    def __init__(self, redis_url: str):
+        import redis
+
+        self._client = redis.Redis.from_url(redis_url, decode_responses=True)
+        self._extend = self._client.register_script(CLAIM_EXTEND_LUA)
+
+    def set_if_absent(self, key: str, owner: str, ttl: int) -> str:
+        if self._client.set(key, owner, nx=True, ex=ttl):
+            return owner
+        return self._client.get(key) or owner
+
+    def extend(self, key: str, owner: str, ttl: int) -> bool:
+        return bool(self._extend(keys=[key], args=[owner, ttl]))
+
+    def exists(self, key: str) -> bool:
+        return bool(self._client.exists(key))
+
+    def delete(self, key: str):
+        self._client.delete(key)
+
+
+class IdempotencyGuard:
+    """
+    claim(key, owner) is True when this delivery may do the work:
+    - first claim wins (SETNX)
+    - the same owner (Celery keeps request.id across retries and redeliveries) may re-claim,
+      so a crashed attempt is resumed instead of skipped
+    - any other owner is a duplicate and should return without calling the provider
+    A claim expires ttl seconds after it was taken or last extended: the owner heartbeats
+    (extend) while it works, so a live claim means a worker still has the task and a lapsed
+    one that it is gone (the stuck-task reaper only requeues the latter).
+    """
+
+    def __init__(self, backend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+
+    def claim(self, key: str, owner: str) -> bool:
+        return self.backend.set_if_absent(f"idem:{key}", owner, self.ttl) == owner
+
+    def extend(self, key: str, owner: str) -> bool:
+        """Heartbeat: another ttl seconds for a claim owner still holds (False once lost)"""
+        return self.backend.extend(f"idem:{key}", owner, self.ttl)
+
+    def is_claimed(self, key: str) -> bool:
+        return self.backend.exists(f"idem:{key}")
+
+    def release(self, key: str):
+        """Drop a claim so a new message can take it at once (deferred or abandoned task)"""
+        self.backend.delete(f"idem:{key}")
+
+
+class ClaimHeartbeat:
+    """
+    Callable that extends an owner's claims, at most once per ttl/3 seconds unless forced:
+    cheap enough to call from every rate-limiter wait round.
+    """
+
+    def __init__(self, guard: IdempotencyGuard, keys, owner: str):
+        self.guard = guard
+        self.keys = [key for key in keys if key]
+        self.owner = owner
+        self._last = time.monotonic()
+
+    def __call__(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last < self.guard.ttl / 3:
+            return
+        self._last = now
+        for key in self.keys:
+            self.guard.extend(key, self.owner)
+
+
+def build_guard() -> IdempotencyGuard:
+    if settings.IDEMPOTENCY_BACKEND == "redis" and settings.REDIS_URL:
+        backend = RedisClaimBackend(settings.REDIS_URL)
+    else:
+        backend = InMemoryClaimBackend()
+    return IdempotencyGuard(backend, ttl=settings.IDEMPOTENCY_CLAIM_TTL)
+
+
+guard = build_guard()
@@ -1,22 +1,48 @@
+import logging
 from fastapi import Request, HTTPException
+from fastapi.responses import JSONResponse
+from jose import JWTError, jwt
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-from limits.storage import MemoryStorage, RedisStorage
-from limits.strategies import FixedWindowRateLimiter
+from app.core.auth import VALID_API_KEYS, api_key_principal
 from app.core.config import settings
-import time
+from app.core.quota import QuotaLimiter, quota
+
+logger = logging.getLogger(__name__)
+
+
+def quota_identity(request: Request) -> str:
+    """
+    Caller identity for rate limits/quotas. Middleware runs before auth dependencies,
+    so fall back to the raw credentials (API key header, JWT subject) and then the client IP.
+    - API keys count only when whitelisted, and only as their digest (api_key_principal):
+      a made-up key per request cannot dodge the quota or write itself into Redis keys
+    """
+    user = getattr(request.state, "user", None)
+    if user:
+        return f"user:{user['user_id']}" if user["auth_type"] == "jwt" else api_key_principal(user["api_key"])
+    api_key = request.headers.get("x-api-key")
+    if api_key and api_key in VALID_API_KEYS:
+        return api_key_principal(api_key)
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        try:
+            subject = jwt.decode(authorization[7:], settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM]).get("sub")
+            if subject:
+                return f"user:{subject}"
+        except JWTError:
+            pass  # auth dependency rejects it; count it against the IP meanwhile
+    return f"ip:{get_remote_address(request)}"
 
-# Initialize storage (Redis for prod, in-memory for dev)
-storage = RedisStorage(settings.REDIS_URL) if settings.REDIS_URL else MemoryStorage()
 
 # Rate limiter: Key = IP + UserID/API Key (prevents shared limits)
+# Strategy is a slowapi/limits name: "moving-window" avoids the 2x burst of "fixed-window" at edges
 limiter = Limiter(
-    key_func=lambda request: f"{get_remote_address(request)}:{request.state.user['user_id']}"
-    if request.state.user["auth_type"] == "jwt"
-    else f"{get_remote_address(request)}:{request.state.user['api_key']}",
-    storage_uri=settings.REDIS_URL,
-    strategy=FixedWindowRateLimiter(storage)
+    key_func=lambda request: f"{get_remote_address(request)}:{quota_identity(request)}",
+    default_limits=[settings.RATE_LIMIT],
+    storage_uri=settings.REDIS_URL or "memory://",
+    strategy=settings.RATE_LIMIT_STRATEGY,
 )
 
 async def request_size_limit_middleware(request: Request, call_next):
@@ -32,19 +58,28 @@ async def request_size_limit_middleware(request: Request, call_next):
     return response
 
 async def daily_quota_middleware(request: Request, call_next):
-    """Reject requests exceeding DAILY_QUOTA"""
-    user_identifier = request.state.user["user_id"] if request.state.user["auth_type"] == "jwt" else request.state.user["api_key"]
-    quota_key = f"quota:{user_identifier}:{time.strftime('%Y%m%d')}"  # Daily unique key
-
-    # Get current quota usage (initialize to 0 if not exists)
-    current_usage = int(storage.get(quota_key) or 0)
-    if current_usage >= settings.DAILY_QUOTA:
-        raise HTTPException(
+    """
+    Reject requests exceeding DAILY_QUOTA (per QUOTA_WINDOW_SECONDS, strategy QUOTA_STRATEGY).
+    - One pipelined Redis round trip per request over the shared async pool
+    - Callers already over quota are rejected from the local cache without touching Redis
+    - Fails open if Redis is unavailable (the outage is logged, requests are not blocked)
+    """
+    if any(request.url.path.startswith(prefix) for prefix in settings.QUOTA_EXEMPT_PATHS):
+        return await call_next(request)
+
+    try:
+        decision = await quota.hit(quota_identity(request))
+    except Exception as e:
+        logger.warning("Quota backend unavailable (%s); allowing request", e)
+        return await call_next(request)
+
+    if not decision.allowed:
+        # Returned (not raised): exceptions from http middleware bypass FastAPI's handlers
+        return JSONResponse(
             status_code=429,  # Too Many Requests
-            detail=f"Daily quota exceeded ({settings.DAILY_QUOTA} requests/day). Reset tomorrow."
+            content={"detail": f"Quota exceeded ({settings.DAILY_QUOTA} requests per {settings.QUOTA_WINDOW_SECONDS}s)"},
+            headers={"Retry-After": QuotaLimiter.retry_after_header(decision)},
         )
-
-    # Increment quota (expire after 24 hours)
-    storage.set(quota_key, current_usage + 1, expiry=86400)
     response = await call_next(request)
+    response.headers["X-Quota-Remaining"] = str(decision.remaining)
     return response
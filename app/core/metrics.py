@@ -0,0 +1,264 @@
+import functools
+import inspect
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CollectorRegistry,
+    CONTENT_TYPE_LATEST,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    REGISTRY,
+)
+
+# ------------------------------
+# Prometheus metrics (API, DB, dispatch, worker)
+# Multiprocess-safe: when PROMETHEUS_MULTIPROC_DIR is set (gunicorn workers, Celery prefork
+# children) every process writes its own files and the exporter aggregates them.
+# ------------------------------
+
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+# Latency buckets from 1ms to 60s (10k-instance jobs have long tails)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# API
+HTTP_REQUEST_SECONDS = Histogram(
+    "ecs_http_request_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+INGEST_PHASE_SECONDS = Histogram(
+    "ecs_ingest_phase_seconds", "Time spent per ingestion phase (parse, validate, insert)",
+    ["endpoint", "phase"], buckets=LATENCY_BUCKETS,
+)
+VALIDATION_CACHE_TOTAL = Counter(
+    "ecs_validation_cache_total", "Dry-run cache lookups by outcome (local_hit, shared_hit, miss)", ["result"],
+)
+
+# DB
+DB_QUERY_SECONDS = Histogram(
+    "ecs_db_query_seconds", "SQL statement latency by statement type",
+    ["engine", "statement"], buckets=LATENCY_BUCKETS,
+)
+REPO_CALL_SECONDS = Histogram(
+    "ecs_repo_call_seconds", "Repository call latency",
+    ["repo", "operation"], buckets=LATENCY_BUCKETS,
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "ecs_db_pool_checked_out", "Connections currently checked out of the pool",
+    ["engine"], multiprocess_mode="livesum",
+)
+DB_POOL_CONNECTS_TOTAL = Counter(
+    "ecs_db_pool_connects_total", "New DB connections opened by the pool", ["engine"],
+)
+
+# Dispatch / broker
+DISPATCH_SECONDS = Histogram(
+    "ecs_dispatch_seconds", "Time to publish one job's tasks to the broker", buckets=LATENCY_BUCKETS,
+)
+DISPATCHED_TASKS_TOTAL = Counter("ecs_dispatched_tasks_total", "Tasks published to the broker")
+QUEUE_DEPTH = Gauge(
+    "ecs_queue_depth", "Messages waiting in a broker queue", ["queue"], multiprocess_mode="livemax",
+)
+
+# Scheduler
+SCHEDULER_RELEASED_TASKS_TOTAL = Counter(
+    "ecs_scheduler_released_tasks_total", "Tasks released by the fair-share scheduler", ["priority"],
+)
+SCHEDULER_IN_FLIGHT = Gauge(
+    "ecs_scheduler_in_flight_tasks", "Tasks holding a ready-window slot (QUEUED/RUNNING/RETRYING)",
+    multiprocess_mode="livemax",
+)
+
+# Reconciler
+RECONCILED_INSTANCES_TOTAL = Counter(
+    "ecs_reconciled_instances_total", "Instances checked by the reconciler by observed provider state",
+    ["cloud_state"],
+)
+RECONCILE_FAILED_TASKS_TOTAL = Counter(
+    "ecs_reconcile_failed_tasks_total", "Launched tasks failed because the instance never reached running",
+    ["cloud_state"],
+)
+RECONCILE_SECONDS = Histogram(
+    "ecs_reconcile_seconds", "Duration of one reconciler run", buckets=LATENCY_BUCKETS,
+)
+
+# Worker
+TASK_RUN_SECONDS = Histogram(
+    "ecs_task_run_seconds", "Celery task run time", ["task", "state"], buckets=LATENCY_BUCKETS,
+)
+TASK_RETRIES_TOTAL = Counter(
+    "ecs_task_retries_total", "Celery task retries by error class", ["task", "error_class"],
+)
+CIRCUIT_TRANSITIONS_TOTAL = Counter(
+    "ecs_circuit_transitions_total", "Circuit breaker state changes (open, half_open, closed)",
+    ["cloud", "region", "state"],
+)
+CIRCUIT_DEFERRED_TASKS_TOTAL = Counter(
+    "ecs_circuit_deferred_tasks_total", "Tasks paused (re-published with a countdown) while their circuit was open",
+    ["cloud", "region"],
+)
+RETRY_BUDGET_EXHAUSTED_TOTAL = Counter(
+    "ecs_retry_budget_exhausted_total", "Transient failures failed outright because the job's retry budget was spent",
+)
+RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "ecs_rate_limit_wait_seconds", "Time spent waiting for cloud API tokens",
+    ["cloud", "region"], buckets=(0, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+
+@contextmanager
+def observe(histogram, **labels):
+    """Time a block into histogram (labels optional)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        (histogram.labels(**labels) if labels else histogram).observe(time.perf_counter() - started)
+
+
+def timed(histogram, **labels):
+    """Decorator form of observe() for sync and async callables"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with observe(histogram, **labels):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with observe(histogram, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def metrics_registry():
+    """Registry to export: aggregated across processes in multiprocess mode"""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render_metrics():
+    return generate_latest(metrics_registry()), CONTENT_TYPE_LATEST
+
+
+# ------------------------------
+# Instrumentation hooks
+# ------------------------------
+def instrument_engine(engine, name: str):
+    """Statement timings + pool checkout gauge for a (sync or async) SQLAlchemy engine"""
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    # The start time lives on the statement's execution context: a statement that raises
+    # never reaches after_cursor_execute, and its context is simply dropped with it
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is None:
+            return
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERY_SECONDS.labels(engine=name, statement=verb).observe(time.perf_counter() - started)
+
+    @event.listens_for(sync_engine.pool, "checkout")
+    def _checkout(dbapi_conn, record, proxy):
+        DB_POOL_CHECKED_OUT.labels(engine=name).inc()
+
+    @event.listens_for(sync_engine.pool, "checkin")
+    def _checkin(dbapi_conn, record):
+        DB_POOL_CHECKED_OUT.labels(engine=name).dec()
+
+    @event.listens_for(sync_engine.pool, "connect")
+    def _connect(dbapi_conn, record):
+        DB_POOL_CONNECTS_TOTAL.labels(engine=name).inc()
+
+
+# One client (and connection pool) per broker URL, reused by every scrape
+_queue_depth_clients = {}
+
+
+def sample_queue_depth(broker_url: str, queues=("celery",)):
+    """Read broker queue lengths (Redis broker only; other brokers are skipped)"""
+    if not broker_url.startswith("redis"):
+        return
+    import redis
+
+    queues = list(queues)
+    client = _queue_depth_clients.get(broker_url)
+    if client is None:
+        client = _queue_depth_clients.setdefault(broker_url, redis.Redis.from_url(broker_url, socket_timeout=1))
+    try:
+        with client.pipeline(transaction=False) as pipe:
+            for queue in queues:
+                pipe.llen(queue)
+            depths = pipe.execute()
+    except redis.RedisError:
+        return
+    for queue, depth in zip(queues, depths):
+        QUEUE_DEPTH.labels(queue=queue).set(depth)
+
+
+def install_celery_metrics(port: int):
+    """Task run time / retries via Celery signals + an exporter in the worker main process"""
+    from celery import signals
+
+    started = {}
+
+    @signals.task_prerun.connect(weak=False)
+    def _prerun(task_id=None, task=None, **kwargs):
+        started[task_id] = time.perf_counter()
+
+    @signals.task_postrun.connect(weak=False)
+    def _postrun(task_id=None, task=None, state=None, **kwargs):
+        begin = started.pop(task_id, None)
+        if begin is not None:
+            TASK_RUN_SECONDS.labels(task=task.name, state=state or "UNKNOWN").observe(time.perf_counter() - begin)
+
+    @signals.task_retry.connect(weak=False)
+    def _retry(sender=None, reason=None, **kwargs):
+        TASK_RETRIES_TOTAL.labels(task=sender.name, error_class=type(reason).__name__).inc()
+
+    @signals.worker_init.connect(weak=False)
+    def _start_exporter(**kwargs):
+        # Runs once in the main process; prefork children only write multiprocess files
+        from prometheus_client import start_http_server
+
+        start_http_server(port, registry=metrics_registry())
+
+    @signals.worker_process_shutdown.connect(weak=False)
+    def _child_exit(pid=None, **kwargs):
+        if MULTIPROCESS:
+            multiprocess.mark_process_dead(pid or os.getpid())
+
+
+async def metrics_middleware(request, call_next):
+    """Per-route latency histogram (route template, not raw path, to bound cardinality)"""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.labels(
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status),
+        ).observe(time.perf_counter() - started)
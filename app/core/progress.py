@@ -0,0 +1,207 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, List, Set
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.core.config import settings
+
+# ------------------------------
+# Job progress fan-out
+# Workers publish a job snapshot (total/succeeded/failed/status) after every commit
+# that changed its counters. Each API process holds ONE subscription to
+# PROGRESS_CHANNEL and coalesces snapshots: watchers get at most one update per job
+# every PROGRESS_INTERVAL_SECONDS, however many tasks finished in between.
+# Sync sessions publish from an after_commit hook; AsyncSessions (flagged through
+# ASYNC_SESSION_INFO) publish with publish_queued_progress() after awaiting commit,
+# so the event loop never blocks on Redis.
+# ------------------------------
+
+logger = logging.getLogger(__name__)
+
+_SESSION_KEY = "job_progress"
+_ASYNC_FLAG = "async_session"
+# Session info for AsyncSessions (async_sessionmaker(info=...)): the sync hook leaves them alone
+ASYNC_SESSION_INFO = {_ASYNC_FLAG: True}
+
+
+def queue_progress(db, snapshot: Dict):
+    """Remember a job snapshot on the session; published only if the transaction commits"""
+    snapshot = dict(snapshot)
+    snapshot["job_id"] = snapshot.pop("id", snapshot.get("job_id"))
+    db.info.setdefault(_SESSION_KEY, {})[snapshot["job_id"]] = snapshot
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_after_commit(session):
+    if session.info.get(_ASYNC_FLAG):
+        return
+    snapshots = session.info.pop(_SESSION_KEY, None)
+    if snapshots:
+        try:
+            publish_progress(list(snapshots.values()))
+        except Exception:
+            # Progress is best effort: the committed state is still served by GET /jobs/{id}
+            logger.warning("Publishing job progress failed", exc_info=True)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_after_rollback(session):
+    session.info.pop(_SESSION_KEY, None)
+
+
+async def publish_queued_progress(db):
+    """AsyncSession counterpart of the after_commit hook: call once commit has returned"""
+    snapshots = db.info.pop(_SESSION_KEY, None)
+    if snapshots:
+        try:
+            await publish_progress_async(list(snapshots.values()))
+        except Exception:
+            logger.warning("Publishing job progress failed", exc_info=True)
+
+
+_redis = None
+_async_redis = None
+
+
+def publish_progress(snapshots: List[Dict]):
+    if settings.PROGRESS_BACKEND == "memory":
+        for snapshot in snapshots:
+            hub.ingest_threadsafe(snapshot)
+        return
+    global _redis
+    if _redis is None:
+        import redis
+
+        _redis = redis.Redis.from_url(settings.REDIS_URL)
+    pipe = _redis.pipeline(transaction=False)
+    for snapshot in snapshots:
+        pipe.publish(settings.PROGRESS_CHANNEL, json.dumps(snapshot))
+    pipe.execute()
+
+
+async def publish_progress_async(snapshots: List[Dict]):
+    if settings.PROGRESS_BACKEND == "memory":
+        for snapshot in snapshots:
+            hub.ingest(snapshot)
+        return
+    global _async_redis
+    if _async_redis is None:
+        import redis.asyncio as aioredis
+
+        _async_redis = aioredis.Redis.from_url(settings.REDIS_URL)
+    pipe = _async_redis.pipeline(transaction=False)
+    for snapshot in snapshots:
+        pipe.publish(settings.PROGRESS_CHANNEL, json.dumps(snapshot))
+    await pipe.execute()
+
+
+def _done(snapshot: Dict) -> int:
+    return (snapshot.get("succeeded") or 0) + (snapshot.get("failed") or 0)
+
+
+class ProgressHub:
+    """
+    Per-process fan-out of job snapshots to SSE watchers.
+    - One Redis subscription (started with the first watcher), shared by every job
+    - Snapshots for unwatched jobs are dropped on arrival
+    - Only the newest snapshot per job is kept (snapshots are absolute, so none are lost)
+    - A flush loop pushes dirty jobs to their watchers every interval
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._watchers: Dict[str, Set[asyncio.Queue]] = {}
+        self._latest: Dict[str, Dict] = {}
+        self._dirty: Set[str] = set()
+        self._tasks: List[asyncio.Task] = []
+        self._loop = None
+
+    def _ensure_started(self):
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._tasks.append(asyncio.create_task(self._flush_loop()))
+        if settings.PROGRESS_BACKEND != "memory":
+            self._tasks.append(asyncio.create_task(self._listen()))
+
+    def watch(self, job_id: str) -> asyncio.Queue:
+        self._ensure_started()
+        # maxsize=1: a slow client only ever has the newest snapshot waiting
+        queue = asyncio.Queue(maxsize=1)
+        self._watchers.setdefault(job_id, set()).add(queue)
+        return queue
+
+    def unwatch(self, job_id: str, queue: asyncio.Queue):
+        watchers = self._watchers.get(job_id)
+        if watchers is None:
+            return
+        watchers.discard(queue)
+        if not watchers:
+            del self._watchers[job_id]
+            self._latest.pop(job_id, None)
+            self._dirty.discard(job_id)
+
+    def ingest(self, snapshot: Dict):
+        job_id = snapshot.get("job_id")
+        if job_id not in self._watchers:
+            return
+        current = self._latest.get(job_id)
+        # Publishes from different workers can arrive out of order; counters only grow
+        if current is None or _done(snapshot) >= _done(current):
+            self._latest[job_id] = snapshot
+            self._dirty.add(job_id)
+
+    def ingest_threadsafe(self, snapshot: Dict):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self.ingest, snapshot)
+
+    def _flush(self):
+        dirty, self._dirty = self._dirty, set()
+        for job_id in dirty:
+            snapshot = self._latest.get(job_id)
+            for queue in self._watchers.get(job_id, ()):
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(snapshot)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self._flush()
+
+    async def _listen(self):
+        import redis.asyncio as aioredis
+
+        while True:
+            client = aioredis.Redis.from_url(settings.REDIS_URL)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(settings.PROGRESS_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.ingest(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Progress subscription lost; reconnecting", exc_info=True)
+                await asyncio.sleep(1)
+            finally:
+                await client.aclose()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+
+hub = ProgressHub(settings.PROGRESS_INTERVAL_SECONDS)
+
+
+def sse_event(data: Dict, event_name: str = "progress") -> str:
+    return f"event: {event_name}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def heartbeat() -> str:
+    return f": keepalive {int(time.time())}\n\n"
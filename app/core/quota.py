@@ -0,0 +1,239 @@
+import math
+import time
+from collections import OrderedDict, namedtuple
+from typing import Dict, Optional, Tuple
+from app.core.config import settings
+
+# ------------------------------
+# Per-user API quota (async, one Redis round trip per request)
+# Strategies:
+#   fixed_window   - per-window counter (cheapest; allows 2x at window edges)
+#   sliding_window - current + previous window counters, weighted by overlap (no edge bursts)
+#   gcra           - generic cell rate algorithm (spreads the quota evenly over the window)
+# Every strategy decides before it counts: rejected requests never use up quota.
+# ------------------------------
+
+QUOTA_STRATEGIES = ("fixed_window", "sliding_window", "gcra")
+
+# allowed: request may proceed; remaining: best-effort requests left; retry_after: seconds (0 if allowed)
+QuotaDecision = namedtuple("QuotaDecision", ["allowed", "remaining", "retry_after"])
+
+# GCRA with the Redis clock. KEYS[1] = TAT key; ARGV = emission interval (us), delay tolerance (us)
+# Returns {allowed (0/1), wait in microseconds, remaining}
+GCRA_LUA = """
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000000 + tonumber(t[2])
+
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+tat = math.max(tat, now)
+local new_tat = math.floor(tat + interval)
+local allow_at = new_tat - tolerance - interval
+if allow_at > now then
+  return {0, allow_at - now, 0}
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil((new_tat - now) / 1000) + 1000)
+return {1, 0, math.floor((tolerance + interval - (new_tat - now)) / interval)}
+"""
+
+
+# KEYS[1] = window counter; ARGV = limit, ttl (s). Returns {allowed (0/1), count incl. this request}
+FIXED_WINDOW_LUA = """
+local count = tonumber(redis.call('GET', KEYS[1]) or 0) + 1
+if count > tonumber(ARGV[1]) then
+  return {0, count}
+end
+redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return {1, count}
+"""
+
+# KEYS[1] = current window counter, KEYS[2] = previous; ARGV = limit, window, elapsed, ttl
+# Same arithmetic as _sliding_decision, so both sides agree on the outcome.
+# Returns {allowed (0/1), current count incl. this request, previous count}
+SLIDING_WINDOW_LUA = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local elapsed = tonumber(ARGV[3])
+local current = tonumber(redis.call('GET', KEYS[1]) or 0) + 1
+local previous = tonumber(redis.call('GET', KEYS[2]) or 0)
+if previous * (1 - elapsed / window) + current > limit then
+  return {0, current, previous}
+end
+redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return {1, current, previous}
+"""
+
+
+def _window(now: float, window: int) -> Tuple[int, float]:
+    """(window index, seconds elapsed in it)"""
+    index = int(now // window)
+    return index, now - index * window
+
+
+def _sliding_decision(current: int, previous: int, elapsed: float, window: int, limit: int) -> QuotaDecision:
+    """current includes the request being decided"""
+    weighted = previous * (1 - elapsed / window) + current
+    if weighted <= limit:
+        return QuotaDecision(True, max(0, int(limit - weighted)), 0.0)
+    if current <= limit and previous:
+        # Previous window's weight has to decay until the estimate fits again
+        retry_after = window * (1 - (limit - current) / previous) - elapsed
+    else:
+        retry_after = window - elapsed
+    return QuotaDecision(False, 0, max(1.0, retry_after))
+
+
+class InMemoryQuotaBackend:
+    """Process-local backend (tests / single-process dev); runs on the event loop thread"""
+
+    def __init__(self):
+        self._counters: Dict[str, Tuple[int, float]] = {}
+        self._tats: Dict[str, float] = {}
+
+    def _incr(self, key: str, ttl: float, now: float) -> int:
+        count, expires = self._counters.get(key, (0, 0.0))
+        if expires <= now:
+            count = 0
+        self._counters[key] = (count + 1, now + ttl)
+        return count + 1
+
+    def _get(self, key: str, now: float) -> int:
+        count, expires = self._counters.get(key, (0, 0.0))
+        return count if expires > now else 0
+
+    async def fixed_window(self, identity: str, limit: int, window: int) -> QuotaDecision:
+        now = time.time()
+        index, elapsed = _window(now, window)
+        key = f"quota:{identity}:{index}"
+        if self._get(key, now) >= limit:
+            return QuotaDecision(False, 0, window - elapsed)
+        count = self._incr(key, window - elapsed + 1, now)
+        return QuotaDecision(True, limit - count, 0.0)
+
+    async def sliding_window(self, identity: str, limit: int, window: int) -> QuotaDecision:
+        now = time.time()
+        index, elapsed = _window(now, window)
+        key = f"quota:{identity}:{index}"
+        previous = self._get(f"quota:{identity}:{index - 1}", now)
+        decision = _sliding_decision(self._get(key, now) + 1, previous, elapsed, window, limit)
+        if decision.allowed:
+            self._incr(key, 2 * window, now)
+        return decision
+
+    async def gcra(self, identity: str, limit: int, window: int) -> QuotaDecision:
+        now = time.time()
+        interval = window / limit
+        tolerance = window - interval
+        tat = max(self._tats.get(identity, now), now)
+        new_tat = tat + interval
+        allow_at = new_tat - tolerance - interval
+        if allow_at > now:
+            return QuotaDecision(False, 0, allow_at - now)
+        self._tats[identity] = new_tat
+        return QuotaDecision(True, int((tolerance + interval - (new_tat - now)) // interval), 0.0)
+
+
+class RedisQuotaBackend:
+    """
+    redis.asyncio backend over a bounded connection pool.
+    Every strategy is one EVALSHA (check, then count only if allowed).
+    """
+
+    def __init__(self, redis_url: str, pool_size: int):
+        import redis.asyncio as aioredis
+
+        self._pool = aioredis.ConnectionPool.from_url(redis_url, max_connections=pool_size)
+        self._client = aioredis.Redis(connection_pool=self._pool)
+        self._gcra = self._client.register_script(GCRA_LUA)
+        self._fixed = self._client.register_script(FIXED_WINDOW_LUA)
+        self._sliding = self._client.register_script(SLIDING_WINDOW_LUA)
+
+    async def fixed_window(self, identity: str, limit: int, window: int) -> QuotaDecision:
+        index, elapsed = _window(time.time(), window)
+        allowed, count = await self._fixed(keys=[f"quota:{identity}:{index}"], args=[limit, int(window - elapsed) + 1])
+        if allowed:
+            return QuotaDecision(True, limit - count, 0.0)
+        return QuotaDecision(False, 0, window - elapsed)
+
+    async def sliding_window(self, identity: str, limit: int, window: int) -> QuotaDecision:
+        index, elapsed = _window(time.time(), window)
+        _, current, previous = await self._sliding(
+            keys=[f"quota:{identity}:{index}", f"quota:{identity}:{index - 1}"],
+            args=[limit, window, repr(elapsed), 2 * window],
+        )
+        return _sliding_decision(current, previous, elapsed, window, limit)
+
+    async def gcra(self, identity: str, limit: int, window: int) -> QuotaDecision:
+        interval_us = max(1, window * 1_000_000 // limit)
+        allowed, wait_us, remaining = await self._gcra(
+            keys=[f"quota:gcra:{identity}"], args=[interval_us, window * 1_000_000 - interval_us]
+        )
+        return QuotaDecision(bool(allowed), int(remaining), int(wait_us) / 1_000_000)
+
+
+class QuotaLimiter:
+    """
+    Counts requests per identity and decides allow/reject.
+    Identities already over quota are remembered locally (bounded LRU) until their
+    retry_after passes, so repeat offenders are rejected without a Redis round trip.
+    """
+
+    def __init__(self, backend, limit: int, window: int, strategy: str = "fixed_window", local_cache_size: int = 10000):
+        if strategy not in QUOTA_STRATEGIES:
+            raise ValueError(f"Unknown quota strategy: {strategy} (expected one of {', '.join(QUOTA_STRATEGIES)})")
+        self.backend = backend
+        self.limit = limit
+        self.window = window
+        self.strategy = strategy
+        self.local_cache_size = local_cache_size
+        self._blocked: "OrderedDict[str, float]" = OrderedDict()
+
+    def blocked_for(self, identity: str) -> Optional[float]:
+        """Seconds left on a locally cached rejection (None if not cached)"""
+        until = self._blocked.get(identity)
+        if until is None:
+            return None
+        remaining = until - time.monotonic()
+        if remaining <= 0:
+            del self._blocked[identity]
+            return None
+        return remaining
+
+    def _remember(self, identity: str, retry_after: float):
+        self._blocked[identity] = time.monotonic() + retry_after
+        self._blocked.move_to_end(identity)
+        while len(self._blocked) > self.local_cache_size:
+            self._blocked.popitem(last=False)
+
+    async def hit(self, identity: str) -> QuotaDecision:
+        cached = self.blocked_for(identity)
+        if cached is not None:
+            return QuotaDecision(False, 0, cached)
+        decision = await getattr(self.backend, self.strategy)(identity, self.limit, self.window)
+        if not decision.allowed:
+            self._remember(identity, decision.retry_after)
+        return decision
+
+    @staticmethod
+    def retry_after_header(decision: QuotaDecision) -> str:
+        return str(max(1, math.ceil(decision.retry_after)))
+
+
+def build_quota() -> QuotaLimiter:
+    if settings.QUOTA_BACKEND == "redis" and settings.REDIS_URL:
+        backend = RedisQuotaBackend(settings.REDIS_URL, settings.QUOTA_REDIS_POOL_SIZE)
+    else:
+        backend = InMemoryQuotaBackend()
+    return QuotaLimiter(
+        backend,
+        limit=settings.DAILY_QUOTA,
+        window=settings.QUOTA_WINDOW_SECONDS,
+        strategy=settings.QUOTA_STRATEGY,
+        local_cache_size=settings.QUOTA_LOCAL_CACHE_SIZE,
+    )
+
+
+quota = build_quota()
@@ -0,0 +1,318 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from app.core.config import settings
+from app.core.metrics import CIRCUIT_TRANSITIONS_TOTAL, RETRY_BUDGET_EXHAUSTED_TOTAL
+from app.errors import CircuitOpenError
+
+# ------------------------------
+# Provider resilience, shared by every worker pod
+# - Circuit breaker per cloud + region: a brownout pauses calls instead of every
+#   task retrying on its own (closed -> open -> half_open -> closed)
+# - Retry budget per job: transient retries are capped at a fraction of the job
+# ------------------------------
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# Both scripts use the Redis server clock (ms) so pods with skewed clocks agree.
+# KEYS[1] = circuit hash {state, until, probes, failures, window_start}
+
+# ARGV = probes, open_ms. Returns {allowed (0/1), state seen, transition or "", wait_ms}
+CIRCUIT_ALLOW_LUA = """
+local probes = tonumber(ARGV[1])
+local open_ms = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local s = redis.call('HMGET', KEYS[1], 'state', 'until', 'probes')
+local state = s[1] or 'closed'
+if state == 'closed' then
+  return {1, state, '', 0}
+end
+local deadline = tonumber(s[2]) or 0
+if state == 'open' then
+  if now < deadline then
+    return {0, state, '', deadline - now}
+  end
+  redis.call('HSET', KEYS[1], 'state', 'half_open', 'until', now + open_ms, 'probes', probes - 1)
+  redis.call('PEXPIRE', KEYS[1], open_ms * 4)
+  return {1, 'half_open', 'half_open', 0}
+end
+local left = tonumber(s[3]) or 0
+if now >= deadline then
+  -- Probes were handed out but never reported (worker died): hand out a fresh set
+  left = probes
+  deadline = now + open_ms
+  redis.call('HSET', KEYS[1], 'until', deadline)
+end
+if left > 0 then
+  redis.call('HSET', KEYS[1], 'probes', left - 1)
+  return {1, state, '', 0}
+end
+return {0, state, '', deadline - now}
+"""
+
+# ARGV = ok (0/1), threshold, window_ms, open_ms. Returns the transition or ""
+CIRCUIT_RECORD_LUA = """
+local ok = tonumber(ARGV[1])
+local threshold = tonumber(ARGV[2])
+local window_ms = tonumber(ARGV[3])
+local open_ms = tonumber(ARGV[4])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local s = redis.call('HMGET', KEYS[1], 'state', 'failures', 'window_start')
+local state = s[1] or 'closed'
+if ok == 1 then
+  if state == 'half_open' then
+    redis.call('DEL', KEYS[1])
+    return 'closed'
+  end
+  return ''
+end
+if state == 'half_open' then
+  redis.call('HSET', KEYS[1], 'state', 'open', 'until', now + open_ms)
+  redis.call('PEXPIRE', KEYS[1], open_ms * 4)
+  return 'open'
+end
+if state == 'open' then
+  return ''
+end
+local failures = tonumber(s[2]) or 0
+local start = tonumber(s[3])
+if start == nil or now - start >= window_ms then
+  failures = 0
+  start = now
+end
+failures = failures + 1
+if failures >= threshold then
+  redis.call('HSET', KEYS[1], 'state', 'open', 'until', now + open_ms, 'failures', 0, 'window_start', now)
+  redis.call('PEXPIRE', KEYS[1], open_ms * 4)
+  return 'open'
+end
+redis.call('HSET', KEYS[1], 'failures', failures, 'window_start', start)
+redis.call('PEXPIRE', KEYS[1], window_ms + open_ms * 4)
+return ''
+"""
+
+# ARGV = probes. Hands back a half-open probe that was never used (at most `probes` held)
+CIRCUIT_RELEASE_LUA = """
+local s = redis.call('HMGET', KEYS[1], 'state', 'probes')
+if s[1] == 'half_open' and (tonumber(s[2]) or 0) < tonumber(ARGV[1]) then
+  redis.call('HINCRBY', KEYS[1], 'probes', 1)
+end
+return 1
+"""
+
+# KEYS[1] = budget counter; ARGV = requested, limit, ttl. Returns 1 when granted
+RETRY_BUDGET_LUA = """
+local used = redis.call('INCRBY', KEYS[1], ARGV[1])
+if used > tonumber(ARGV[2]) then
+  redis.call('DECRBY', KEYS[1], ARGV[1])
+  return 0
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+# Budgets outlive any job's retries (max TASK_MAX_RETRIES countdowns of RETRY_BACKOFF_CAP_SECONDS)
+RETRY_BUDGET_TTL = 24 * 3600
+
+
+class InMemoryResilienceBackend:
+    """Process-local backend (tests / single-process dev); same state machine as the Lua scripts"""
+
+    def __init__(self):
+        self._circuits: Dict[str, Dict] = {}
+        self._budgets: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _now_ms() -> float:
+        return time.monotonic() * 1000
+
+    def allow(self, key: str, probes: int, open_ms: int) -> Tuple[bool, str, str, float]:
+        now = self._now_ms()
+        with self._lock:
+            circuit = self._circuits.get(key)
+            state = circuit["state"] if circuit else CLOSED
+            if state == CLOSED:
+                return True, state, "", 0
+            if state == OPEN:
+                if now < circuit["until"]:
+                    return False, state, "", circuit["until"] - now
+                circuit.update(state=HALF_OPEN, until=now + open_ms, probes=probes - 1)
+                return True, HALF_OPEN, HALF_OPEN, 0
+            if now >= circuit["until"]:
+                circuit.update(until=now + open_ms, probes=probes)
+            if circuit["probes"] > 0:
+                circuit["probes"] -= 1
+                return True, state, "", 0
+            return False, state, "", circuit["until"] - now
+
+    def record(self, key: str, ok: bool, threshold: int, window_ms: int, open_ms: int) -> str:
+        now = self._now_ms()
+        with self._lock:
+            circuit = self._circuits.setdefault(key, {"state": CLOSED, "failures": 0, "window_start": now})
+            state = circuit["state"]
+            if ok:
+                if state == HALF_OPEN:
+                    del self._circuits[key]
+                    return CLOSED
+                return ""
+            if state == HALF_OPEN:
+                circuit.update(state=OPEN, until=now + open_ms)
+                return OPEN
+            if state == OPEN:
+                return ""
+            if now - circuit["window_start"] >= window_ms:
+                circuit.update(failures=0, window_start=now)
+            circuit["failures"] += 1
+            if circuit["failures"] >= threshold:
+                circuit.update(state=OPEN, until=now + open_ms, failures=0, window_start=now)
+                return OPEN
+            return ""
+
+    def release(self, key: str, probes: int):
+        with self._lock:
+            circuit = self._circuits.get(key)
+            if circuit and circuit["state"] == HALF_OPEN and circuit["probes"] < probes:
+                circuit["probes"] += 1
+
+    def spend(self, key: str, requested: int, limit: int, ttl: int) -> bool:
+        with self._lock:
+            used = self._budgets.get(key, 0) + requested
+            if used > limit:
+                return False
+            self._budgets[key] = used
+            return True
+
+
+class RedisResilienceBackend:
+    """Redis backend: one EVALSHA per check/record, atomic across pods"""
+
+    def __init__(self, redis_url: str):
+        import redis
+
+        self._client = redis.Redis.from_url(redis_url, decode_responses=True)
+        self._allow = self._client.register_script(CIRCUIT_ALLOW_LUA)
+        self._record = self._client.register_script(CIRCUIT_RECORD_LUA)
+        self._release = self._client.register_script(CIRCUIT_RELEASE_LUA)
+        self._spend = self._client.register_script(RETRY_BUDGET_LUA)
+
+    def allow(self, key: str, probes: int, open_ms: int) -> Tuple[bool, str, str, float]:
+        allowed, state, transition, wait_ms = self._allow(keys=[key], args=[probes, open_ms])
+        return bool(allowed), state, transition, float(wait_ms)
+
+    def record(self, key: str, ok: bool, threshold: int, window_ms: int, open_ms: int) -> str:
+        return self._record(keys=[key], args=[1 if ok else 0, threshold, window_ms, open_ms])
+
+    def release(self, key: str, probes: int):
+        self._release(keys=[key], args=[probes])
+
+    def spend(self, key: str, requested: int, limit: int, ttl: int) -> bool:
+        return bool(self._spend(keys=[key], args=[requested, limit, ttl]))
+
+
+class CircuitBreaker:
+    """
+    One circuit per (cloud, region), shared through the backend.
+    - before_call() returns the state seen (closed/half_open) or raises CircuitOpenError
+      with the seconds left; while half_open only `probes` callers get through
+    - record() after the provider answered: CIRCUIT_FAILURE_THRESHOLD transient failures
+      within the window open the circuit; a failed probe re-opens it, a good one closes it
+    - release() when the call was not made after all: a half-open probe goes back
+    - Successes seen in the closed state cost nothing (no backend call)
+    - Backend errors fail open (calls proceed as if closed): the breaker never blocks on Redis
+    Transitions are counted in ecs_circuit_transitions_total by the process that caused them.
+    """
+
+    def __init__(self, backend, threshold: int, window: float, open_for: float, probes: int):
+        self.backend = backend
+        self.threshold = threshold
+        self.window_ms = int(window * 1000)
+        self.open_ms = int(open_for * 1000)
+        self.probes = probes
+
+    @staticmethod
+    def circuit_key(cloud: str, region: str) -> str:
+        return f"cb:{cloud}:{region}"
+
+    def _transition(self, cloud: str, region: str, state: str):
+        if state:
+            CIRCUIT_TRANSITIONS_TOTAL.labels(cloud=cloud, region=region, state=state).inc()
+
+    def before_call(self, cloud: str, region: str) -> str:
+        try:
+            allowed, state, transition, wait_ms = self.backend.allow(self.circuit_key(cloud, region), self.probes, self.open_ms)
+        except Exception as e:
+            logger.warning("Circuit breaker unavailable (%s); calling %s/%s", e, cloud, region)
+            return CLOSED
+        self._transition(cloud, region, transition)
+        if not allowed:
+            raise CircuitOpenError(cloud, region, max(wait_ms, 0) / 1000)
+        return state
+
+    def record(self, cloud: str, region: str, ok: bool, state: str = HALF_OPEN):
+        """state: what before_call() returned (a closed-state success is not recorded)"""
+        if ok and state == CLOSED:
+            return
+        try:
+            transition = self.backend.record(self.circuit_key(cloud, region), ok, self.threshold, self.window_ms, self.open_ms)
+        except Exception as e:
+            logger.warning("Circuit breaker unavailable (%s); %s/%s result not recorded", e, cloud, region)
+            return
+        self._transition(cloud, region, transition)
+
+    def release(self, cloud: str, region: str, state: str):
+        """state: what before_call() returned; only a half-open probe needs handing back"""
+        if state != HALF_OPEN:
+            return
+        try:
+            self.backend.release(self.circuit_key(cloud, region), self.probes)
+        except Exception as e:
+            logger.warning("Circuit breaker unavailable (%s); %s/%s probe not released", e, cloud, region)
+
+
+class RetryBudget:
+    """
+    Per-job cap on transient retries: max(RETRY_BUDGET_MIN, RETRY_BUDGET_RATIO * job total).
+    Past it, transient failures fail the task instead of adding load to a struggling provider.
+    Backend errors grant the retry (TASK_MAX_RETRIES still bounds each task).
+    """
+
+    def __init__(self, backend, ratio: float, minimum: int):
+        self.backend = backend
+        self.ratio = ratio
+        self.minimum = minimum
+
+    def limit_for(self, total: Optional[int]) -> int:
+        return max(self.minimum, int((total or 0) * self.ratio))
+
+    def try_spend(self, job_id: str, total: Optional[int], n: int = 1) -> bool:
+        try:
+            granted = self.backend.spend(f"retrybudget:{job_id}", n, self.limit_for(total), RETRY_BUDGET_TTL)
+        except Exception as e:
+            logger.warning("Retry budget unavailable (%s); allowing retry for job %s", e, job_id)
+            return True
+        if not granted:
+            RETRY_BUDGET_EXHAUSTED_TOTAL.inc(n)
+        return granted
+
+
+def build_backend():
+    if settings.RESILIENCE_BACKEND == "redis" and settings.REDIS_URL:
+        return RedisResilienceBackend(settings.REDIS_URL)
+    return InMemoryResilienceBackend()
+
+
+_backend = build_backend()
+breaker = CircuitBreaker(
+    _backend,
+    threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+    window=settings.CIRCUIT_WINDOW_SECONDS,
+    open_for=settings.CIRCUIT_OPEN_SECONDS,
+    probes=settings.CIRCUIT_HALF_OPEN_PROBES,
+)
+retry_budget = RetryBudget(_backend, ratio=settings.RETRY_BUDGET_RATIO, minimum=settings.RETRY_BUDGET_MIN)
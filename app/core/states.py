@@ -0,0 +1,75 @@
+from typing import Dict, FrozenSet
+
+# ------------------------------
+# Job / task lifecycle
+# Transitions are enforced in SQL: every status UPDATE is guarded by
+# `status IN sources_for(target)`, so concurrent workers, redeliveries and the
+# reaper can never move a task backwards or out of a terminal state.
+# ------------------------------
+
+
+class TaskStatus:
+    PENDING = "PENDING"      # Row written, not yet published
+    QUEUED = "QUEUED"        # Published to the broker
+    RUNNING = "RUNNING"      # A worker is calling the provider (attempts counts these)
+    RETRYING = "RETRYING"    # Transient failure, Celery retry scheduled
+    SUCCESS = "SUCCESS"
+    FAILED = "FAILED"
+
+
+class JobStatus:
+    RECEIVING = "RECEIVING"  # NDJSON upload still open: tasks run while rows arrive, total still growing
+    PENDING = "PENDING"
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    SUCCESS = "SUCCESS"      # Every task succeeded
+    PARTIAL = "PARTIAL"      # Finished with both successes and failures
+    FAILED = "FAILED"        # Every task failed
+
+
+class CloudState:
+    """Provider-side state of a launched instance (tasks.cloud_state), kept by the reconciler"""
+    PENDING = "pending"        # Launch call returned; not yet seen running
+    RUNNING = "running"
+    STOPPED = "stopped"        # Reached the provider, then stopping/stopped
+    TERMINATED = "terminated"  # Shutting down or gone before it was seen running
+    MISSING = "missing"        # Not returned by describe calls (after RECONCILE_MISSING_GRACE_SECONDS)
+
+
+class JobPriority:
+    HIGH = "high"
+    NORMAL = "normal"
+    LOW = "low"
+
+
+JOB_PRIORITIES = (JobPriority.HIGH, JobPriority.NORMAL, JobPriority.LOW)
+
+
+TERMINAL_TASK_STATES: FrozenSet[str] = frozenset({TaskStatus.SUCCESS, TaskStatus.FAILED})
+TERMINAL_JOB_STATES: FrozenSet[str] = frozenset({JobStatus.SUCCESS, JobStatus.PARTIAL, JobStatus.FAILED})
+ACTIVE_JOB_STATES: FrozenSet[str] = frozenset({JobStatus.RECEIVING, JobStatus.PENDING, JobStatus.QUEUED, JobStatus.RUNNING})
+# Tasks holding a slot of the scheduler's ready window (published, not finished)
+IN_FLIGHT_TASK_STATES: FrozenSet[str] = frozenset({TaskStatus.QUEUED, TaskStatus.RUNNING, TaskStatus.RETRYING})
+
+# source -> allowed targets
+# Not listed: the reconciler's SUCCESS -> FAILED for an instance that never reached
+# running. It has its own guard (status SUCCESS and cloud_state pending), so a
+# redelivered worker failure can still never flip a SUCCESS task.
+TASK_TRANSITIONS: Dict[str, FrozenSet[str]] = {
+    TaskStatus.PENDING: frozenset({TaskStatus.QUEUED, TaskStatus.RUNNING, TaskStatus.FAILED}),
+    # QUEUED -> PENDING: publishing failed; the scheduler/reaper releases the task again
+    TaskStatus.QUEUED: frozenset({TaskStatus.RUNNING, TaskStatus.FAILED, TaskStatus.PENDING}),
+    # RUNNING -> RUNNING: the claim owner resuming after a worker crash
+    # RUNNING -> QUEUED: requeued by the stuck-task reaper
+    TaskStatus.RUNNING: frozenset({
+        TaskStatus.RUNNING, TaskStatus.SUCCESS, TaskStatus.FAILED, TaskStatus.RETRYING, TaskStatus.QUEUED,
+    }),
+    TaskStatus.RETRYING: frozenset({TaskStatus.RUNNING, TaskStatus.QUEUED, TaskStatus.FAILED}),
+    TaskStatus.SUCCESS: frozenset(),
+    TaskStatus.FAILED: frozenset(),
+}
+
+
+def sources_for(target: str) -> FrozenSet[str]:
+    """Statuses a task may be in to move to target (the SQL guard)"""
+    return frozenset(src for src, targets in TASK_TRANSITIONS.items() if target in targets)
@@ -0,0 +1,228 @@
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+from app.core.config import settings
+
+# ------------------------------
+# Distributed token bucket for outbound cloud API calls
+# (keyed by tenant + cloud + region, shared by every worker pod)
+# ------------------------------
+
+# Atomic refill + take. Uses the Redis server clock so pods with skewed clocks agree.
+# KEYS[1] = bucket hash; ARGV = rate (tokens/s), capacity, requested tokens
+# Returns 0 when granted, otherwise the wait in microseconds until enough tokens exist.
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000000 + tonumber(t[2])
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil then
+  tokens = capacity
+  ts = now
+end
+
+tokens = math.min(capacity, tokens + (math.max(0, now - ts) / 1000000) * rate)
+local wait = 0
+if tokens >= requested then
+  tokens = tokens - requested
+else
+  wait = math.ceil((requested - tokens) / rate * 1000000)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return wait
+"""
+
+# Partial take for batches: grants whatever whole tokens exist, up to ARGV[3].
+# Returns {granted, wait in microseconds until the rest (capped at capacity) could be there}
+TOKEN_TAKE_LUA = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000000 + tonumber(t[2])
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil then
+  tokens = capacity
+  ts = now
+end
+
+tokens = math.min(capacity, tokens + (math.max(0, now - ts) / 1000000) * rate)
+local granted = math.min(requested, math.floor(tokens))
+tokens = tokens - granted
+local wait = 0
+if granted < requested then
+  wait = math.ceil((math.min(requested - granted, capacity) - tokens) / rate * 1000000)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return {granted, wait}
+"""
+
+
+class InMemoryTokenBucketBackend:
+    """Process-local backend (tests / single-process dev)"""
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, key: str, requested: int, rate: float, capacity: int) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, ts = self._buckets.get(key, (float(capacity), now))
+            tokens = min(capacity, tokens + max(0.0, now - ts) * rate)
+            wait = 0.0
+            if tokens >= requested:
+                tokens -= requested
+            else:
+                wait = (requested - tokens) / rate
+            self._buckets[key] = (tokens, now)
+        return wait
+
+    def try_take(self, key: str, requested: int, rate: float, capacity: int) -> Tuple[int, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, ts = self._buckets.get(key, (float(capacity), now))
+            tokens = min(capacity, tokens + max(0.0, now - ts) * rate)
+            granted = min(requested, int(tokens))
+            tokens -= granted
+            wait = 0.0
+            if granted < requested:
+                wait = (min(requested - granted, capacity) - tokens) / rate
+            self._buckets[key] = (tokens, now)
+        return granted, wait
+
+
+class RedisTokenBucketBackend:
+    """Redis backend: one EVALSHA round trip per attempt, atomic across pods"""
+
+    def __init__(self, redis_url: str):
+        import redis
+
+        self._client = redis.Redis.from_url(redis_url)
+        self._script = self._client.register_script(TOKEN_BUCKET_LUA)
+        self._take = self._client.register_script(TOKEN_TAKE_LUA)
+
+    def try_acquire(self, key: str, requested: int, rate: float, capacity: int) -> float:
+        wait_us = self._script(keys=[key], args=[rate, capacity, requested])
+        return int(wait_us) / 1_000_000
+
+    def try_take(self, key: str, requested: int, rate: float, capacity: int) -> Tuple[int, float]:
+        granted, wait_us = self._take(keys=[key], args=[rate, capacity, requested])
+        return int(granted), int(wait_us) / 1_000_000
+
+
+class TokenBucketLimiter:
+    """
+    Smooths provider API calls to `rate` tokens/s with bursts up to `capacity`.
+    - acquire() blocks (time.sleep), acquire_async() awaits (asyncio.sleep)
+    - Per cloud/region limits come from CLOUD_RATE_LIMIT_OVERRIDES ("aws:us-east-1": 50)
+    - on_wait (blocking variants) is called before each sleep, e.g. to heartbeat a claim
+    All return the seconds spent waiting.
+    """
+
+    def __init__(self, backend, rate: float, capacity: int, overrides: Optional[Dict[str, float]] = None):
+        self.backend = backend
+        self.rate = rate
+        self.capacity = capacity
+        self.overrides = overrides or {}
+
+    def limits_for(self, cloud: str, region: str) -> Tuple[float, int]:
+        rate = self.overrides.get(f"{cloud}:{region}", self.overrides.get(cloud, self.rate))
+        # Keep the burst proportional when a region/cloud gets its own rate
+        capacity = max(1, int(round(self.capacity * rate / self.rate)))
+        return rate, capacity
+
+    @staticmethod
+    def bucket_key(tenant: str, cloud: str, region: str) -> str:
+        return f"tb:{tenant or 'default'}:{cloud}:{region}"
+
+    def _check(self, tenant, cloud, region, n) -> Tuple[str, float, int]:
+        rate, capacity = self.limits_for(cloud, region)
+        if n > capacity:
+            raise ValueError(f"Cannot acquire {n} tokens at once (bucket capacity {capacity})")
+        return self.bucket_key(tenant, cloud, region), rate, capacity
+
+    def try_acquire(self, tenant: str, cloud: str, region: str, n: int = 1) -> float:
+        """Single attempt: 0.0 if granted, else seconds until it could be"""
+        key, rate, capacity = self._check(tenant, cloud, region, n)
+        return self.backend.try_acquire(key, n, rate, capacity)
+
+    def acquire(
+        self, tenant: str, cloud: str, region: str, n: int = 1, timeout: Optional[float] = None,
+        on_wait: Optional[Callable[[], None]] = None,
+    ) -> float:
+        key, rate, capacity = self._check(tenant, cloud, region, n)
+        started = time.monotonic()
+        while True:
+            wait = self.backend.try_acquire(key, n, rate, capacity)
+            if wait <= 0:
+                return time.monotonic() - started
+            if timeout is not None and time.monotonic() - started + wait > timeout:
+                raise TimeoutError(f"Rate limit wait for {key} exceeds {timeout}s")
+            if on_wait:
+                on_wait()
+            time.sleep(wait)
+
+    def acquire_many(
+        self, tenant: str, cloud: str, region: str, n: int, timeout: Optional[float] = None,
+        on_wait: Optional[Callable[[], None]] = None,
+    ) -> float:
+        """
+        acquire() for batches (may exceed the bucket): each round takes whatever tokens are
+        there, up to what is still missing, so single-token callers draining the bucket
+        cannot starve a batch that waits for a full one. timeout bounds the whole batch.
+        """
+        rate, capacity = self.limits_for(cloud, region)
+        key = self.bucket_key(tenant, cloud, region)
+        started = time.monotonic()
+        while n > 0:
+            granted, wait = self.backend.try_take(key, n, rate, capacity)
+            n -= granted
+            if n <= 0:
+                break
+            if timeout is not None and time.monotonic() - started + wait > timeout:
+                raise TimeoutError(f"Rate limit wait for {key} exceeds {timeout}s")
+            if on_wait:
+                on_wait()
+            time.sleep(wait)
+        return time.monotonic() - started
+
+    async def acquire_async(self, tenant: str, cloud: str, region: str, n: int = 1, timeout: Optional[float] = None) -> float:
+        key, rate, capacity = self._check(tenant, cloud, region, n)
+        started = time.monotonic()
+        while True:
+            wait = await asyncio.to_thread(self.backend.try_acquire, key, n, rate, capacity)
+            if wait <= 0:
+                return time.monotonic() - started
+            if timeout is not None and time.monotonic() - started + wait > timeout:
+                raise TimeoutError(f"Rate limit wait for {key} exceeds {timeout}s")
+            await asyncio.sleep(wait)
+
+
+def build_limiter() -> TokenBucketLimiter:
+    if settings.CLOUD_RATE_LIMIT_BACKEND == "redis" and settings.REDIS_URL:
+        backend = RedisTokenBucketBackend(settings.REDIS_URL)
+    else:
+        backend = InMemoryTokenBucketBackend()
+    return TokenBucketLimiter(
+        backend,
+        rate=settings.CLOUD_RATE_LIMIT_PER_SEC,
+        capacity=settings.CLOUD_RATE_LIMIT_BURST,
+        overrides=settings.CLOUD_RATE_LIMIT_OVERRIDES,
+    )
+
+
+limiter = build_limiter()
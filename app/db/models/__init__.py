@@ -1,2 +1,3 @@
 from .job import Job
 from .task import Task
+from .launch_template import LaunchTemplate
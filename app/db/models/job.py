@@ -1,13 +1,19 @@
 
-from sqlalchemy import Column, Integer, String, DateTime, JSON
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Index
 from sqlalchemy.sql import func
 from app.db.base import Base
 
 class Job(Base):
     __tablename__ = "jobs"
+    __table_args__ = (
+        # Client batch IDs are idempotency keys per submitter, not globally
+        Index("ix_jobs_submitter_batch_id", "submitter", "batch_id", unique=True),
+    )
     id = Column(String, primary_key=True)
-    submitter = Column(String, nullable=True)
-    status = Column(String, default="PENDING")
+    batch_id = Column(String, nullable=True)  # Client batch ID (idempotency, unique per submitter)
+    submitter = Column(String, nullable=True)  # Authenticated caller (app.core.auth.submitter_principal)
+    status = Column(String, default="PENDING", index=True)
+    priority = Column(String, default="normal")  # JobPriority: scheduler weight + Celery queue
     total = Column(Integer, default=0)
     succeeded = Column(Integer, default=0)
     failed = Column(Integer, default=0)
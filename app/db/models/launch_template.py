@@ -0,0 +1,10 @@
+from sqlalchemy import Column, String, DateTime, JSON
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+class LaunchTemplate(Base):
+    """Launch fields shared by many tasks; id is a content hash, so identical templates are stored once"""
+    __tablename__ = "launch_templates"
+    id = Column(String, primary_key=True)
+    params = Column(JSON)
+    created_at = Column(DateTime, server_default=func.now())
@@ -1,18 +1,31 @@
 
-from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey, Index
 from sqlalchemy.sql import func
 from app.db.base import Base
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Keyset pagination on (job_id, index), optionally filtered by status
+        Index("ix_tasks_job_id_index", "job_id", "index", unique=True),
+        Index("ix_tasks_job_id_status_index", "job_id", "status", "index"),
+        # Stuck-task reaper: RUNNING/RETRYING/QUEUED rows ordered by last transition
+        Index("ix_tasks_status_updated_at", "status", "updated_at"),
+        # Reconciler: launched instances not yet confirmed, least recently checked first
+        Index("ix_tasks_cloud_state_reconciled_at", "cloud_state", "reconciled_at"),
+    )
     id = Column(String, primary_key=True)
     job_id = Column(String, ForeignKey('jobs.id'), index=True)
     index = Column(Integer)
-    params = Column(JSON)
+    template_id = Column(String, ForeignKey('launch_templates.id'), nullable=True)  # Shared launch fields
+    params = Column(JSON)  # Per-row deltas when template_id is set, full params otherwise
     status = Column(String, default='PENDING')
     attempts = Column(Integer, default=0)
     last_error = Column(String, nullable=True)
     cloud_instance_id = Column(String, nullable=True)
+    cloud_state = Column(String, nullable=True)  # CloudState once launched (confirmed by the reconciler)
+    reconciled_at = Column(DateTime, nullable=True)  # Last describe call that covered this instance
+    published_at = Column(DateTime, nullable=True)  # Last publish to the broker; NULL while QUEUED = never published
     idempotency_key = Column(String, nullable=True, index=True)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, onupdate=func.now())
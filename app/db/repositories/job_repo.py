@@ -1,11 +1,131 @@
 
 import uuid
+from sqlalchemy import case, select, tuple_, update
+from app.core.progress import publish_queued_progress, queue_progress
+from app.core.states import JobPriority, JobStatus
 from app.db.models.job import Job
 
+def derived_job_status(succeeded, failed, sealing=False):
+    """
+    SQL status of a job from its counters (succeeded/failed may be expressions of the new values).
+    A RECEIVING job keeps its status until the upload is sealed (total is still growing);
+    sealing=True derives it anyway, and an upload that produced no tasks ends FAILED.
+    """
+    if sealing:
+        first = (Job.total == 0, JobStatus.FAILED)
+    else:
+        first = (Job.status == JobStatus.RECEIVING, JobStatus.RECEIVING)
+    return case(
+        first,
+        (succeeded + failed < Job.total, JobStatus.RUNNING),
+        (failed == 0, JobStatus.SUCCESS),
+        (succeeded == 0, JobStatus.FAILED),
+        else_=JobStatus.PARTIAL,
+    )
+
 class JobRepo:
     @staticmethod
-    def create(db, submitter, total, meta=None):
-        job = Job(id=str(uuid.uuid4()), submitter=submitter, total=total, meta=meta)
+    def create(db, submitter, total, meta=None, commit=True, batch_id=None, priority=None):
+        job = Job(
+            id=str(uuid.uuid4()), batch_id=batch_id, submitter=submitter, total=total, meta=meta,
+            priority=priority or JobPriority.NORMAL,
+        )
         db.add(job)
+        if commit:
+            db.commit()
+        else:
+            db.flush()
+        return job
+
+    @staticmethod
+    def get_by_batch_id(db, submitter, batch_id):
+        """The submitter's job for batch_id (batch IDs of other submitters are invisible)"""
+        return db.execute(
+            select(Job).where(Job.submitter == submitter, Job.batch_id == batch_id)
+        ).scalar_one_or_none()
+
+    @staticmethod
+    def get_total(db, job_id):
+        return db.execute(select(Job.total).where(Job.id == job_id)).scalar_one_or_none()
+
+    @staticmethod
+    def update_meta(db, job_id, **fields):
+        job = db.get(Job, job_id)
+        job.meta = {**(job.meta or {}), **fields}
         db.commit()
         return job
+
+class AsyncJobRepo:
+    """AsyncSession variant of JobRepo for the FastAPI request path"""
+
+    @staticmethod
+    async def create(db, submitter, total, meta=None, commit=True, batch_id=None, priority=None, status=None):
+        job = Job(
+            id=str(uuid.uuid4()), batch_id=batch_id, submitter=submitter, total=total, meta=meta,
+            priority=priority or JobPriority.NORMAL, status=status or JobStatus.PENDING,
+        )
+        db.add(job)
+        if commit:
+            await db.commit()
+        else:
+            await db.flush()
+        return job
+
+    @staticmethod
+    async def create_many(db, rows):
+        """Add several jobs in one flush; rows are dicts of Job columns (id generated)"""
+        jobs = [Job(id=str(uuid.uuid4()), **row) for row in rows]
+        db.add_all(jobs)
+        await db.flush()
+        return jobs
+
+    @staticmethod
+    async def get(db, job_id):
+        return await db.get(Job, job_id)
+
+    @staticmethod
+    async def owned_by(db, submitter, job_id):
+        """True when job_id exists and was submitted by submitter"""
+        result = await db.execute(select(Job.id).where(Job.id == job_id, Job.submitter == submitter))
+        return result.first() is not None
+
+    @staticmethod
+    async def get_by_batch_id(db, submitter, batch_id):
+        result = await db.execute(select(Job).where(Job.submitter == submitter, Job.batch_id == batch_id))
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def existing_batch_jobs(db, keys):
+        """{(submitter, batch_id): job_id} for the keys that already have a job (one IN query)"""
+        if not keys:
+            return {}
+        result = await db.execute(
+            select(Job.submitter, Job.batch_id, Job.id).where(tuple_(Job.submitter, Job.batch_id).in_(keys))
+        )
+        return {(submitter, batch_id): job_id for submitter, batch_id, job_id in result.all()}
+
+    @staticmethod
+    async def add_to_total(db, job_id, count):
+        """Grow total as rows of an open upload are written (same transaction as the tasks)"""
+        await db.execute(update(Job).where(Job.id == job_id).values(total=Job.total + count))
+
+    @staticmethod
+    async def seal(db, job_id, **meta_fields):
+        """
+        RECEIVING -> status derived from the counters, once the upload has ended (meta_fields merged into meta).
+        Workers may have finished every task already, so this can land directly on SUCCESS/PARTIAL/FAILED.
+        """
+        values = {}
+        if meta_fields:
+            meta = (await db.execute(select(Job.meta).where(Job.id == job_id))).scalar_one_or_none()
+            values["meta"] = {**(meta or {}), **meta_fields}
+        snapshot = (await db.execute(
+            update(Job).where(Job.id == job_id, Job.status == JobStatus.RECEIVING).values(
+                status=derived_job_status(Job.succeeded, Job.failed, sealing=True), **values,
+            )
+            .returning(Job.id, Job.total, Job.succeeded, Job.failed, Job.status)
+        )).first()
+        if snapshot is not None:
+            queue_progress(db, snapshot._asdict())
+        await db.commit()
+        await publish_queued_progress(db)
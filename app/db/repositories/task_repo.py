@@ -1,26 +1,511 @@
 
 import uuid
+from collections import Counter, namedtuple
+from sqlalchemy import String, and_, case, column, func, insert, or_, select, update, values
+from app.core.config import settings
+from app.core.idempotency import idempotency_key
+from app.core.metrics import REPO_CALL_SECONDS, timed
+from app.core.progress import queue_progress
+from app.core.states import (
+    ACTIVE_JOB_STATES, IN_FLIGHT_TASK_STATES, CloudState, JobPriority, JobStatus, TaskStatus, sources_for,
+)
+from app.db.models.job import Job
 from app.db.models.task import Task
+from app.db.repositories.job_repo import derived_job_status
+from app.db.repositories.template_repo import (
+    AsyncLaunchTemplateRepo, LaunchTemplateRepo, split_params, template_id_for,
+)
+
+# Lightweight handle returned by bulk_create (all the dispatcher needs)
+TaskRef = namedtuple("TaskRef", ["id", "index"])
+
+# Terminal result of one task for finish_many (status is SUCCESS or FAILED)
+TaskOutcome = namedtuple("TaskOutcome", ["task_id", "status", "instance_id", "error"])
+
+# Columns a task page may project. params (holds login_password), template_id and
+# idempotency_key are internal and never served.
+TASK_PAGE_COLUMNS = [
+    "id", "index", "status", "attempts", "last_error",
+    "cloud_instance_id", "cloud_state", "created_at", "updated_at",
+]
+TASK_SELECTABLE_COLUMNS = set(TASK_PAGE_COLUMNS)
+
+def iter_task_row_chunks(job_id, instances, start_index=0, chunk_size=None, batch_id=None, submitter=None):
+    """
+    Yield (rows, refs, templates) per insert chunk; shared by the sync and async repos.
+    Shared launch fields go to a content-addressed template; rows keep only the deltas.
+    templates maps template_id -> params for templates first seen in this chunk.
+    Idempotency keys come from (submitter, batch_id, index), or from job_id without a batch_id.
+    """
+    chunk_size = chunk_size or settings.TASK_INSERT_CHUNK_SIZE
+    key_prefix = batch_id or job_id
+    template_ids = {}
+    rows, refs, templates = [], [], {}
+    for idx, inst in enumerate(instances, start=start_index):
+        task_id = str(uuid.uuid4())
+        template, delta = split_params(inst.dict())
+        # Hash each distinct template once per call, not once per row
+        cache_key = tuple(tuple(v) if isinstance(v, list) else v for v in template.values())
+        template_id = template_ids.get(cache_key)
+        if template_id is None:
+            template_id = template_ids[cache_key] = template_id_for(template)
+            templates[template_id] = template
+        rows.append({
+            "id": task_id, "job_id": job_id, "index": idx, "template_id": template_id, "params": delta,
+            "idempotency_key": idempotency_key(key_prefix, idx, submitter if batch_id else None),
+        })
+        refs.append(TaskRef(task_id, idx))
+        if len(rows) >= chunk_size:
+            yield rows, refs, templates
+            rows, refs, templates = [], [], {}
+    if rows:
+        yield rows, refs, templates
 
 class TaskRepo:
     @staticmethod
-    def bulk_create(db, job_id, instances):
-        tasks = []
-        for idx, inst in enumerate(instances):
-            t = Task(id=str(uuid.uuid4()), job_id=job_id, index=idx, params=inst.dict())
-            db.add(t)
-            tasks.append(t)
-        db.commit()
-        return tasks
+    @timed(REPO_CALL_SECONDS, repo="task", operation="bulk_create")
+    def bulk_create(db, job_id, instances, start_index=0, commit=True, chunk_size=None, batch_id=None, submitter=None):
+        """
+        Insert tasks with one multi-row INSERT ... VALUES per chunk (Core, no ORM objects).
+        Returns TaskRef(id, index) tuples; commit=False leaves the transaction open so the
+        caller can commit the job row and its tasks together.
+        """
+        all_refs = []
+        for rows, refs, templates in iter_task_row_chunks(job_id, instances, start_index, chunk_size, batch_id, submitter):
+            LaunchTemplateRepo.ensure_many(db, templates)
+            db.execute(insert(Task).values(rows))
+            all_refs.extend(refs)
+        if commit:
+            db.commit()
+        return all_refs
 
     @staticmethod
+    @timed(REPO_CALL_SECONDS, repo="task", operation="list_by_job")
     def list_by_job(job_id, db):
         return db.query(Task).filter(Task.job_id==job_id).all()
 
     @staticmethod
+    def get(db, task_id):
+        return db.get(Task, task_id)
+
+    @staticmethod
+    @timed(REPO_CALL_SECONDS, repo="task", operation="get_with_tenant")
+    def get_with_tenant(db, task_id):
+        """Task plus its job's submitter (the rate-limit tenant) in one query"""
+        row = db.execute(
+            select(Task, Job.submitter).join(Job, Job.id == Task.job_id).where(Task.id == task_id)
+        ).first()
+        if row is None:
+            return None, None
+        return row[0], row[1] or "default"
+
+    @staticmethod
+    @timed(REPO_CALL_SECONDS, repo="task", operation="get_many_with_tenant")
+    def get_many_with_tenant(db, task_ids):
+        """[(task, tenant)] for several tasks in one query (missing ids are skipped)"""
+        rows = db.execute(
+            select(Task, Job.submitter).join(Job, Job.id == Task.job_id).where(Task.id.in_(task_ids))
+        ).all()
+        return [(task, submitter or "default") for task, submitter in rows]
+
+    @staticmethod
+    @timed(REPO_CALL_SECONDS, repo="task", operation="transition_many")
+    def transition_many(db, task_ids, target, count_attempt=False, commit=True, **values):
+        """
+        Move many tasks to target in one guarded UPDATE (status IN sources_for(target)).
+        Stamps updated_at; count_attempt bumps attempts. Returns [(task_id, job_id)] actually moved.
+        """
+        if not task_ids:
+            return []
+        extra = {"attempts": func.coalesce(Task.attempts, 0) + 1} if count_attempt else {}
+        moved = db.execute(
+            update(Task)
+            .where(Task.id.in_(task_ids), Task.status.in_(sources_for(target)))
+            .values(status=target, updated_at=func.now(), **extra, **values)
+            .returning(Task.id, Task.job_id)
+        ).all()
+        if commit:
+            db.commit()
+        return [tuple(row) for row in moved]
+
+    @staticmethod
+    def mark_queued(db, job_id, task_ids):
+        """PENDING -> QUEUED for tasks about to be published; job PENDING -> QUEUED"""
+        moved = TaskRepo.transition_many(db, task_ids, TaskStatus.QUEUED, commit=False, published_at=None)
+        TaskRepo._advance_jobs(db, [job_id], JobStatus.QUEUED, [JobStatus.PENDING])
+        db.commit()
+        return moved
+
+    @staticmethod
+    def mark_published(db, task_ids):
+        """Stamp published_at once the broker accepted the messages (updated_at is left alone)"""
+        if not task_ids:
+            return
+        db.execute(
+            update(Task)
+            .where(Task.id.in_(task_ids))
+            .values(published_at=func.now(), updated_at=Task.updated_at)
+        )
+        db.commit()
+
+    @staticmethod
+    def unmark_queued(db, task_ids):
+        """QUEUED -> PENDING for tasks whose publish failed, so they are released again"""
+        return TaskRepo.transition_many(db, task_ids, TaskStatus.PENDING)
+
+    @staticmethod
+    def start_many(db, task_ids):
+        """-> RUNNING (attempts + 1) for tasks a worker is about to launch; their jobs -> RUNNING"""
+        moved = TaskRepo.transition_many(db, task_ids, TaskStatus.RUNNING, count_attempt=True, commit=False)
+        TaskRepo._advance_jobs(db, {job_id for _, job_id in moved}, JobStatus.RUNNING, [JobStatus.PENDING, JobStatus.QUEUED])
+        db.commit()
+        return [task_id for task_id, _ in moved]
+
+    @staticmethod
+    def mark_retrying(db, task_ids, error):
+        """RUNNING -> RETRYING once a Celery retry has been decided"""
+        return TaskRepo.transition_many(db, task_ids, TaskStatus.RETRYING, last_error=error)
+
+    @staticmethod
+    def db_now(db):
+        """
+        Current time on the database clock (the one updated_at is stamped with), naive like
+        the timestamp columns so it can be compared and subtracted in Python too.
+        """
+        return db.execute(select(func.now())).scalar_one().replace(tzinfo=None)
+
+    @staticmethod
+    @timed(REPO_CALL_SECONDS, repo="task", operation="find_stuck")
+    def find_stuck(db, running_before, retrying_before, unpublished_before, limit, include_pending=False):
+        """
+        Tasks the reaper should put back on the broker (ix_tasks_status_updated_at):
+        - RUNNING not touched since running_before (worker died mid-call)
+        - RETRYING not touched since retrying_before (retry message lost)
+        - QUEUED and never published since unpublished_before (process died before publishing);
+          published ones are left alone, their message is still on the broker
+        - include_pending: PENDING since unpublished_before (dispatch thread died before
+          publishing; only when no scheduler releases PENDING tasks)
+        Rows: id, status, attempts, idempotency_key and the job's priority.
+        """
+        last_change = func.coalesce(Task.updated_at, Task.created_at)
+        stale = [
+            and_(Task.status == TaskStatus.RUNNING, Task.updated_at < running_before),
+            and_(Task.status == TaskStatus.RETRYING, Task.updated_at < retrying_before),
+            and_(
+                Task.status == TaskStatus.QUEUED, Task.published_at.is_(None),
+                Task.updated_at < unpublished_before,
+            ),
+        ]
+        if include_pending:
+            stale.append(and_(Task.status == TaskStatus.PENDING, last_change < unpublished_before))
+        return db.execute(
+            select(Task.id, Task.status, Task.attempts, Task.idempotency_key, Job.priority)
+            .join(Job, Job.id == Task.job_id)
+            .where(or_(*stale))
+            .order_by(last_change)
+            .limit(limit)
+        ).all()
+
+    @staticmethod
+    def touch_queued(db, task_ids):
+        """Restamp updated_at of tasks still QUEUED and unpublished (about to be published); returns [(task_id, job_id)]"""
+        if not task_ids:
+            return []
+        touched = db.execute(
+            update(Task)
+            .where(Task.id.in_(task_ids), Task.status == TaskStatus.QUEUED, Task.published_at.is_(None))
+            .values(updated_at=func.now())
+            .returning(Task.id, Task.job_id)
+        ).all()
+        db.commit()
+        return [tuple(row) for row in touched]
+
+    @staticmethod
+    @timed(REPO_CALL_SECONDS, repo="task", operation="in_flight_by_job")
+    def in_flight_by_job(db):
+        """{job_id: published-but-unfinished tasks}; bounded by the ready window (ix_tasks_status_updated_at)"""
+        rows = db.execute(
+            select(Task.job_id, func.count())
+            .where(Task.status.in_(IN_FLIGHT_TASK_STATES))
+            .group_by(Task.job_id)
+        ).all()
+        return {job_id: count for job_id, count in rows}
+
+    @staticmethod
+    @timed(REPO_CALL_SECONDS, repo="task", operation="pending_by_job")
+    def pending_by_job(db):
+        """Active jobs with PENDING tasks: (job_id, tenant, priority, created_at, pending), oldest first"""
+        rows = db.execute(
+            select(Job.id, Job.submitter, Job.priority, Job.created_at, func.count(Task.id))
+            .join(Task, Task.job_id == Job.id)
+            .where(Job.status.in_(ACTIVE_JOB_STATES), Task.status == TaskStatus.PENDING)
+            .group_by(Job.id, Job.submitter, Job.priority, Job.created_at)
+            .order_by(Job.created_at, Job.id)
+        ).all()
+        return [
+            (job_id, submitter or "default", priority or JobPriority.NORMAL, created_at, pending)
+            for job_id, submitter, priority, created_at, pending in rows
+        ]
+
+    @staticmethod
+    @timed(REPO_CALL_SECONDS, repo="task", operation="pending_ids")
+    def pending_ids(db, job_id, limit):
+        """Next `limit` PENDING task ids of a job in index order (ix_tasks_job_id_status_index)"""
+        return list(db.execute(
+            select(Task.id)
+            .where(Task.job_id == job_id, Task.status == TaskStatus.PENDING)
+            .order_by(Task.index)
+            .limit(limit)
+        ).scalars())
+
+    @staticmethod
+    @timed(REPO_CALL_SECONDS, repo="task", operation="mark_success")
     def mark_success(db, task_id, instance_id):
-        t = db.query(Task).get(task_id)
-        t.status = 'SUCCESS'
-        t.cloud_instance_id = instance_id
+        """Flip the task to SUCCESS and bump jobs.succeeded in the same transaction"""
+        job_id = TaskRepo._finish(db, task_id, TaskStatus.SUCCESS, cloud_instance_id=instance_id, cloud_state=CloudState.PENDING)
+        if job_id is not None:
+            TaskRepo._bump_job(db, job_id, succeeded=1)
+        db.commit()
+        return job_id is not None
+
+    @staticmethod
+    @timed(REPO_CALL_SECONDS, repo="task", operation="mark_failed")
+    def mark_failed(db, task_id, error):
+        """Flip the task to FAILED and bump jobs.failed in the same transaction"""
+        job_id = TaskRepo._finish(db, task_id, TaskStatus.FAILED, last_error=error)
+        if job_id is not None:
+            TaskRepo._bump_job(db, job_id, failed=1)
+        db.commit()
+        return job_id is not None
+
+    @staticmethod
+    @timed(REPO_CALL_SECONDS, repo="task", operation="finish_many")
+    def finish_many(db, outcomes):
+        """
+        Write many terminal task results and the matching job counters in one transaction.
+        PostgreSQL: a single UPDATE tasks ... FROM (VALUES ...) RETURNING; other dialects
+        (SQLite dev/tests) fall back to one guarded UPDATE per task.
+        Each row is guarded by sources_for(its own status), as in _finish; tasks already
+        SUCCESS/FAILED are left alone and not counted. Returns rows updated.
+        """
+        if not outcomes:
+            return 0
+        if db.get_bind().dialect.name == "postgresql":
+            rows = values(
+                column("id", String), column("status", String),
+                column("instance_id", String), column("error", String),
+                name="outcomes",
+            ).data([tuple(outcome) for outcome in outcomes])
+            guard = or_(*(
+                and_(rows.c.status == status, Task.status.in_(sources_for(status)))
+                for status in sorted({outcome.status for outcome in outcomes})
+            ))
+            finished = db.execute(
+                update(Task)
+                .where(Task.id == rows.c.id, guard)
+                .values(
+                    status=rows.c.status, cloud_instance_id=rows.c.instance_id,
+                    last_error=rows.c.error, updated_at=func.now(),
+                    cloud_state=case((rows.c.status == TaskStatus.SUCCESS, CloudState.PENDING)),
+                )
+                .returning(Task.job_id, Task.status)
+            ).all()
+        else:
+            finished = []
+            for outcome in outcomes:
+                job_id = TaskRepo._finish(
+                    db, outcome.task_id, outcome.status,
+                    cloud_instance_id=outcome.instance_id, last_error=outcome.error,
+                    cloud_state=CloudState.PENDING if outcome.status == TaskStatus.SUCCESS else None,
+                )
+                if job_id is not None:
+                    finished.append((job_id, outcome.status))
+
+        counts = Counter(finished)
+        for job_id in {job_id for job_id, _ in finished}:
+            TaskRepo._bump_job(
+                db, job_id,
+                succeeded=counts[(job_id, TaskStatus.SUCCESS)],
+                failed=counts[(job_id, TaskStatus.FAILED)],
+            )
         db.commit()
-        return t
+        return len(finished)
+
+    @staticmethod
+    @timed(REPO_CALL_SECONDS, repo="task", operation="unconfirmed")
+    def unconfirmed(db, checked_before, limit):
+        """
+        Launched instances not yet seen running (cloud_state pending) and not checked
+        since checked_before (ix_tasks_cloud_state_reconciled_at). Rows carry what the
+        reconciler needs: id, job_id, cloud_instance_id, template_id, params, updated_at.
+        """
+        return db.execute(
+            select(Task.id, Task.job_id, Task.cloud_instance_id, Task.template_id, Task.params, Task.updated_at)
+            .where(
+                Task.cloud_state == CloudState.PENDING, Task.status == TaskStatus.SUCCESS,
+                or_(Task.reconciled_at.is_(None), Task.reconciled_at < checked_before),
+            )
+            .limit(limit)
+        ).all()
+
+    @staticmethod
+    @timed(REPO_CALL_SECONDS, repo="task", operation="record_cloud_states")
+    def record_cloud_states(db, task_ids_by_state, checked_at, commit=True):
+        """
+        Store describe results: one UPDATE per observed state, stamping reconciled_at = checked_at
+        (the run's own clock, so unconfirmed(checked_before=checked_at) skips them).
+        updated_at is kept (it dates the launch the reconciler's timeouts count from).
+        """
+        for state, task_ids in task_ids_by_state.items():
+            if task_ids:
+                db.execute(
+                    update(Task)
+                    .where(Task.id.in_(task_ids), Task.cloud_state == CloudState.PENDING)
+                    .values(cloud_state=state, reconciled_at=checked_at, updated_at=Task.updated_at)
+                )
+        if commit:
+            db.commit()
+
+    @staticmethod
+    @timed(REPO_CALL_SECONDS, repo="task", operation="fail_unlaunched")
+    def fail_unlaunched(db, failures, checked_at, commit=True):
+        """
+        SUCCESS -> FAILED for launched instances that never reached running.
+        failures: [(task_id, cloud_state, error)]; one guarded UPDATE per (state, error),
+        then each job moves the tasks from succeeded to failed (status re-derived).
+        Returns {job_id: tasks failed}.
+        """
+        grouped = {}
+        for task_id, state, error in failures:
+            grouped.setdefault((state, error), []).append(task_id)
+        failed = Counter()
+        for (state, error), task_ids in grouped.items():
+            rows = db.execute(
+                update(Task)
+                .where(Task.id.in_(task_ids), Task.status == TaskStatus.SUCCESS, Task.cloud_state == CloudState.PENDING)
+                .values(
+                    status=TaskStatus.FAILED, cloud_state=state, last_error=error,
+                    reconciled_at=checked_at, updated_at=func.now(),
+                )
+                .returning(Task.job_id)
+            ).scalars().all()
+            failed.update(rows)
+        for job_id, count in failed.items():
+            TaskRepo._bump_job(db, job_id, succeeded=-count, failed=count)
+        if commit:
+            db.commit()
+        return dict(failed)
+
+    @staticmethod
+    @timed(REPO_CALL_SECONDS, repo="task", operation="cloud_state_counts")
+    def cloud_state_counts(db, job_ids):
+        """{job_id: {cloud_state: tasks}} for launched tasks of the given jobs (one GROUP BY)"""
+        counts = {job_id: {} for job_id in job_ids}
+        if counts:
+            rows = db.execute(
+                select(Task.job_id, Task.cloud_state, func.count())
+                .where(Task.job_id.in_(list(counts)), Task.cloud_state.is_not(None))
+                .group_by(Task.job_id, Task.cloud_state)
+            ).all()
+            for job_id, state, count in rows:
+                counts[job_id][state] = count
+        return counts
+
+    @staticmethod
+    def _finish(db, task_id, status, **values):
+        # Guarded on the current status so a redelivered message never counts twice
+        result = db.execute(
+            update(Task)
+            .where(Task.id == task_id, Task.status.in_(sources_for(status)))
+            .values(status=status, updated_at=func.now(), **values)
+            .returning(Task.job_id)
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    def _bump_job(db, job_id, succeeded=0, failed=0):
+        """
+        Add to a job's counters and derive its status from the new values, in one UPDATE.
+        The resulting snapshot is queued on the session and published after commit
+        (see app/core/progress.py).
+        """
+        done_ok = Job.succeeded + succeeded
+        done_failed = Job.failed + failed
+        snapshot = db.execute(
+            update(Job).where(Job.id == job_id).values(
+                succeeded=done_ok,
+                failed=done_failed,
+                status=derived_job_status(done_ok, done_failed),
+            )
+            .returning(Job.id, Job.total, Job.succeeded, Job.failed, Job.status)
+        ).first()
+        if snapshot is not None:
+            queue_progress(db, snapshot._asdict())
+
+    @staticmethod
+    def _advance_jobs(db, job_ids, target, sources):
+        job_ids = list(job_ids)
+        if job_ids:
+            db.execute(update(Job).where(Job.id.in_(job_ids), Job.status.in_(sources)).values(status=target))
+
+class AsyncTaskRepo:
+    """AsyncSession variant of TaskRepo for the FastAPI request path"""
+
+    @staticmethod
+    @timed(REPO_CALL_SECONDS, repo="async_task", operation="count_pending")
+    async def count_pending(db, limit):
+        """PENDING tasks, counted up to limit (ix_tasks_status_updated_at; never a full scan)"""
+        pending = select(Task.id).where(Task.status == TaskStatus.PENDING).limit(limit).subquery()
+        return (await db.execute(select(func.count()).select_from(pending))).scalar_one()
+
+    @staticmethod
+    @timed(REPO_CALL_SECONDS, repo="async_task", operation="bulk_create")
+    async def bulk_create(db, job_id, instances, start_index=0, commit=True, chunk_size=None, batch_id=None, submitter=None):
+        all_refs = []
+        for rows, refs, templates in iter_task_row_chunks(job_id, instances, start_index, chunk_size, batch_id, submitter):
+            await AsyncLaunchTemplateRepo.ensure_many(db, templates)
+            await db.execute(insert(Task).values(rows))
+            all_refs.extend(refs)
+        if commit:
+            await db.commit()
+        return all_refs
+
+    @staticmethod
+    async def get(db, task_id):
+        return await db.get(Task, task_id)
+
+    @staticmethod
+    async def list_by_job(job_id, db):
+        result = await db.execute(select(Task).where(Task.job_id == job_id))
+        return result.scalars().all()
+
+    @staticmethod
+    @timed(REPO_CALL_SECONDS, repo="async_task", operation="list_page")
+    async def list_page(db, job_id, after_index=None, limit=100, status=None, columns=None):
+        """
+        Keyset page of a job's tasks ordered by index (served by ix_tasks_job_id[_status]_index).
+        Returns (rows as dicts, has_more); columns limits the projection.
+        """
+        selected = [getattr(Task, name) for name in (columns or TASK_PAGE_COLUMNS)]
+        if Task.index not in selected:
+            selected.append(Task.index)
+        query = select(*selected).where(Task.job_id == job_id)
+        if status:
+            query = query.where(Task.status == status)
+        if after_index is not None:
+            query = query.where(Task.index > after_index)
+        # Fetch one extra row to know whether another page exists
+        result = await db.execute(query.order_by(Task.index).limit(limit + 1))
+        rows = [dict(row) for row in result.mappings()]
+        return rows[:limit], len(rows) > limit
+
+    @staticmethod
+    @timed(REPO_CALL_SECONDS, repo="async_task", operation="cloud_state_counts")
+    async def cloud_state_counts(db, job_id):
+        """{cloud_state: tasks} for one job's launched tasks"""
+        result = await db.execute(
+            select(Task.cloud_state, func.count())
+            .where(Task.job_id == job_id, Task.cloud_state.is_not(None))
+            .group_by(Task.cloud_state)
+        )
+        return {state: count for state, count in result.all()}
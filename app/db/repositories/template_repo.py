@@ -0,0 +1,53 @@
+import hashlib
+import json
+from sqlalchemy import insert, select
+from app.db.models.launch_template import LaunchTemplate
+
+# Fields that are (nearly always) identical across a batch; everything else is a per-task delta
+TEMPLATE_FIELDS = ("instance_type", "region", "image_id", "subnet_id", "security_group_ids", "key_name")
+
+def template_id_for(template):
+    return hashlib.sha256(json.dumps(template, sort_keys=True).encode()).hexdigest()[:32]
+
+def split_params(params):
+    """(template fields, delta) for one instance's params; None-valued deltas are dropped"""
+    template = {field: params.get(field) for field in TEMPLATE_FIELDS}
+    delta = {key: value for key, value in params.items() if key not in TEMPLATE_FIELDS and value is not None}
+    return template, delta
+
+def merge_params(template_params, delta):
+    return {**(template_params or {}), **(delta or {})}
+
+def _insert_missing(db, rows):
+    # ON CONFLICT DO NOTHING: concurrent jobs may insert the same content-addressed template
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return insert(LaunchTemplate).values(rows)
+    return dialect_insert(LaunchTemplate).values(rows).on_conflict_do_nothing(index_elements=["id"])
+
+class LaunchTemplateRepo:
+    @staticmethod
+    def ensure_many(db, templates):
+        """Insert {template_id: params} entries that do not exist yet (one statement)"""
+        if templates:
+            db.execute(_insert_missing(db, [{"id": tid, "params": params} for tid, params in templates.items()]))
+
+    @staticmethod
+    def get_many(db, template_ids):
+        """{template_id: params} for the given ids (one IN query)"""
+        if not template_ids:
+            return {}
+        rows = db.execute(select(LaunchTemplate.id, LaunchTemplate.params).where(LaunchTemplate.id.in_(template_ids)))
+        return dict(rows.all())
+
+class AsyncLaunchTemplateRepo:
+    """AsyncSession variant of LaunchTemplateRepo"""
+
+    @staticmethod
+    async def ensure_many(db, templates):
+        if templates:
+            await db.execute(_insert_missing(db, [{"id": tid, "params": params} for tid, params in templates.items()]))
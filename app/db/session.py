@@ -1,14 +1,54 @@
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, scoped_session
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.core.progress import ASYNC_SESSION_INFO
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+# Async driver used for each sync URL when ASYNC_DATABASE_URL is not set
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+def resolve_async_database_url() -> str:
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    url = make_url(settings.DATABASE_URL)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for {backend}; set ASYNC_DATABASE_URL")
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+def pool_options(url) -> dict:
+    """Pool tuning from Settings (SQLite uses its own single-file pools)"""
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+
+engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True, **pool_options(settings.DATABASE_URL))
+instrument_engine(engine, "sync")
 SessionLocal = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
 
+# Async engine for the FastAPI request path (no thread pool hop per query)
+ASYNC_DATABASE_URL = resolve_async_database_url()
+async_engine = create_async_engine(ASYNC_DATABASE_URL, pool_pre_ping=True, **pool_options(ASYNC_DATABASE_URL))
+instrument_engine(async_engine, "async")
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False, info=ASYNC_SESSION_INFO,
+)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,18 @@
+
+class CloudError(Exception):
+    """Base class for cloud provider failures raised by adapters"""
+
+class TransientError(CloudError):
+    """Retryable failure (throttling, capacity, timeouts, provider 5xx)"""
+
+class PermanentError(CloudError):
+    """Non-retryable failure (invalid params, missing image/subnet, auth)"""
+
+class CircuitOpenError(CloudError):
+    """Provider/region circuit is open: the call was not made, try again after retry_after seconds"""
+
+    def __init__(self, cloud, region, retry_after):
+        super().__init__(f"Circuit open for {cloud}/{region}; retry in {retry_after:.1f}s")
+        self.cloud = cloud
+        self.region = region
+        self.retry_after = retry_after
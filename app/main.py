@@ -1,6 +1,12 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware  
 from app.api.v1 import jobs_api, tasks_api, health_api, auth_api
+from app.core.config import settings
+from app.core.limiter import daily_quota_middleware
+from app.core.progress import hub as progress_hub
+from app.services.submission_queue import stop_producer
+from app.core.metrics import metrics_middleware, render_metrics, sample_queue_depth
+from app.workers.celery_app import PRIORITY_QUEUES
 
 app = FastAPI(title="ECS Creation Platform")
 
@@ -13,9 +19,42 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
+# Per-user quota (async Redis, local fast path for callers already over quota)
+app.middleware("http")(daily_quota_middleware)
+
+# Per-route latency histograms (scraped from /metrics); added last so it also times the quota check
+app.middleware("http")(metrics_middleware)
+
 # Existing router imports
 # app.include_router(jobs_api.router, prefix="/api/v1/jobs")
 # app.include_router(tasks_api.router, prefix="/api/v1/tasks")
 app.include_router(health_api.router, prefix="/api/v1/heals")  # Health check router
 app.include_router(jobs_api.router, prefix="/api/v1/jobs")
+app.include_router(tasks_api.router, prefix="/api/v1/jobs")  # /api/v1/jobs/{job_id}/tasks
 app.include_router(auth_api.router, prefix="/api/v1")
+
+@app.on_event("startup")
+async def start_memory_submission_consumer():
+    # With the in-memory submission log the consumer has to live in the API process
+    if settings.KAFKA_BACKEND == "memory":
+        import asyncio
+        from app.workers.submission_consumer import SubmissionConsumer
+
+        app.state.submission_consumer = SubmissionConsumer()
+        app.state.submission_consumer_task = asyncio.create_task(app.state.submission_consumer.run())
+
+@app.on_event("shutdown")
+async def stop_submission_queue():
+    consumer = getattr(app.state, "submission_consumer", None)
+    if consumer is not None:
+        consumer.stop()
+        await app.state.submission_consumer_task
+    await stop_producer()
+    await progress_hub.stop()
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint (aggregates all workers when PROMETHEUS_MULTIPROC_DIR is set)"""
+    sample_queue_depth(settings.CELERY_BROKER, PRIORITY_QUEUES.values())
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
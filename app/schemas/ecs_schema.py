@@ -0,0 +1,71 @@
+import re
+from pydantic import BaseModel, Field, validator
+from typing import List, Optional, Dict
+from app.core.states import JOB_PRIORITIES, JobPriority
+
+# ------------------------------
+# Format Rules (shared with the vectorized validation engine)
+# ------------------------------
+REGION_PATTERN = r"^[a-z]{2}-[a-z]+-\d$"
+IMAGE_ID_PATTERN = r"^ami-[0-9a-f]{8,17}$"
+SUBNET_ID_PATTERN = r"^subnet-[0-9a-f]{8,17}$"
+SECURITY_GROUP_ID_PATTERN = r"^sg-[0-9a-f]{8,17}$"
+
+# Compiled once at import (not per validated row)
+REGION_RE = re.compile(REGION_PATTERN)
+IMAGE_ID_RE = re.compile(IMAGE_ID_PATTERN)
+SUBNET_ID_RE = re.compile(SUBNET_ID_PATTERN)
+SECURITY_GROUP_ID_RE = re.compile(SECURITY_GROUP_ID_PATTERN)
+
+# ------------------------------
+# Data Models (Pydantic Validation)
+# ------------------------------
+class ECSInstanceConfig(BaseModel):
+    """Schema for single ECS instance configuration (from JSON/parsed file)"""
+    instance_name: str = Field(..., description="ECS instance name (unique)")
+    instance_type: str = Field(..., description="ECS instance type (e.g., t3.medium, c5.large)")
+    region: str = Field(..., description="AWS region (e.g., us-east-1, eu-west-1)")
+    image_id: str = Field(..., description="AMI ID (e.g., ami-0c55b159cbfafe1f0)")
+    subnet_id: str = Field(..., description="Subnet ID (e.g., subnet-0123456789abcdef0)")
+    security_group_ids: List[str] = Field(..., description="List of security group IDs")
+    key_name: Optional[str] = Field(None, description="SSH key pair name (optional)")
+    tags: Optional[Dict[str, str]] = Field(None, description="Custom tags (optional)")
+    login_password: Optional[str] = Field(None, description="Login password for the instance (optional)")
+
+    @validator("region")
+    def validate_region_format(cls, v):
+        if not REGION_RE.match(v):
+            raise ValueError("Invalid region format (e.g., cn-north-1)")
+        return v
+
+    @validator("image_id")
+    def validate_image_id_format(cls, v):
+        if not IMAGE_ID_RE.match(v):
+            raise ValueError("Invalid AMI ID format (e.g., ami-0c55b159cbfafe1f0)")
+        return v
+
+    @validator("subnet_id")
+    def validate_subnet_id_format(cls, v):
+        if not SUBNET_ID_RE.match(v):
+            raise ValueError("Invalid subnet ID format (e.g., subnet-0123456789abcdef0)")
+        return v
+
+    @validator("security_group_ids")
+    def validate_security_group_ids_format(cls, v):
+        invalid = [sg for sg in v if not SECURITY_GROUP_ID_RE.match(sg)]
+        if invalid:
+            raise ValueError(f"Invalid security group ID format: {', '.join(invalid)} (e.g., sg-0123456789abcdef0)")
+        return v
+
+class BatchECSCreateRequest(BaseModel):
+    """Request model for JSON-based batch ECS creation"""
+    instances: List[ECSInstanceConfig] = Field(..., description="List of ECS instances to create")
+    dry_run: bool = Field(False, description="Dry run (validate only, no actual creation)")
+    batch_id: Optional[str] = Field(None, description="Custom batch ID (auto-generated if not provided)")
+    priority: str = Field(JobPriority.NORMAL, description="Scheduling priority: high, normal or low")
+
+    @validator("priority")
+    def validate_priority(cls, v):
+        if v not in JOB_PRIORITIES:
+            raise ValueError(f"Invalid priority: {v} (allowed: {', '.join(JOB_PRIORITIES)})")
+        return v
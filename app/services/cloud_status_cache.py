@@ -0,0 +1,120 @@
+import json
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from app.core.config import settings
+
+# ------------------------------
+# Cloud status cache
+# Per-job counts of provider-side instance states ({"running": 950, "pending": 50}).
+# The reconciler writes the jobs it touched after every run; the status API reads
+# here and only falls back to a GROUP BY over the job's tasks on a miss.
+# ------------------------------
+
+logger = logging.getLogger(__name__)
+
+
+def _key(job_id: str) -> str:
+    return f"cloudstate:{job_id}"
+
+
+class InMemoryCloudStatusBackend:
+    """Process-local backend (tests / single-process dev)"""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def set_many(self, entries: Dict[str, str], ttl: int):
+        expires_at = time.monotonic() + ttl
+        with self._lock:
+            for key, value in entries.items():
+                self._entries[key] = (value, expires_at)
+
+    async def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                self._entries.pop(key, None)
+                return None
+            return entry[0]
+
+    async def set(self, key: str, value: str, ttl: int):
+        self.set_many({key: value}, ttl)
+
+
+class RedisCloudStatusBackend:
+    """Sync client for the reconciler (one pipeline per run), asyncio client for the API"""
+
+    def __init__(self, redis_url: str):
+        self._redis_url = redis_url
+        self._sync = None
+        self._async = None
+
+    def set_many(self, entries: Dict[str, str], ttl: int):
+        if self._sync is None:
+            import redis
+
+            self._sync = redis.Redis.from_url(self._redis_url, decode_responses=True)
+        pipe = self._sync.pipeline(transaction=False)
+        for key, value in entries.items():
+            pipe.set(key, value, ex=ttl)
+        pipe.execute()
+
+    def _client(self):
+        if self._async is None:
+            import redis.asyncio as aioredis
+
+            self._async = aioredis.Redis.from_url(self._redis_url, decode_responses=True)
+        return self._async
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client().get(key)
+
+    async def set(self, key: str, value: str, ttl: int):
+        await self._client().set(key, value, ex=ttl)
+
+
+class CloudStatusCache:
+    """
+    put_many(summaries) from the reconciler (sync), get/put from the API (async).
+    Backend errors are logged and treated as misses: the caller recomputes from the DB.
+    """
+
+    def __init__(self, backend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+
+    def put_many(self, summaries: Dict[str, Dict[str, int]]):
+        if not summaries:
+            return
+        try:
+            self.backend.set_many({_key(job_id): json.dumps(counts) for job_id, counts in summaries.items()}, self.ttl)
+        except Exception as e:
+            logger.warning("Cloud status cache unavailable (%s); %d job summaries not cached", e, len(summaries))
+
+    async def get(self, job_id: str) -> Optional[Dict[str, int]]:
+        try:
+            value = await self.backend.get(_key(job_id))
+        except Exception as e:
+            logger.warning("Cloud status cache unavailable (%s); treating as miss", e)
+            return None
+        return json.loads(value) if value is not None else None
+
+    async def put(self, job_id: str, counts: Dict[str, int]):
+        try:
+            await self.backend.set(_key(job_id), json.dumps(counts), self.ttl)
+        except Exception as e:
+            logger.warning("Cloud status cache unavailable (%s)", e)
+
+
+def build_cloud_status_cache() -> CloudStatusCache:
+    if settings.CLOUD_STATUS_CACHE_BACKEND == "redis" and settings.REDIS_URL:
+        backend = RedisCloudStatusBackend(settings.REDIS_URL)
+    else:
+        backend = InMemoryCloudStatusBackend()
+    return CloudStatusCache(backend, ttl=settings.CLOUD_STATUS_CACHE_TTL_SECONDS)
+
+
+cloud_status_cache = build_cloud_status_cache()
@@ -0,0 +1,112 @@
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.core.config import settings
+from app.core.metrics import DISPATCH_SECONDS, DISPATCHED_TASKS_TOTAL, observe, sample_queue_depth
+from app.db.repositories.job_repo import JobRepo
+from app.db.repositories.task_repo import TaskRepo
+from app.db.session import SessionLocal
+from app.workers.celery_app import celery_app, CREATE_INSTANCE_TASK, CREATE_INSTANCES_BATCH_TASK, PRIORITY_QUEUES
+
+logger = logging.getLogger(__name__)
+
+# Dispatch runs here, never on the event loop / request path
+_executor = ThreadPoolExecutor(max_workers=settings.DISPATCH_THREADS, thread_name_prefix="celery-dispatch")
+
+# Tasks handed to the executor but not yet published (backpressure signal for ingestion)
+_pending_lock = threading.Lock()
+_pending_tasks = 0
+
+def _add_pending(count):
+    global _pending_tasks
+    with _pending_lock:
+        _pending_tasks += count
+
+class DispatchService:
+    @staticmethod
+    def publish(task_ids, chunk_size=None, queue=None):
+        """
+        Publish create_instance messages over one pooled broker connection.
+        - A single producer is acquired from Celery's pool for the whole run
+        - Messages go out back to back in chunks; no per-task connection setup
+        - WORKER_BATCH_MODE: one create_instances_batch message per WORKER_BATCH_SIZE tasks
+        - queue: a PRIORITY_QUEUES name (default: Celery's default queue)
+        Returns dispatch stats: count, seconds, rate_per_sec.
+        """
+        chunk_size = chunk_size or settings.DISPATCH_CHUNK_SIZE
+        route = {"queue": queue} if queue else {}
+        started = time.perf_counter()
+        with observe(DISPATCH_SECONDS), celery_app.producer_or_acquire() as producer:
+            if settings.WORKER_BATCH_MODE:
+                for offset in range(0, len(task_ids), settings.WORKER_BATCH_SIZE):
+                    batch = task_ids[offset:offset + settings.WORKER_BATCH_SIZE]
+                    celery_app.send_task(CREATE_INSTANCES_BATCH_TASK, args=[batch], producer=producer, **route)
+                    DISPATCHED_TASKS_TOTAL.inc(len(batch))
+            else:
+                for offset in range(0, len(task_ids), chunk_size):
+                    chunk = task_ids[offset:offset + chunk_size]
+                    for task_id in chunk:
+                        celery_app.send_task(CREATE_INSTANCE_TASK, args=[task_id], producer=producer, **route)
+                    DISPATCHED_TASKS_TOTAL.inc(len(chunk))
+        elapsed = time.perf_counter() - started
+        sample_queue_depth(settings.CELERY_BROKER, PRIORITY_QUEUES.values())
+        return {
+            "count": len(task_ids),
+            "seconds": round(elapsed, 4),
+            "rate_per_sec": round(len(task_ids) / elapsed, 1) if elapsed > 0 else None,
+        }
+
+    @staticmethod
+    def dispatch_job(job_id, task_ids, priority=None):
+        """
+        Mark a job's tasks QUEUED (one UPDATE), publish them to the job's priority
+        queue and record the measured dispatch rate on job.meta. Marking first means
+        a worker never sees a message for a task still in PENDING.
+        - Only tasks this call moved are published (the reaper may have taken the rest)
+        - Published tasks get published_at; if publishing fails they go back to PENDING.
+          A process that dies in between leaves them PENDING or QUEUED-unpublished for
+          the stuck-task reaper
+        """
+        db = SessionLocal()
+        try:
+            try:
+                queued = [task_id for task_id, _ in TaskRepo.mark_queued(db, job_id, task_ids)]
+                try:
+                    stats = DispatchService.publish(queued, queue=PRIORITY_QUEUES.get(priority))
+                except Exception:
+                    TaskRepo.unmark_queued(db, queued)
+                    raise
+                TaskRepo.mark_published(db, queued)
+            except Exception:
+                logger.exception("Dispatch failed for job %s (%d tasks)", job_id, len(task_ids))
+                raise
+            finally:
+                _add_pending(-len(task_ids))
+            logger.info(
+                "Dispatched job %s: %d tasks in %.3fs (%s tasks/s)",
+                job_id, stats["count"], stats["seconds"], stats["rate_per_sec"]
+            )
+            JobRepo.update_meta(db, job_id, dispatch=stats)
+        finally:
+            db.close()
+        return stats
+
+    @staticmethod
+    def dispatch_in_background(job_id, task_ids, priority=None):
+        """
+        Hand a committed job's tasks to the dispatch thread pool and return immediately.
+        With SCHEDULER_ENABLED the tasks stay PENDING: app/workers/task_scheduler.py
+        releases them in fair-share slices instead of publishing the whole job.
+        """
+        if settings.SCHEDULER_ENABLED:
+            return None
+        task_ids = list(task_ids)
+        _add_pending(len(task_ids))
+        return _executor.submit(DispatchService.dispatch_job, job_id, task_ids, priority)
+
+    @staticmethod
+    def pending():
+        """Tasks queued for dispatch in this process but not yet on the broker"""
+        return _pending_tasks
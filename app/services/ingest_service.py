@@ -0,0 +1,271 @@
+
+import time
+import zlib
+from io import BytesIO
+from typing import AsyncIterator, BinaryIO, Dict, Iterator, List, Optional
+
+import pandas as pd
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.core.metrics import INGEST_PHASE_SECONDS, observe
+from app.schemas.ecs_schema import ECSInstanceConfig
+from app.services.validation_service import INVALID_TAGS, validate_frame
+
+
+class IngestReport:
+    """Running row/error counters for one streamed upload (errors are capped)"""
+
+    def __init__(self, max_errors: Optional[int] = None):
+        self.max_errors = settings.INGEST_MAX_REPORTED_ERRORS if max_errors is None else max_errors
+        self.row_count = 0
+        self.valid_count = 0
+        self.error_count = 0
+        self.errors: List[Dict] = []
+
+    def add_error(self, row: Optional[int], error: str, field: Optional[str] = None):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row, "field": field, "error": error})
+
+    def to_dict(self) -> Dict:
+        return {
+            "row_count": self.row_count,
+            "valid_count": self.valid_count,
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+
+def _split_security_groups(value) -> List[str]:
+    return [sg.strip() for sg in value.split(",")] if pd.notna(value) else []
+
+
+def _split_tags(value):
+    if not pd.notna(value):
+        return None
+    try:
+        return dict([tag.strip().split(":") for tag in value.split(",")])
+    except ValueError:
+        # Flagged per row by validate_frame instead of failing the whole file
+        return INVALID_TAGS
+
+
+def normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Clean a raw (string-typed) frame into ECSInstanceConfig-shaped columns"""
+    # Clean data: remove empty rows/columns, strip whitespace from headers
+    df = df.dropna(how="all").dropna(axis=1, how="all")
+    df.columns = [str(col).strip() for col in df.columns]
+
+    # Convert security_group_ids from string (e.g., "sg-1,sg-2") to list
+    if "security_group_ids" in df.columns:
+        df["security_group_ids"] = df["security_group_ids"].map(_split_security_groups)
+
+    # Convert tags from string (e.g., "env:prod,name:web") to dict
+    if "tags" in df.columns:
+        df["tags"] = df["tags"].map(_split_tags)
+    return df
+
+
+def parse_ecs_frame(file_data: bytes, file_type: str) -> pd.DataFrame:
+    """Parse a whole CSV/Excel upload into a normalized DataFrame (input of validate_frame)"""
+    try:
+        # dtype=str avoids type conversion errors; blank rows are dropped in normalize_frame
+        if file_type == "csv":
+            df = pd.read_csv(BytesIO(file_data), dtype=str, skip_blank_lines=True)
+        elif file_type in ["xlsx", "xls"]:
+            df = pd.read_excel(BytesIO(file_data), dtype=str)
+        else:
+            raise ValueError(f"Unsupported file type: {file_type} (only csv/xlsx/xls allowed)")
+        return normalize_frame(df)
+    except Exception as e:
+        raise ValueError(f"File parsing failed: {str(e)}")
+
+
+def _iter_csv_frames(fileobj: BinaryIO, chunk_size: int) -> Iterator[pd.DataFrame]:
+    # RangeIndex continues across chunks, so row numbers stay file-global
+    yield from pd.read_csv(fileobj, dtype=str, skip_blank_lines=True, chunksize=chunk_size)
+
+
+def _iter_xlsx_frames(fileobj: BinaryIO, chunk_size: int) -> Iterator[pd.DataFrame]:
+    from openpyxl import load_workbook
+
+    # read_only mode streams sheet XML instead of building the whole workbook tree
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(col) if col is not None else "" for col in header]
+        buffer, start = [], 0
+        for values in rows:
+            buffer.append([None if v is None else str(v) for v in values])
+            if len(buffer) >= chunk_size:
+                yield pd.DataFrame(buffer, columns=columns, index=range(start, start + len(buffer)), dtype=object)
+                start += len(buffer)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=columns, index=range(start, start + len(buffer)), dtype=object)
+    finally:
+        workbook.close()
+
+
+def _iter_xls_frames(fileobj: BinaryIO, chunk_size: int) -> Iterator[pd.DataFrame]:
+    # Legacy binary .xls cannot be read incrementally; load once and hand out slices
+    df = pd.read_excel(BytesIO(fileobj.read()), dtype=str)
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size]
+
+
+def iter_ecs_file_frames(fileobj: BinaryIO, file_type: str, chunk_size: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """Yield normalized DataFrame chunks of at most chunk_size rows from an upload"""
+    chunk_size = chunk_size or settings.INGEST_CHUNK_SIZE
+    if file_type == "csv":
+        frames = _iter_csv_frames(fileobj, chunk_size)
+    elif file_type == "xlsx":
+        frames = _iter_xlsx_frames(fileobj, chunk_size)
+    elif file_type == "xls":
+        frames = _iter_xls_frames(fileobj, chunk_size)
+    else:
+        raise ValueError(f"Unsupported file type: {file_type} (only csv/xlsx/xls allowed)")
+
+    while True:
+        # Parse time covers reading the next chunk from the spooled file + normalizing it
+        with observe(INGEST_PHASE_SECONDS, endpoint="ecs_creation_file_stream", phase="parse"):
+            frame = next(frames, None)
+            if frame is not None:
+                frame = normalize_frame(frame)
+        if frame is None:
+            return
+        if not frame.empty:
+            yield frame
+
+
+def iter_validated_batches(
+    fileobj: BinaryIO,
+    file_type: str,
+    report: IngestReport,
+    chunk_size: Optional[int] = None,
+    max_rows: Optional[int] = None,
+) -> Iterator[List[ECSInstanceConfig]]:
+    """
+    Stream an upload as bounded batches of validated ECSInstanceConfig objects.
+    - Only one chunk of raw rows is alive at a time
+    - Each chunk is checked column-wise (validate_frame); duplicate names are caught file-wide
+    - Invalid rows are recorded on the report (row = spreadsheet row, header is row 1)
+    - Raises ValueError once more than max_rows data rows have been read
+    """
+    max_rows = settings.MAX_BATCH_SIZE if max_rows is None else max_rows
+    seen_names = set()
+    for frame in iter_ecs_file_frames(fileobj, file_type, chunk_size):
+        report.row_count += len(frame)
+        if report.row_count > max_rows:
+            raise ValueError(f"Batch exceeds MAX_BATCH_SIZE ({max_rows} rows)")
+
+        with observe(INGEST_PHASE_SECONDS, endpoint="ecs_creation_file_stream", phase="validate"):
+            result = validate_frame(frame, seen_names)
+        for error in result.errors:
+            report.add_error(error["row"], error["error"], error["field"])
+        report.valid_count += len(result.instances)
+        if result.instances:
+            yield result.instances
+
+
+# ------------------------------
+# NDJSON request bodies (one ECSInstanceConfig object per line)
+# Read straight from request.stream(): only the current line and one chunk of
+# validated rows are held, however large the submission is.
+# ------------------------------
+
+async def _gunzip(chunks: AsyncIterator[bytes], max_output: int = 64 * 1024) -> AsyncIterator[bytes]:
+    # Bounded output per step: a small compressed chunk cannot inflate into a huge buffer.
+    # Concatenated members (cat a.gz b.gz, chunked writers) are read one after another.
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        data = chunk
+        while data:
+            out = decompressor.decompress(data, max_output)
+            if out:
+                yield out
+            if decompressor.eof:
+                data = decompressor.unused_data
+                if data:
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            else:
+                data = decompressor.unconsumed_tail
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+    if not decompressor.eof:
+        raise ValueError("Truncated gzip body")
+
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes], gzipped: bool = False, max_line_bytes: Optional[int] = None) -> AsyncIterator[bytes]:
+    """Split a (optionally gzip-encoded) byte stream into lines; raises ValueError on an over-long line"""
+    max_line_bytes = max_line_bytes or settings.NDJSON_MAX_LINE_BYTES
+    if gzipped:
+        chunks = _gunzip(chunks)
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        # Complete lines too: one chunk can hold a whole over-long line
+        for line in lines:
+            if len(line) > max_line_bytes:
+                raise ValueError(f"NDJSON line exceeds {max_line_bytes} bytes")
+            yield line
+        if len(buffer) > max_line_bytes:
+            raise ValueError(f"NDJSON line exceeds {max_line_bytes} bytes")
+    if buffer:
+        yield buffer
+
+
+async def iter_validated_ndjson(
+    lines: AsyncIterator[bytes],
+    report: IngestReport,
+    chunk_size: Optional[int] = None,
+    max_rows: Optional[int] = None,
+) -> AsyncIterator[List[ECSInstanceConfig]]:
+    """
+    Validate NDJSON lines as they arrive and yield batches of up to chunk_size configs.
+    - Blank lines are skipped; every other line counts as a row (row = 1-based line number)
+    - Invalid lines and duplicate instance_names are recorded on the report and left out
+    - Raises ValueError once more than max_rows rows have been read
+    """
+    chunk_size = chunk_size or settings.INGEST_CHUNK_SIZE
+    max_rows = settings.MAX_BATCH_SIZE if max_rows is None else max_rows
+    validate = INGEST_PHASE_SECONDS.labels(endpoint="ecs_creation_ndjson", phase="validate")
+    seen_names = set()
+    batch, spent, line_no = [], 0.0, 0
+    async for line in lines:
+        line_no += 1
+        if not line.strip():
+            continue
+        report.row_count += 1
+        if report.row_count > max_rows:
+            raise ValueError(f"Batch exceeds MAX_BATCH_SIZE ({max_rows} rows)")
+
+        started = time.perf_counter()
+        try:
+            inst = ECSInstanceConfig.model_validate_json(line)
+        except ValidationError as e:
+            for error in e.errors():
+                report.add_error(line_no, error["msg"], ".".join(str(part) for part in error["loc"]) or None)
+            inst = None
+        if inst is not None and inst.instance_name in seen_names:
+            report.add_error(line_no, f"Duplicate instance_name: {inst.instance_name}", "instance_name")
+            inst = None
+        spent += time.perf_counter() - started
+
+        if inst is not None:
+            seen_names.add(inst.instance_name)
+            report.valid_count += 1
+            batch.append(inst)
+            if len(batch) >= chunk_size:
+                validate.observe(spent)
+                yield batch
+                batch, spent = [], 0.0
+    validate.observe(spent)
+    if batch:
+        yield batch
@@ -1,14 +1,198 @@
 
-from app.db.repositories.job_repo import JobRepo
-from app.db.repositories.task_repo import TaskRepo
-from app.workers.celery_app import celery_app
+import logging
+from sqlalchemy.exc import IntegrityError
+from app.core.states import JobPriority, JobStatus
+from app.db.repositories.job_repo import JobRepo, AsyncJobRepo
+from app.db.repositories.task_repo import TaskRepo, AsyncTaskRepo
+from app.services.dispatch_service import DispatchService
+
+logger = logging.getLogger(__name__)
 
 class JobService:
     @staticmethod
-    def create_job(req, db):
-        job = JobRepo.create(db, submitter=None, total=len(req.instances), meta={})
-        tasks = TaskRepo.bulk_create(db, job.id, req.instances)
-        # push tasks to celery
-        for t in tasks:
-            celery_app.send_task('app.workers.worker_tasks.create_instance', args=[t.id])
+    def create_job(req, db, submitter=None):
+        # Job row and task rows commit together (single transaction)
+        job = JobRepo.create(db, submitter=submitter, total=len(req.instances), meta={}, commit=False, batch_id=req.batch_id, priority=req.priority)
+        tasks = TaskRepo.bulk_create(db, job.id, req.instances, commit=False, batch_id=req.batch_id, submitter=submitter)
+        db.commit()
+        # push tasks to celery (off the request path)
+        DispatchService.dispatch_in_background(job.id, [t.id for t in tasks], job.priority)
         return job
+
+    @staticmethod
+    async def create_job_async(db, instances, submitter=None, meta=None, batch_id=None, priority=None):
+        """
+        create_job for an AsyncSession: job + tasks in one transaction, then background dispatch.
+        Returns (job, created); losing the (submitter, batch_id) unique index to a concurrent
+        submission yields (existing_job, False) with nothing inserted.
+        """
+        try:
+            job = await AsyncJobRepo.create(db, submitter=submitter, total=len(instances), meta=meta or {}, commit=False, batch_id=batch_id, priority=priority)
+            tasks = await AsyncTaskRepo.bulk_create(db, job.id, instances, commit=False, batch_id=batch_id, submitter=submitter)
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            existing = await AsyncJobRepo.get_by_batch_id(db, submitter, batch_id) if batch_id else None
+            if existing is None:
+                raise
+            return existing, False
+        except Exception:
+            await db.rollback()
+            raise
+        DispatchService.dispatch_in_background(job.id, [t.id for t in tasks], job.priority)
+        return job, True
+
+    @staticmethod
+    async def create_jobs_bulk_async(db, submissions):
+        """
+        Create several jobs (one per queued submission) in a single transaction.
+        submissions: dicts with batch_id, instances and optional submitter/meta/priority.
+        - (submitter, batch_id) pairs that already have a job (redelivered messages) are skipped up front
+        - If a concurrent submission wins a batch_id anyway, falls back to one
+          transaction per submission so only the duplicate is dropped
+        Returns [(job_id, batch_id, created)] in submission order. A duplicate gets the id of
+        the job that owns its batch_id with created=False, whichever path detected it.
+        """
+        keys = [(s.get("submitter"), s["batch_id"]) for s in submissions]
+        existing = await AsyncJobRepo.existing_batch_jobs(db, keys)
+        fresh, seen = [], set(existing)
+        for key, submission in zip(keys, submissions):
+            if key not in seen:
+                seen.add(key)
+                fresh.append(submission)
+
+        dispatches = []
+        try:
+            jobs = await AsyncJobRepo.create_many(db, [
+                {
+                    "batch_id": s["batch_id"],
+                    "submitter": s.get("submitter"),
+                    "total": len(s["instances"]),
+                    "meta": s.get("meta") or {},
+                    "priority": s.get("priority") or JobPriority.NORMAL,
+                }
+                for s in fresh
+            ])
+            for job, submission in zip(jobs, fresh):
+                tasks = await AsyncTaskRepo.bulk_create(
+                    db, job.id, submission["instances"], commit=False, batch_id=job.batch_id, submitter=job.submitter
+                )
+                dispatches.append((job.id, [t.id for t in tasks], job.priority))
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            results = []
+            for submission in submissions:
+                job, created = await JobService.create_job_async(
+                    db, submission["instances"], submitter=submission.get("submitter"),
+                    meta=submission.get("meta"), batch_id=submission["batch_id"], priority=submission.get("priority")
+                )
+                results.append((job.id, submission["batch_id"], created))
+            return results
+        except Exception:
+            await db.rollback()
+            raise
+
+        for job_id, task_ids, priority in dispatches:
+            DispatchService.dispatch_in_background(job_id, task_ids, priority)
+        created_ids = {(job.submitter, job.batch_id): job.id for job in jobs}
+        results, reported = [], set()
+        for key, submission in zip(keys, submissions):
+            if key in created_ids and key not in reported:
+                reported.add(key)
+                results.append((created_ids[key], submission["batch_id"], True))
+            else:
+                # Job from an earlier delivery, or the first copy of this batch in the same poll
+                results.append((existing.get(key) or created_ids[key], submission["batch_id"], False))
+        return results
+
+    @staticmethod
+    def create_job_streaming(db, batches, report, submitter=None, meta=None, batch_id=None, priority=None):
+        """
+        Create a job from a stream of validated instance batches (see ingest_service).
+        - Tasks are flushed batch by batch inside one transaction
+        - Once the report has errors, writing stops but the stream is drained so
+          every bad row gets reported; the transaction is then rolled back
+        Returns (job, created): job is None when validation failed; created is False
+        when another submission already owns batch_id.
+        """
+        try:
+            job = JobRepo.create(db, submitter=submitter, total=0, meta=meta or {}, commit=False, batch_id=batch_id, priority=priority)
+            task_ids = []
+            for instances in batches:
+                if report.error_count:
+                    continue
+                tasks = TaskRepo.bulk_create(
+                    db, job.id, instances, start_index=len(task_ids), commit=False, batch_id=batch_id, submitter=submitter
+                )
+                task_ids.extend(t.id for t in tasks)
+            if report.error_count or not task_ids:
+                db.rollback()
+                return None, False
+            job.total = len(task_ids)
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            existing = JobRepo.get_by_batch_id(db, submitter, batch_id) if batch_id else None
+            if existing is None:
+                raise
+            return existing, False
+        except Exception:
+            db.rollback()
+            raise
+
+        DispatchService.dispatch_in_background(job.id, task_ids, job.priority)
+        return job, True
+
+    @staticmethod
+    async def create_job_progressive_async(db, batches, report, submitter=None, meta=None, batch_id=None, priority=None):
+        """
+        Create a job while its rows are still arriving (NDJSON endpoint).
+        - The job is committed first in RECEIVING; each validated batch is then
+          committed with its tasks (total grows with it) and dispatched at once
+        - Invalid rows are reported and skipped, they never block the valid ones
+        - However the stream ends (done, too many rows, client gone), the job is
+          sealed: its status is derived from what was written and meta["ingest"]
+          records the row counts (and the abort reason, if any)
+        Returns (job, created); created is False when another submission already owns batch_id.
+        """
+        try:
+            job = await AsyncJobRepo.create(
+                db, submitter=submitter, total=0, meta=meta or {}, batch_id=batch_id,
+                priority=priority, status=JobStatus.RECEIVING,
+            )
+        except IntegrityError:
+            await db.rollback()
+            existing = await AsyncJobRepo.get_by_batch_id(db, submitter, batch_id) if batch_id else None
+            if existing is None:
+                raise
+            return existing, False
+
+        written = 0
+
+        def ingest(aborted=None):
+            fields = {"row_count": report.row_count, "written": written, "error_count": report.error_count}
+            if aborted:
+                fields["aborted"] = aborted
+            return fields
+
+        try:
+            async for instances in batches:
+                tasks = await AsyncTaskRepo.bulk_create(
+                    db, job.id, instances, start_index=written, commit=False, batch_id=batch_id, submitter=submitter
+                )
+                await AsyncJobRepo.add_to_total(db, job.id, len(tasks))
+                await db.commit()
+                written += len(tasks)
+                DispatchService.dispatch_in_background(job.id, [t.id for t in tasks], job.priority)
+        except BaseException as e:
+            # BaseException: a cancelled request (client disconnect) must still seal the job.
+            # A failing seal is logged, never raised: the caller must see the original error.
+            try:
+                await db.rollback()
+                await AsyncJobRepo.seal(db, job.id, ingest=ingest(str(e) or type(e).__name__))
+            except Exception:
+                logger.exception("Could not seal job %s after an aborted upload", job.id)
+            raise
+        await AsyncJobRepo.seal(db, job.id, ingest=ingest())
+        return job, True
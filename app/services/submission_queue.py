@@ -0,0 +1,193 @@
+import asyncio
+import json
+import time
+from collections import namedtuple
+from typing import Dict, List, Optional
+from app.core.config import settings
+
+# ------------------------------
+# Submission log (KAFKA_TOPIC) between the API and the ingest consumer
+# The API appends a validated batch and returns; app/workers/submission_consumer.py
+# persists batches at the pace the DB and broker can sustain.
+# Messages are keyed by batch_id: redeliveries of one batch stay on one partition.
+# ------------------------------
+
+SubmissionRecord = namedtuple("SubmissionRecord", ["key", "value", "offset"])
+
+
+def encode_submission(batch_id: str, instances, submitter: Optional[str] = None, priority: Optional[str] = None) -> Dict:
+    return {
+        "batch_id": batch_id,
+        "submitter": submitter,
+        "priority": priority,
+        "instances": [inst.dict() for inst in instances],
+    }
+
+
+class InMemorySubmissionLog:
+    """
+    Single-partition in-process stand-in for the topic (tests / local dev).
+    Acts as producer and consumer: getmany() advances the position, commit()
+    stores it, seek_to_committed() replays everything consumed but not committed.
+    Sends to any other topic (dead letters) are kept in other_topics.
+    """
+
+    def __init__(self):
+        self._records: List[SubmissionRecord] = []
+        self.other_topics: Dict[str, List[SubmissionRecord]] = {}
+        self._position = 0
+        self._committed = 0
+        self._paused = False
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def send(self, key: str, value: Dict, topic: Optional[str] = None):
+        # Round-trip through JSON so tests see exactly what Kafka would carry
+        records = self._records if topic in (None, settings.KAFKA_TOPIC) else self.other_topics.setdefault(topic, [])
+        records.append(SubmissionRecord(key, json.loads(json.dumps(value)), len(records)))
+
+    async def getmany(self, max_records: int, timeout_ms: int) -> List[SubmissionRecord]:
+        # Short sleeps instead of an asyncio.Event: producer and consumer may run on different loops
+        deadline = time.monotonic() + timeout_ms / 1000
+        while self._paused or self._position >= len(self._records):
+            if time.monotonic() >= deadline:
+                return []
+            await asyncio.sleep(0.01)
+        records = self._records[self._position:self._position + max_records]
+        self._position += len(records)
+        return records
+
+    async def commit(self):
+        self._committed = self._position
+
+    async def seek_to_committed(self):
+        self._position = self._committed
+
+    def pause(self):
+        self._paused = True
+
+    def resume(self):
+        self._paused = False
+
+    @property
+    def lag(self) -> int:
+        return len(self._records) - self._committed
+
+
+class KafkaSubmissionProducer:
+    """aiokafka producer: acks=all + idempotence, so a 202 means the batch is durable"""
+
+    def __init__(self, bootstrap_servers: str, topic: str):
+        from aiokafka import AIOKafkaProducer
+
+        self.topic = topic
+        self._producer = AIOKafkaProducer(
+            bootstrap_servers=bootstrap_servers,
+            acks="all",
+            enable_idempotence=True,
+            linger_ms=settings.KAFKA_PRODUCER_LINGER_MS,
+            compression_type="gzip",
+            max_request_size=settings.KAFKA_MAX_REQUEST_SIZE,
+            key_serializer=lambda key: key.encode(),
+            value_serializer=lambda value: json.dumps(value).encode(),
+        )
+
+    async def start(self):
+        await self._producer.start()
+
+    async def stop(self):
+        await self._producer.stop()
+
+    async def send(self, key: str, value: Dict, topic: Optional[str] = None):
+        await self._producer.send_and_wait(topic or self.topic, value=value, key=key)
+
+
+class KafkaSubmissionConsumer:
+    """aiokafka consumer with auto-commit off: offsets are committed only after persist"""
+
+    def __init__(self, bootstrap_servers: str, topic: str, group_id: str):
+        from aiokafka import AIOKafkaConsumer
+
+        self._consumer = AIOKafkaConsumer(
+            topic,
+            bootstrap_servers=bootstrap_servers,
+            group_id=group_id,
+            enable_auto_commit=False,
+            auto_offset_reset="earliest",
+            max_partition_fetch_bytes=settings.KAFKA_MAX_REQUEST_SIZE,
+            key_deserializer=lambda key: key.decode() if key else None,
+            value_deserializer=lambda value: json.loads(value),
+        )
+
+    async def start(self):
+        await self._consumer.start()
+
+    async def stop(self):
+        await self._consumer.stop()
+
+    async def getmany(self, max_records: int, timeout_ms: int) -> List[SubmissionRecord]:
+        batches = await self._consumer.getmany(timeout_ms=timeout_ms, max_records=max_records)
+        return [
+            SubmissionRecord(message.key, message.value, message.offset)
+            for messages in batches.values()
+            for message in messages
+        ]
+
+    async def commit(self):
+        await self._consumer.commit()
+
+    async def seek_to_committed(self):
+        await self._consumer.seek_to_committed()
+
+    def pause(self):
+        # Paused partitions stay assigned; getmany() keeps the group membership alive
+        self._consumer.pause(*self._consumer.assignment())
+
+    def resume(self):
+        self._consumer.resume(*self._consumer.assignment())
+
+
+# In-memory log shared by producer and consumer within one process
+memory_log = InMemorySubmissionLog()
+
+_producer = None
+_producer_lock = asyncio.Lock()
+
+
+def build_consumer():
+    if settings.KAFKA_BACKEND == "memory":
+        return memory_log
+    return KafkaSubmissionConsumer(settings.KAFKA_BOOTSTRAP_SERVERS, settings.KAFKA_TOPIC, settings.KAFKA_CONSUMER_GROUP)
+
+
+async def get_producer():
+    """Process-wide producer, started on first use"""
+    global _producer
+    if _producer is None:
+        async with _producer_lock:
+            if _producer is None:
+                if settings.KAFKA_BACKEND == "memory":
+                    producer = memory_log
+                else:
+                    producer = KafkaSubmissionProducer(settings.KAFKA_BOOTSTRAP_SERVERS, settings.KAFKA_TOPIC)
+                await producer.start()
+                _producer = producer
+    return _producer
+
+
+async def send_dead_letter(record: SubmissionRecord, error: Exception):
+    """Park a submission that cannot be persisted on KAFKA_DEAD_LETTER_TOPIC (replayable by hand)"""
+    producer = await get_producer()
+    value = {"submission": record.value, "offset": record.offset, "error": f"{type(error).__name__}: {error}"}
+    await producer.send(record.key, value, topic=settings.KAFKA_DEAD_LETTER_TOPIC)
+
+
+async def stop_producer():
+    global _producer
+    if _producer is not None:
+        await _producer.stop()
+        _producer = None
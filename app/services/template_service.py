@@ -0,0 +1,56 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+from app.core.config import settings
+from app.db.repositories.template_repo import LaunchTemplateRepo, merge_params
+
+class TemplateResolver:
+    """
+    Rebuilds full launch params (template + per-task delta) for workers.
+    Templates are immutable (content-addressed), so each process keeps an LRU of
+    TEMPLATE_CACHE_SIZE entries and only hits the DB for templates it has not seen.
+    Tasks written before templates existed (template_id NULL) carry full params.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, db, template_ids) -> Dict[str, Dict]:
+        found, missing = {}, []
+        with self._lock:
+            for template_id in template_ids:
+                if template_id in self._cache:
+                    self._cache.move_to_end(template_id)
+                    found[template_id] = self._cache[template_id]
+                else:
+                    missing.append(template_id)
+        if missing:
+            loaded = LaunchTemplateRepo.get_many(db, missing)
+            with self._lock:
+                for template_id, params in loaded.items():
+                    self._cache[template_id] = params
+                    self._cache.move_to_end(template_id)
+                while len(self._cache) > self.maxsize:
+                    self._cache.popitem(last=False)
+            found.update(loaded)
+        return found
+
+    def resolve_many(self, db, tasks) -> List[Dict]:
+        """Full params for each task, in order (one query for all uncached templates)"""
+        templates = self._load(db, {task.template_id for task in tasks if task.template_id})
+        return [
+            merge_params(templates.get(task.template_id), task.params) if task.template_id else task.params
+            for task in tasks
+        ]
+
+    def resolve(self, db, task) -> Dict:
+        return self.resolve_many(db, [task])[0]
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+resolver = TemplateResolver(settings.TEMPLATE_CACHE_SIZE)
@@ -0,0 +1,190 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import threading
+import time
+import zlib
+from collections import OrderedDict, namedtuple
+from typing import Dict, List, Optional, Tuple
+from cryptography.fernet import Fernet, InvalidToken
+from app.core.config import settings
+from app.core.metrics import VALIDATION_CACHE_TOTAL
+
+# ------------------------------
+# Dry-run results cache (content-addressed, per caller)
+# A successful validation of an upload is stored under its validation token:
+# HMAC(caller + SHA-256 of the bytes), so a token only works for the caller that made it.
+# A later real submission of the same file (or of just the token) reuses the validated
+# rows instead of parsing and validating again.
+# Entries are zlib-compressed JSON encrypted with Fernet (rows carry login passwords):
+# Redis (shared, TTL) with a small per-process LRU in front. Both keys derive from
+# JWT_SECRET_KEY. Secret fields are never echoed back: responses use redact().
+# ------------------------------
+
+logger = logging.getLogger(__name__)
+
+# Bump when parsing/validation rules change: old entries stop matching
+CACHE_VERSION = 1
+
+# Row fields replaced by REDACTED in every response that echoes validated rows
+SECRET_FIELDS = ("login_password",)
+REDACTED = "******"
+
+ValidatedBatch = namedtuple("ValidatedBatch", ["token", "submitter", "file_type", "row_count", "instances"])
+
+
+def _derive(label: str) -> bytes:
+    return hmac.new(settings.JWT_SECRET_KEY.encode(), label.encode(), hashlib.sha256).digest()
+
+
+_TOKEN_KEY = _derive("validation-token")
+_fernet = Fernet(base64.urlsafe_b64encode(_derive("validation-cache")))
+
+
+def content_token(data: bytes, submitter: str) -> str:
+    digest = hashlib.sha256(data).hexdigest()
+    return hmac.new(_TOKEN_KEY, f"{submitter}:{digest}".encode(), hashlib.sha256).hexdigest()
+
+
+def redact(instances: List[Dict]) -> List[Dict]:
+    """Rows safe to echo: secret fields that are set become REDACTED"""
+    return [
+        {**inst, **{field: REDACTED for field in SECRET_FIELDS if inst.get(field)}}
+        if any(inst.get(field) for field in SECRET_FIELDS) else inst
+        for inst in instances
+    ]
+
+
+def _key(token: str) -> str:
+    return f"dryrun:v{CACHE_VERSION}:{token}"
+
+
+def _encode(submitter: str, file_type: str, row_count: int, instances: List[Dict]) -> bytes:
+    payload = {"submitter": submitter, "file_type": file_type, "row_count": row_count, "instances": instances}
+    return _fernet.encrypt(zlib.compress(json.dumps(payload, separators=(",", ":")).encode(), 1))
+
+
+def _decode(token: str, blob: bytes) -> Optional[ValidatedBatch]:
+    try:
+        payload = json.loads(zlib.decompress(_fernet.decrypt(blob)))
+    except InvalidToken:
+        # Written under another JWT_SECRET_KEY (rotated): unusable, same as a miss
+        return None
+    return ValidatedBatch(token, payload["submitter"], payload["file_type"], payload["row_count"], payload["instances"])
+
+
+class InMemoryValidationBackend:
+    """Process-local backend (tests / single-process dev)"""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[bytes, float]] = {}
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                self._entries.pop(key, None)
+                return None
+            return entry[0]
+
+    async def set(self, key: str, blob: bytes, ttl: int):
+        with self._lock:
+            self._entries[key] = (blob, time.monotonic() + ttl)
+
+
+class RedisValidationBackend:
+    """redis.asyncio backend: SET EX / GET over a bounded pool"""
+
+    def __init__(self, redis_url: str, pool_size: int):
+        import redis.asyncio as aioredis
+
+        self._pool = aioredis.ConnectionPool.from_url(redis_url, max_connections=pool_size)
+        self._client = aioredis.Redis(connection_pool=self._pool)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._client.get(key)
+
+    async def set(self, key: str, blob: bytes, ttl: int):
+        await self._client.set(key, blob, ex=ttl)
+
+
+class ValidationCache:
+    """
+    get(token, submitter) / put(token, submitter, ...) for validated uploads.
+    - Local LRU of local_size entries (compressed blobs, same TTL) answers repeat hits in-process
+    - Shared backend makes a token valid on every API pod
+    - Backend errors are logged and treated as misses (the caller just parses again)
+    - An entry written for another submitter is a miss too
+    """
+
+    def __init__(self, backend, ttl: int, local_size: int):
+        self.backend = backend
+        self.ttl = ttl
+        self.local_size = local_size
+        self._local: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _local_get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return entry[0]
+
+    def _local_put(self, key: str, blob: bytes, expires_at: float):
+        with self._lock:
+            self._local[key] = (blob, expires_at)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    @staticmethod
+    def _owned(cached: Optional[ValidatedBatch], submitter: str) -> Optional[ValidatedBatch]:
+        return cached if cached is not None and cached.submitter == submitter else None
+
+    async def get(self, token: str, submitter: str) -> Optional[ValidatedBatch]:
+        key = _key(token)
+        blob = self._local_get(key)
+        if blob is not None:
+            VALIDATION_CACHE_TOTAL.labels(result="local_hit").inc()
+            return self._owned(_decode(token, blob), submitter)
+        try:
+            blob = await self.backend.get(key)
+        except Exception as e:
+            logger.warning("Validation cache unavailable (%s); treating as miss", e)
+            blob = None
+        if blob is None:
+            VALIDATION_CACHE_TOTAL.labels(result="miss").inc()
+            return None
+        VALIDATION_CACHE_TOTAL.labels(result="shared_hit").inc()
+        # Remaining shared TTL is not fetched: the local copy may outlive it by at most one ttl
+        self._local_put(key, blob, time.monotonic() + self.ttl)
+        return self._owned(_decode(token, blob), submitter)
+
+    async def put(self, token: str, submitter: str, file_type: str, row_count: int, instances: List[Dict]) -> ValidatedBatch:
+        key = _key(token)
+        blob = _encode(submitter, file_type, row_count, instances)
+        self._local_put(key, blob, time.monotonic() + self.ttl)
+        try:
+            await self.backend.set(key, blob, self.ttl)
+        except Exception as e:
+            logger.warning("Validation cache unavailable (%s); token valid on this process only", e)
+        return ValidatedBatch(token, submitter, file_type, row_count, instances)
+
+
+def build_validation_cache() -> ValidationCache:
+    if settings.VALIDATION_CACHE_BACKEND == "redis" and settings.REDIS_URL:
+        backend = RedisValidationBackend(settings.REDIS_URL, settings.VALIDATION_CACHE_REDIS_POOL_SIZE)
+    else:
+        backend = InMemoryValidationBackend()
+    return ValidationCache(backend, ttl=settings.VALIDATION_CACHE_TTL_SECONDS, local_size=settings.VALIDATION_CACHE_LOCAL_SIZE)
+
+
+validation_cache = build_validation_cache()
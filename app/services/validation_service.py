@@ -0,0 +1,124 @@
+
+from typing import Dict, List, Optional, Set
+
+import pandas as pd
+
+from app.schemas.ecs_schema import (
+    ECSInstanceConfig,
+    REGION_PATTERN,
+    IMAGE_ID_PATTERN,
+    SUBNET_ID_PATTERN,
+    SECURITY_GROUP_ID_PATTERN,
+)
+
+# ------------------------------
+# Column-wise validation of parsed upload frames
+# (one vectorized pass per rule instead of one Pydantic model per row)
+# ------------------------------
+
+REQUIRED_COLUMNS = ["instance_name", "instance_type", "region", "image_id", "subnet_id", "security_group_ids"]
+OPTIONAL_COLUMNS = ["key_name", "tags", "login_password"]
+MODEL_FIELDS = REQUIRED_COLUMNS + OPTIONAL_COLUMNS
+# Scalar text columns stripped before validation (list/dict columns are split + stripped by
+# normalize_frame; passwords are kept verbatim)
+STRIPPED_COLUMNS = ["instance_name", "instance_type", "region", "image_id", "subnet_id", "key_name"]
+
+# (column, pattern, message) for single-value format checks
+FORMAT_RULES = [
+    ("region", REGION_PATTERN, "Invalid region format (e.g., cn-north-1)"),
+    ("image_id", IMAGE_ID_PATTERN, "Invalid AMI ID format (e.g., ami-0c55b159cbfafe1f0)"),
+    ("subnet_id", SUBNET_ID_PATTERN, "Invalid subnet ID format (e.g., subnet-0123456789abcdef0)"),
+]
+
+# Marker left in the tags column by normalize_frame for unparsable tag strings
+INVALID_TAGS = "__invalid_tags__"
+
+
+class FrameValidation:
+    """Outcome of validate_frame: models for passing rows + structured errors"""
+
+    def __init__(self, instances: List[ECSInstanceConfig], errors: List[Dict], row_count: int):
+        self.instances = instances
+        self.errors = errors
+        self.row_count = row_count
+
+    @property
+    def error_rows(self) -> int:
+        return len({error["row"] for error in self.errors})
+
+
+def _blank(series: pd.Series) -> pd.Series:
+    return series.isna() | (series.astype(str) == "")
+
+
+def _strip_strings(df: pd.DataFrame) -> pd.DataFrame:
+    """Copy of df with STRIPPED_COLUMNS stripped once, so the checks and the models see the same values"""
+    stripped = {}
+    for col in STRIPPED_COLUMNS:
+        if col in df.columns and (pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col])):
+            values = df[col].str.strip()
+            # .str yields NaN for non-string cells (numbers from Excel): keep those as they were
+            stripped[col] = values.where(values.notna(), df[col])
+    return df.assign(**stripped) if stripped else df
+
+
+def validate_frame(df: pd.DataFrame, seen_names: Optional[Set[str]] = None) -> FrameValidation:
+    """
+    Validate a normalized frame (see ingest_service.normalize_frame) column by column.
+    - Error rows are reported as spreadsheet rows (frame index + 2, header is row 1)
+    - seen_names carries instance names across chunks so duplicates are caught file-wide;
+      it is updated with this frame's valid names
+    Pydantic models are only built for rows that pass every rule.
+    """
+    df = _strip_strings(df)
+    rows = df.index.to_series() + 2
+    errors: List[Dict] = []
+    failed = pd.Series(False, index=df.index)
+
+    def flag(mask: pd.Series, field: str, message: str):
+        nonlocal failed
+        mask = mask.fillna(False).astype(bool)
+        if mask.any():
+            errors.extend({"row": int(row), "field": field, "error": message} for row in rows[mask])
+            failed = failed | mask
+
+    missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing:
+        errors.append({"row": None, "field": ",".join(missing), "error": f"Missing required columns: {', '.join(missing)}"})
+        return FrameValidation([], errors, len(df))
+
+    for col in REQUIRED_COLUMNS:
+        if col != "security_group_ids":
+            flag(_blank(df[col]), col, "Field required")
+
+    for col, pattern, message in FORMAT_RULES:
+        values = df[col].astype("string")
+        flag(~values.str.match(pattern, na=True) & ~_blank(df[col]), col, message)
+
+    # security_group_ids is a list column: explode, match once, fold back per row
+    groups = df["security_group_ids"].explode()
+    bad_group = ~groups.astype("string").str.match(SECURITY_GROUP_ID_PATTERN, na=False) & groups.notna()
+    flag(bad_group.groupby(level=0).any().reindex(df.index, fill_value=False), "security_group_ids",
+         "Invalid security group ID format (e.g., sg-0123456789abcdef0)")
+
+    if "tags" in df.columns:
+        flag(df["tags"].map(lambda v: isinstance(v, str) and v == INVALID_TAGS), "tags",
+             "Invalid tags format (expected key:value,key:value)")
+
+    names = df["instance_name"].astype("string")
+    duplicated = names.duplicated(keep=False) & names.notna()
+    if seen_names:
+        duplicated = duplicated | names.isin(seen_names)
+    flag(duplicated, "instance_name", "Duplicate instance_name")
+
+    valid = df.loc[~failed, [col for col in MODEL_FIELDS if col in df.columns]]
+    if seen_names is not None:
+        seen_names.update(valid["instance_name"].astype(str))
+
+    instances = []
+    for record in valid.to_dict("records"):
+        # Every rule above already ran; construct without re-validating
+        record = {key: value for key, value in record.items() if not (isinstance(value, float) and pd.isna(value))}
+        instances.append(ECSInstanceConfig.model_construct(**record))
+    errors.sort(key=lambda error: (error["row"] is not None, error["row"] or 0))
+    return FrameValidation(instances, errors, len(df))
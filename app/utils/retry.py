@@ -0,0 +1,15 @@
+import random
+
+
+def decorrelated_jitter(previous=None, base=2.0, cap=300.0):
+    """
+    Countdown for the next retry: uniform(base, 3 * previous), capped.
+    previous is the last countdown (None on the first retry). Unlike plain
+    exponential backoff, tasks that failed together do not retry together.
+    """
+    return min(cap, random.uniform(base, max(previous or base, base) * 3))
+
+
+def spread(delay, fraction=1.0):
+    """delay plus up to fraction * delay of random jitter (for tasks paused on the same deadline)"""
+    return delay + random.uniform(0, delay * fraction)
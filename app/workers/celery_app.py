@@ -1,7 +1,35 @@
 
 from celery import Celery
 from app.core.config import settings
+from app.core.metrics import install_celery_metrics
 
-celery = Celery('ecs_batch', broker=settings.CELERY_BROKER, backend=settings.CELERY_BACKEND)
+celery = Celery(
+    'ecs_batch',
+    broker=settings.CELERY_BROKER,
+    backend=settings.CELERY_BACKEND,
+    include=['app.workers.worker_tasks'],
+)
 celery.conf.task_acks_late = True
 celery.conf.worker_prefetch_multiplier = 1
+
+# Task run time / retry metrics + worker exporter
+install_celery_metrics(settings.WORKER_METRICS_PORT)
+
+# Registered task names (shared by the dispatcher and the worker)
+CREATE_INSTANCE_TASK = "worker.create_instance"
+CREATE_INSTANCES_BATCH_TASK = "worker.create_instances_batch"
+REAP_STUCK_TASKS_TASK = "worker.reap_stuck_tasks"
+RECONCILE_INSTANCES_TASK = "worker.reconcile_instances"
+
+# One queue per job priority; "normal" is Celery's default queue so `worker` without -Q still serves it.
+# Workers list them highest first: `worker -Q ecs-high,celery,ecs-low`
+PRIORITY_QUEUES = {"high": "ecs-high", "normal": "celery", "low": "ecs-low"}
+
+# Periodic jobs (run `celery -A app.workers.celery_app.celery beat`)
+celery.conf.beat_schedule = {
+    "reap-stuck-tasks": {"task": REAP_STUCK_TASKS_TASK, "schedule": settings.REAPER_INTERVAL_SECONDS},
+    "reconcile-instances": {"task": RECONCILE_INSTANCES_TASK, "schedule": settings.RECONCILE_INTERVAL_SECONDS},
+}
+
+# Alias used by the API/service layer (`celery` stays the name for `celery -A`)
+celery_app = celery
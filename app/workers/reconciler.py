@@ -0,0 +1,118 @@
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from app.adapters.cloud_adapter_factory import CloudAdapterFactory
+from app.core.config import settings
+from app.core.metrics import RECONCILE_FAILED_TASKS_TOTAL, RECONCILE_SECONDS, RECONCILED_INSTANCES_TOTAL, observe
+from app.core.states import CloudState
+from app.db.repositories.task_repo import TaskRepo
+from app.db.session import SessionLocal
+from app.services.cloud_status_cache import cloud_status_cache
+from app.services.template_service import resolver
+
+logger = logging.getLogger(__name__)
+
+
+def classify(state: Optional[str], age_seconds: float, pending_timeout: float, missing_grace: float) -> Tuple[str, Optional[str]]:
+    """
+    (cloud_state to store, failure reason or None) for one described instance.
+    state None means the describe call failed: nothing is learned, the instance stays pending.
+    """
+    if state == CloudState.TERMINATED:
+        return state, "Instance terminated before reaching running"
+    if state == CloudState.MISSING:
+        if age_seconds >= missing_grace:
+            return state, "Instance not found at the provider"
+        return CloudState.PENDING, None
+    if state == CloudState.PENDING and age_seconds >= pending_timeout:
+        return state, f"Instance still pending {int(pending_timeout)}s after launch"
+    return state or CloudState.PENDING, None
+
+
+class InstanceReconciler:
+    """
+    Confirms that launched instances actually reach running.
+    - Reads tasks with cloud_state pending in RECONCILE_BATCH_SIZE pages
+    - Groups them by (cloud, region) and asks the provider with batched describe
+      calls (adapter.max_describe_per_call ids each), never one call per instance
+    - Writes states with one UPDATE per state; instances that terminated, vanished
+      or stayed pending too long fail their task and move the job's counters
+    - Refreshes the cloud status cache for every job it touched
+    Runs from celery beat (worker.reconcile_instances) or `python -m app.workers.reconciler`.
+    """
+
+    def __init__(self, batch_size=None, pending_timeout=None, missing_grace=None, cache=None):
+        self.batch_size = batch_size or settings.RECONCILE_BATCH_SIZE
+        self.pending_timeout = settings.RECONCILE_PENDING_TIMEOUT_SECONDS if pending_timeout is None else pending_timeout
+        self.missing_grace = settings.RECONCILE_MISSING_GRACE_SECONDS if missing_grace is None else missing_grace
+        self.cache = cache or cloud_status_cache
+
+    def _describe(self, rows, params_list) -> Dict[str, Optional[str]]:
+        """{task_id: observed CloudState or None} with one batched describe per (cloud, region)"""
+        cloud = settings.DEFAULT_CLOUD
+        by_region: Dict[str, list] = {}
+        for row, params in zip(rows, params_list):
+            by_region.setdefault(params.get("region"), []).append(row)
+        observed = {}
+        for region, members in by_region.items():
+            try:
+                states = CloudAdapterFactory.get(cloud, region).describe_instances([row.cloud_instance_id for row in members])
+            except Exception:
+                logger.warning("Reconciler could not describe %d instances in %s/%s", len(members), cloud, region, exc_info=True)
+                states = {}
+            for row in members:
+                observed[row.id] = states.get(row.cloud_instance_id)
+        return observed
+
+    def reconcile(self, db, rows, checked_at: datetime) -> Tuple[Counter, Dict[str, int]]:
+        """Check one page of unconfirmed tasks; returns (stored states, {job_id: tasks failed})"""
+        observed = self._describe(rows, resolver.resolve_many(db, rows))
+        by_state: Dict[str, list] = {}
+        failures, stored = [], Counter()
+        for row in rows:
+            age = (checked_at - row.updated_at).total_seconds() if row.updated_at else 0.0
+            state, reason = classify(observed[row.id], age, self.pending_timeout, self.missing_grace)
+            RECONCILED_INSTANCES_TOTAL.labels(cloud_state=observed[row.id] or "unknown").inc()
+            stored[state] += 1
+            if reason:
+                failures.append((row.id, state, reason))
+                RECONCILE_FAILED_TASKS_TOTAL.labels(cloud_state=state).inc()
+            else:
+                by_state.setdefault(state, []).append(row.id)
+        TaskRepo.record_cloud_states(db, by_state, checked_at, commit=False)
+        failed = TaskRepo.fail_unlaunched(db, failures, checked_at, commit=False)
+        db.commit()
+        return stored, failed
+
+    def run_once(self) -> Dict[str, int]:
+        """Check every unconfirmed instance once; returns counts per stored state plus "failed" """
+        totals, failed_total, jobs = Counter(), 0, set()
+        db = SessionLocal()
+        try:
+            checked_at = TaskRepo.db_now(db)  # same clock as updated_at
+            with observe(RECONCILE_SECONDS):
+                while True:
+                    rows = TaskRepo.unconfirmed(db, checked_at, self.batch_size)
+                    if not rows:
+                        break
+                    stored, failed = self.reconcile(db, rows, checked_at)
+                    totals.update(stored)
+                    failed_total += sum(failed.values())
+                    jobs.update(row.job_id for row in rows)
+                    if len(rows) < self.batch_size:
+                        break
+                self.cache.put_many(TaskRepo.cloud_state_counts(db, jobs))
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        if failed_total:
+            logger.warning("Reconciler: %d launched instances never reached running", failed_total)
+        return {**totals, "failed": failed_total}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(InstanceReconciler().run_once())
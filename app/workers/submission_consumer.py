@@ -0,0 +1,139 @@
+import asyncio
+import logging
+from sqlalchemy.exc import InterfaceError, OperationalError
+from app.core.auth import ANONYMOUS_SUBMITTER
+from app.core.config import settings
+from app.core.metrics import INGEST_PHASE_SECONDS, observe
+from app.db.repositories.task_repo import AsyncTaskRepo
+from app.db.session import AsyncSessionLocal
+from app.schemas.ecs_schema import ECSInstanceConfig
+from app.services.dispatch_service import DispatchService
+from app.services.job_service import JobService
+from app.services.submission_queue import build_consumer, send_dead_letter
+
+logger = logging.getLogger(__name__)
+
+
+class SubmissionConsumer:
+    """
+    Drains KAFKA_TOPIC into jobs + tasks.
+    - Polls up to KAFKA_CONSUMER_BATCH_SIZE messages and persists them in one transaction
+    - Offsets are committed only after the transaction commits (at-least-once; the
+      (submitter, batch_id) unique index makes redelivered submissions no-ops)
+    - A failed persist rewinds to the last committed offset and retries after a pause.
+      After KAFKA_MAX_DELIVERY_ATTEMPTS failures that are not DB outages, the poll is
+      persisted message by message and the ones that still fail go to
+      KAFKA_DEAD_LETTER_TOPIC, so one bad submission cannot block its partition
+    - Backpressure: while more than KAFKA_MAX_PENDING_DISPATCH tasks are waiting to be
+      published (this process's dispatch threads, or PENDING tasks in the DB when the
+      scheduler releases them), partitions are paused and spikes stay in the topic
+    """
+
+    def __init__(self, consumer=None):
+        self.consumer = consumer or build_consumer()
+        self._stopping = False
+        self._failed_attempts = 0
+
+    @staticmethod
+    def parse(record):
+        value = record.value
+        # Messages come from our own API after full validation: skip re-validating
+        instances = [ECSInstanceConfig.model_construct(**inst) for inst in value["instances"]]
+        return {
+            "batch_id": value["batch_id"] or record.key,
+            # Messages queued before submitters were recorded carry none
+            "submitter": value.get("submitter") or ANONYMOUS_SUBMITTER,
+            "priority": value.get("priority"),
+            "instances": instances,
+        }
+
+    @staticmethod
+    async def dispatch_backlog() -> int:
+        """Tasks awaiting publication (counted only up to just past the limit)"""
+        if not settings.SCHEDULER_ENABLED:
+            return DispatchService.pending()
+        async with AsyncSessionLocal() as db:
+            return await AsyncTaskRepo.count_pending(db, settings.KAFKA_MAX_PENDING_DISPATCH + 1)
+
+    async def _wait_for_dispatch_capacity(self):
+        backlog = await self.dispatch_backlog()
+        if backlog <= settings.KAFKA_MAX_PENDING_DISPATCH:
+            return
+        logger.info("Pausing submission consumer: %d+ tasks awaiting dispatch", backlog)
+        self.consumer.pause()
+        try:
+            while await self.dispatch_backlog() > settings.KAFKA_MAX_PENDING_DISPATCH and not self._stopping:
+                # Keep polling while paused so the consumer stays in its group
+                await self.consumer.getmany(max_records=1, timeout_ms=settings.KAFKA_CONSUMER_POLL_TIMEOUT_MS)
+        finally:
+            self.consumer.resume()
+
+    async def process(self, records):
+        submissions = []
+        for record in records:
+            try:
+                submissions.append(self.parse(record))
+            except Exception:
+                # A malformed message must not block the partition behind it
+                logger.exception("Dropping unreadable submission at offset %s (key %s)", record.offset, record.key)
+        if not submissions:
+            return []
+        with observe(INGEST_PHASE_SECONDS, endpoint="submission_consumer", phase="insert"):
+            async with AsyncSessionLocal() as db:
+                return await JobService.create_jobs_bulk_async(db, submissions)
+
+    async def process_isolated(self, records):
+        """Last attempt for a poll that keeps failing: persist one by one, dead-letter the failures"""
+        results = []
+        for record in records:
+            try:
+                results.extend(await self.process([record]))
+            except (OperationalError, InterfaceError, OSError):
+                raise  # outage, not a bad message: replay later
+            except Exception as e:
+                logger.exception("Dead-lettering submission at offset %s (key %s)", record.offset, record.key)
+                await send_dead_letter(record, e)
+        return results
+
+    async def run_once(self):
+        await self._wait_for_dispatch_capacity()
+        records = await self.consumer.getmany(
+            max_records=settings.KAFKA_CONSUMER_BATCH_SIZE, timeout_ms=settings.KAFKA_CONSUMER_POLL_TIMEOUT_MS
+        )
+        if not records:
+            return []
+        try:
+            if self._failed_attempts >= settings.KAFKA_MAX_DELIVERY_ATTEMPTS:
+                results = await self.process_isolated(records)
+            else:
+                results = await self.process(records)
+        except Exception as e:
+            # DB/broker outages never count towards dead-lettering
+            if not isinstance(e, (OperationalError, InterfaceError, OSError)):
+                self._failed_attempts += 1
+            logger.exception(
+                "Persisting %d submissions failed (attempt %d); replaying from last commit",
+                len(records), self._failed_attempts,
+            )
+            await self.consumer.seek_to_committed()
+            await asyncio.sleep(settings.KAFKA_CONSUMER_RETRY_SECONDS)
+            return []
+        self._failed_attempts = 0
+        await self.consumer.commit()
+        return results
+
+    async def run(self):
+        await self.consumer.start()
+        try:
+            while not self._stopping:
+                await self.run_once()
+        finally:
+            await self.consumer.stop()
+
+    def stop(self):
+        self._stopping = True
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(SubmissionConsumer().run())
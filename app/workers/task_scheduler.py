@@ -0,0 +1,153 @@
+import logging
+import time
+from typing import Dict, Hashable, Tuple
+from app.core.config import settings
+from app.core.metrics import SCHEDULER_IN_FLIGHT, SCHEDULER_RELEASED_TASKS_TOTAL
+from app.db.repositories.task_repo import TaskRepo
+from app.db.session import SessionLocal
+from app.services.dispatch_service import DispatchService
+from app.workers.celery_app import PRIORITY_QUEUES
+
+logger = logging.getLogger(__name__)
+
+
+def fair_share(capacity: int, demands: Dict[Hashable, Tuple[float, int]]) -> Dict[Hashable, int]:
+    """
+    Weighted max-min split of `capacity` slots.
+    demands: {key: (weight, cap)} in tie-break order (earlier keys get leftover slots).
+    No key gets more than its cap; what a key cannot use is re-split among the others.
+    """
+    shares = dict.fromkeys(demands, 0)
+    need = {key: cap for key, (weight, cap) in demands.items() if cap > 0 and weight > 0}
+    remaining = capacity
+    while remaining > 0 and need:
+        total_weight = sum(demands[key][0] for key in need)
+        saturated = [key for key in need if need[key] <= remaining * demands[key][0] / total_weight]
+        if saturated:
+            for key in saturated:
+                granted = need.pop(key)
+                shares[key] += granted
+                remaining -= granted
+            continue
+        # Nobody is capped: proportional integer split, rounding leftovers to the earliest keys
+        grants = {key: int(remaining * demands[key][0] / total_weight) for key in need}
+        leftover = remaining - sum(grants.values())
+        for position, key in enumerate(need):
+            shares[key] += grants[key] + (1 if position < leftover else 0)
+        break
+    return shares
+
+
+def plan_release(free: int, pending_jobs, in_flight: Dict[str, int], weights: Dict[str, float], job_cap: int):
+    """
+    Split `free` ready-window slots: priority classes by weight, then tenants
+    equally within a class, then jobs equally within a tenant (oldest first on ties).
+    pending_jobs: TaskRepo.pending_by_job rows. Returns {job_id: tasks to release}.
+    """
+    tree = {}
+    for job_id, tenant, priority, _, pending in pending_jobs:
+        demand = min(pending, max(job_cap - in_flight.get(job_id, 0), 0))
+        if demand:
+            tree.setdefault(priority, {}).setdefault(tenant, {})[job_id] = demand
+
+    release = {}
+    by_priority = fair_share(free, {
+        priority: (weights.get(priority, 1.0), sum(sum(jobs.values()) for jobs in tenants.values()))
+        for priority, tenants in tree.items()
+    })
+    for priority, tenants in tree.items():
+        by_tenant = fair_share(by_priority[priority], {
+            tenant: (1.0, sum(jobs.values())) for tenant, jobs in tenants.items()
+        })
+        for tenant, jobs in tenants.items():
+            by_job = fair_share(by_tenant[tenant], {job_id: (1.0, demand) for job_id, demand in jobs.items()})
+            release.update((job_id, count) for job_id, count in by_job.items() if count)
+    return release
+
+
+class TaskScheduler:
+    """
+    Releases PENDING tasks to the broker in fair-share slices (SCHEDULER_ENABLED).
+    - At most SCHEDULER_READY_WINDOW tasks are in flight (QUEUED/RUNNING/RETRYING);
+      each tick fills only the free part of the window, so a new small job waits
+      behind at most one window, never behind a whole 10k-instance job
+    - Free slots go to priority classes by SCHEDULER_PRIORITY_WEIGHTS, then to
+      tenants and jobs equally; no job holds more than SCHEDULER_MAX_INFLIGHT_PER_JOB
+    - Released tasks go PENDING -> QUEUED (guarded UPDATE) before being published to
+      their priority queue, so a second scheduler can never publish a task twice
+    - A priority whose publish fails goes back QUEUED -> PENDING in the same tick
+    Run one instance: `python -m app.workers.task_scheduler`.
+    """
+
+    def __init__(self, window=None, job_cap=None, weights=None, interval=None):
+        self.window = window or settings.SCHEDULER_READY_WINDOW
+        self.job_cap = job_cap or settings.SCHEDULER_MAX_INFLIGHT_PER_JOB
+        self.weights = weights or settings.SCHEDULER_PRIORITY_WEIGHTS
+        self.interval = settings.SCHEDULER_INTERVAL_SECONDS if interval is None else interval
+        self._stopping = False
+
+    def tick(self, db) -> Dict[str, int]:
+        """One scheduling round; returns {job_id: tasks released}"""
+        in_flight = TaskRepo.in_flight_by_job(db)
+        busy = sum(in_flight.values())
+        SCHEDULER_IN_FLIGHT.set(busy)
+        free = self.window - busy
+        if free <= 0:
+            return {}
+        pending_jobs = TaskRepo.pending_by_job(db)
+        if not pending_jobs:
+            return {}
+
+        priorities = {job_id: priority for job_id, _, priority, _, _ in pending_jobs}
+        released, queued = {}, {}
+        for job_id, count in plan_release(free, pending_jobs, in_flight, self.weights, self.job_cap).items():
+            moved = TaskRepo.mark_queued(db, job_id, TaskRepo.pending_ids(db, job_id, count))
+            if moved:
+                released[job_id] = len(moved)
+                queued.setdefault(priorities[job_id], []).extend(moved)
+
+        # Highest-weight class first: its messages reach the broker first
+        for priority in sorted(queued, key=lambda p: -self.weights.get(p, 1.0)):
+            task_ids = [task_id for task_id, _ in queued[priority]]
+            try:
+                DispatchService.publish(task_ids, queue=PRIORITY_QUEUES.get(priority))
+            except Exception:
+                logger.exception("Publishing %d %s tasks failed; returning them to PENDING", len(task_ids), priority)
+                TaskRepo.unmark_queued(db, task_ids)
+                for _, job_id in queued[priority]:
+                    released[job_id] -= 1
+                continue
+            TaskRepo.mark_published(db, task_ids)
+            SCHEDULER_RELEASED_TASKS_TOTAL.labels(priority=priority).inc(len(task_ids))
+        released = {job_id: count for job_id, count in released.items() if count}
+        if released:
+            logger.debug("Released %d tasks for %d jobs (%d in flight)", sum(released.values()), len(released), busy)
+        return released
+
+    def run_once(self) -> Dict[str, int]:
+        db = SessionLocal()
+        try:
+            return self.tick(db)
+        except Exception:
+            logger.exception("Scheduling tick failed")
+            db.rollback()
+            return {}
+        finally:
+            db.close()
+
+    def run(self):
+        logger.info(
+            "Task scheduler started: window %d, per-job cap %d, weights %s",
+            self.window, self.job_cap, self.weights,
+        )
+        while not self._stopping:
+            self.run_once()
+            time.sleep(self.interval)
+
+    def stop(self):
+        self._stopping = True
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    TaskScheduler().run()
@@ -1,21 +1,310 @@
+import logging
+from datetime import timedelta
 from app.adapters.cloud_adapter_factory import CloudAdapterFactory
-from app.db.repositories.task_repo import TaskRepo
-from app.errors import TransientError, PermanentError
-from app.limiter import limiter
-from app.utils.retry import retry_backoff
-from app.celery_app import celery_app
-
-@celery_app.task(name="worker.create_instance", bind=True)
-def create_instance(self, task_id):
-    task = TaskRepo.get(task_id)
-    limiter.acquire(task.tenant)
+from app.core.config import settings
+from app.core.idempotency import ClaimHeartbeat, guard
+from app.core.metrics import CIRCUIT_DEFERRED_TASKS_TOTAL, RATE_LIMIT_WAIT_SECONDS
+from app.core.resilience import breaker, retry_budget
+from app.core.states import TaskStatus, TERMINAL_TASK_STATES
+from app.core.token_bucket import limiter
+from app.db.repositories.job_repo import JobRepo
+from app.db.repositories.task_repo import TaskOutcome, TaskRepo
+from app.db.session import SessionLocal
+from app.errors import CircuitOpenError, TransientError, PermanentError
+from app.services.dispatch_service import DispatchService
+from app.services.template_service import resolver
+from app.utils.retry import decorrelated_jitter, spread
+from app.workers.celery_app import (
+    PRIORITY_QUEUES, celery_app, CREATE_INSTANCE_TASK, CREATE_INSTANCES_BATCH_TASK, REAP_STUCK_TASKS_TASK, RECONCILE_INSTANCES_TASK,
+)
+from app.workers.reconciler import InstanceReconciler
+
+logger = logging.getLogger(__name__)
+
+def _defer(task, args, idempotency_keys, error):
+    """
+    Circuit open: put the message back with a countdown instead of calling the provider.
+    Nothing was attempted, so no retry is counted; claims are released so the new
+    message (new request id) can take them.
+    """
+    for key in idempotency_keys:
+        if key:
+            guard.release(key)
+    CIRCUIT_DEFERRED_TASKS_TOTAL.labels(cloud=error.cloud, region=error.region).inc(len(idempotency_keys))
+    queue = (task.request.delivery_info or {}).get("routing_key")
+    task.apply_async(args=args, countdown=spread(error.retry_after), **({"queue": queue} if queue else {}))
+
+def _next_backoff(previous):
+    return decorrelated_jitter(previous, settings.RETRY_BACKOFF_BASE_SECONDS, settings.RETRY_BACKOFF_CAP_SECONDS)
+
+def _retry_or_fail(task, db, task_id, job_id, error, backoff, heartbeat):
+    """
+    A started task whose call failed retryably: FAILED when out of retries or job retry
+    budget, else RETRYING and a Celery retry (its claim extended to cover the countdown)
+    """
+    if task.request.retries >= settings.TASK_MAX_RETRIES:
+        TaskRepo.mark_failed(db, task_id, str(error))
+        return
+    if not retry_budget.try_spend(job_id, JobRepo.get_total(db, job_id)):
+        TaskRepo.mark_failed(db, task_id, f"{error} (job retry budget exhausted)")
+        return
+    TaskRepo.mark_retrying(db, [task_id], str(error))
+    heartbeat(force=True)
+    countdown = _next_backoff(backoff)
+    raise task.retry(
+        exc=error, countdown=countdown, kwargs={"backoff": countdown}, max_retries=settings.TASK_MAX_RETRIES,
+    )
+
+@celery_app.task(name=CREATE_INSTANCE_TASK, bind=True)
+def create_instance(self, task_id, backoff=None):
+    db = SessionLocal()
+    try:
+        task, tenant = TaskRepo.get_with_tenant(db, task_id)
+        if task is None or task.status in TERMINAL_TASK_STATES:
+            return
+        owner = self.request.id or task_id
+        # Duplicate delivery of an instance another message already owns: skip cheaply
+        if task.idempotency_key and not guard.claim(task.idempotency_key, owner):
+            return
+        job_id = task.job_id
+        params = resolver.resolve(db, task)
+        cloud, region = settings.DEFAULT_CLOUD, params["region"]
+        try:
+            circuit = breaker.before_call(cloud, region)
+        except CircuitOpenError as e:
+            _defer(self, [task_id], [task.idempotency_key], e)
+            return
+        # Every exit settles the probe: recorded once the provider was called (healthy
+        # True/False), handed back when it never was (healthy None)
+        healthy, started = None, False
+        heartbeat = ClaimHeartbeat(guard, [task.idempotency_key], owner)
+        try:
+            if not TaskRepo.start_many(db, [task_id]):
+                return  # another delivery moved it first
+            started = True
+            waited = limiter.acquire(tenant, cloud, region, on_wait=heartbeat)
+            RATE_LIMIT_WAIT_SECONDS.labels(cloud=cloud, region=region).observe(waited)
+            heartbeat(force=True)
+            # Cached per (cloud, region): no client construction per task
+            adapter = CloudAdapterFactory.get(cloud, region)
+            healthy = False  # until the provider answers
+            result = adapter.create_instance({**params, "idempotency_key": task.idempotency_key})
+            healthy = True
+            TaskRepo.mark_success(db, task_id, result)
+        except TransientError as e:
+            _retry_or_fail(self, db, task_id, job_id, e, backoff, heartbeat)
+        except PermanentError as e:
+            # The provider answered (bad params): healthy as far as the circuit is concerned
+            healthy = True
+            TaskRepo.mark_failed(db, task_id, str(e))
+        except Exception as e:
+            # Limiter, adapter or database failure outside the adapter's error contract:
+            # retried like a transient error so the task never stays RUNNING
+            if not started:
+                raise
+            logger.warning("Task %s failed unexpectedly", task_id, exc_info=True)
+            db.rollback()
+            _retry_or_fail(self, db, task_id, job_id, e, backoff, heartbeat)
+        finally:
+            if healthy is None:
+                breaker.release(cloud, region, circuit)
+            else:
+                breaker.record(cloud, region, healthy, circuit)
+    finally:
+        db.close()
+
+@celery_app.task(name=CREATE_INSTANCES_BATCH_TASK, bind=True)
+def create_instances_batch(self, task_ids, backoff=None):
+    """
+    Batch mode of create_instance (WORKER_BATCH_MODE): one message carries up to
+    WORKER_BATCH_SIZE task ids.
+    - One query loads every task + tenant; claims are taken per task as in single mode
+    - Tasks whose region circuit is open are deferred as their own message (not started)
+    - The rest move to RUNNING with one UPDATE
+    - Per (tenant, region) group: limiter tokens in bulk, one adapter.create_instances call
+    - All terminal statuses are written together (TaskRepo.finish_many)
+    - Transient failures are retried as a smaller batch holding only those tasks,
+      as far as each job's retry budget allows; so are groups whose limiter wait or
+      provider call raised anything else
+    - Claims are heartbeated while waiting on the limiter and before each provider call
+    """
+    db = SessionLocal()
     try:
-        adapter = CloudAdapterFactory.get(task.cloud)
-        result = adapter.create_instance(task.params)
-        TaskRepo.mark_success(task_id, result)
-    except TransientError:
-        self.retry(countdown=retry_backoff(self.request.retries))
-    except PermanentError as e:
-        TaskRepo.mark_failed(task_id, str(e))from app.celery_app import celery_app
+        owner = self.request.id or task_ids[0]
+        cloud = settings.DEFAULT_CLOUD
+        claimed = []
+        for task, tenant in TaskRepo.get_many_with_tenant(db, task_ids):
+            if task.status in TERMINAL_TASK_STATES:
+                continue
+            if task.idempotency_key and not guard.claim(task.idempotency_key, owner):
+                continue
+            claimed.append((task, tenant))
+
+        # One circuit check per region; deferred tasks never reach RUNNING
+        by_region, circuits, called = {}, {}, set()
+        for (task, tenant), params in zip(claimed, resolver.resolve_many(db, [task for task, _ in claimed])):
+            by_region.setdefault(params["region"], []).append((task, tenant, params))
+        runnable = {}
+        for region, members in by_region.items():
+            try:
+                circuits[region] = breaker.before_call(cloud, region)
+            except CircuitOpenError as e:
+                _defer(self, [[task.id for task, _, _ in members]], [task.idempotency_key for task, _, _ in members], e)
+                continue
+            for task, tenant, params in members:
+                runnable[task.id] = (task, tenant, params)
+
+        outcomes, retry_tasks, retry_error = [], [], None
+        heartbeat = ClaimHeartbeat(guard, [task.idempotency_key for task, _ in claimed], owner)
+        try:
+            groups = {}
+            for task_id in TaskRepo.start_many(db, list(runnable)):
+                task, tenant, params = runnable[task_id]
+                groups.setdefault((tenant, params["region"]), []).append((task, params))
+            groups = list(groups.items())
+            for n, ((tenant, region), members) in enumerate(groups):
+                calling = False
+                try:
+                    waited = limiter.acquire_many(tenant, cloud, region, len(members), on_wait=heartbeat)
+                    RATE_LIMIT_WAIT_SECONDS.labels(cloud=cloud, region=region).observe(waited)
+                    heartbeat(force=True)
+                    adapter = CloudAdapterFactory.get(cloud, region)
+                    calling = True
+                    called.add(region)
+                    results = adapter.create_instances(
+                        [{**params, "idempotency_key": task.idempotency_key} for task, params in members]
+                    )
+                except Exception as e:
+                    # Limiter or provider failure outside the adapter's error contract: this
+                    # group and the ones after it are handled as transient failures (never
+                    # left RUNNING); the circuit only counts it if the provider was called
+                    logger.warning("Batch of %d tasks failed unexpectedly", len(members), exc_info=True)
+                    if calling:
+                        breaker.record(cloud, region, False, circuits[region])
+                    for _, rest in groups[n:]:
+                        for task, _ in rest:
+                            if self.request.retries < settings.TASK_MAX_RETRIES:
+                                retry_tasks.append((task, e))
+                            else:
+                                outcomes.append(TaskOutcome(task.id, TaskStatus.FAILED, None, str(e)))
+                    break
+                # One circuit sample per provider request group
+                healthy = not any(isinstance(result.error, TransientError) for result in results)
+                breaker.record(cloud, region, healthy, circuits[region])
+                for (task, _), result in zip(members, results):
+                    if result.error is None:
+                        outcomes.append(TaskOutcome(task.id, TaskStatus.SUCCESS, result.instance_id, None))
+                    elif isinstance(result.error, TransientError) and self.request.retries < settings.TASK_MAX_RETRIES:
+                        retry_tasks.append((task, result.error))
+                    else:
+                        outcomes.append(TaskOutcome(task.id, TaskStatus.FAILED, None, str(result.error)))
+        finally:
+            # Regions that made no provider call (nothing started, or an error before it): hand their probes back
+            for region in circuits.keys() - called:
+                breaker.release(cloud, region, circuits[region])
 
+        # Retry budget: all-or-nothing per job for this batch
+        retry_ids, by_job = [], {}
+        for task, error in retry_tasks:
+            by_job.setdefault(task.job_id, []).append((task, error))
+        for job_id, members in by_job.items():
+            if retry_budget.try_spend(job_id, JobRepo.get_total(db, job_id), len(members)):
+                retry_ids.extend(task.id for task, _ in members)
+                retry_error = members[0][1]
+            else:
+                outcomes.extend(
+                    TaskOutcome(task.id, TaskStatus.FAILED, None, f"{error} (job retry budget exhausted)")
+                    for task, error in members
+                )
+
+        TaskRepo.finish_many(db, outcomes)
+        if retry_ids:
+            TaskRepo.mark_retrying(db, retry_ids, str(retry_error))
+            heartbeat(force=True)
+            countdown = _next_backoff(backoff)
+            raise self.retry(
+                args=[retry_ids], kwargs={"backoff": countdown}, exc=retry_error,
+                countdown=countdown, max_retries=settings.TASK_MAX_RETRIES,
+            )
+    finally:
+        db.close()
+
+@celery_app.task(name=REAP_STUCK_TASKS_TASK)
+def reap_stuck_tasks():
+    """
+    Periodic (celery beat): put back on the broker tasks no worker will ever finish.
+    - RUNNING past TASK_STUCK_AFTER_SECONDS (dead worker), or RETRYING past that plus
+      RETRY_BACKOFF_CAP_SECONDS (retry message lost), once their claim has lapsed (the
+      owner heartbeats it, so a live claim means a worker still has the task):
+      failed when out of attempts, otherwise -> QUEUED
+    - QUEUED but never published, past TASK_UNPUBLISHED_AFTER_SECONDS: published now
+      (published tasks are never republished: their message is still on the broker)
+    - PENDING past the same age when SCHEDULER_ENABLED is off (dispatch thread died): -> QUEUED
+    - One indexed query per REAPER_BATCH_SIZE tasks; cutoffs come from the DB clock
+    - Published to each job's priority queue; if that fails they go back to PENDING
+    Returns counts of requeued and failed tasks.
+    """
+    requeued = failed = 0
+    abandoned = (TaskStatus.RUNNING, TaskStatus.RETRYING)
+    db = SessionLocal()
+    try:
+        now = TaskRepo.db_now(db)
+        running_before = now - timedelta(seconds=settings.TASK_STUCK_AFTER_SECONDS)
+        retrying_before = running_before - timedelta(seconds=settings.RETRY_BACKOFF_CAP_SECONDS)
+        unpublished_before = now - timedelta(seconds=settings.TASK_UNPUBLISHED_AFTER_SECONDS)
+        while True:
+            stuck = TaskRepo.find_stuck(
+                db, running_before, retrying_before, unpublished_before, settings.REAPER_BATCH_SIZE,
+                include_pending=not settings.SCHEDULER_ENABLED,
+            )
+            if not stuck:
+                break
+            # A live claim means a worker still has the task (it heartbeats): leave it alone
+            owned = {
+                row.id for row in stuck
+                if row.status in abandoned and row.idempotency_key and guard.is_claimed(row.idempotency_key)
+            }
+            stuck_left = [row for row in stuck if row.id not in owned]
+            exhausted = [
+                row for row in stuck_left
+                if row.status in abandoned and (row.attempts or 0) > settings.TASK_MAX_RETRIES
+            ]
+            failed += TaskRepo.finish_many(db, [
+                TaskOutcome(row.id, TaskStatus.FAILED, None, f"Stuck in {row.status}; attempts exhausted")
+                for row in exhausted
+            ])
+            exhausted_ids = {row.id for row in exhausted}
+            retry = [row for row in stuck_left if row.id not in exhausted_ids]
+            moved = TaskRepo.transition_many(
+                db, [row.id for row in retry if row.status != TaskStatus.QUEUED], TaskStatus.QUEUED,
+                published_at=None,
+            )
+            moved += TaskRepo.touch_queued(db, [row.id for row in retry if row.status == TaskStatus.QUEUED])
+            priorities = {row.id: row.priority for row in retry}
+            by_priority = {}
+            for task_id, _ in moved:
+                by_priority.setdefault(priorities[task_id], []).append(task_id)
+            for priority, task_ids in by_priority.items():
+                try:
+                    DispatchService.publish(task_ids, queue=PRIORITY_QUEUES.get(priority))
+                except Exception:
+                    TaskRepo.unmark_queued(db, task_ids)
+                    raise
+                TaskRepo.mark_published(db, task_ids)
+            requeued += len(moved)
+            # Owned rows come back on every page: stop once a full page moves nothing
+            if len(stuck) < settings.REAPER_BATCH_SIZE or not (moved or exhausted):
+                break
+    finally:
+        db.close()
+    if requeued or failed:
+        logger.warning("Reaper: requeued %d stuck tasks, failed %d", requeued, failed)
+    return {"requeued": requeued, "failed": failed}
 
+@celery_app.task(name=RECONCILE_INSTANCES_TASK)
+def reconcile_instances():
+    """
+    Periodic (celery beat): confirm launched instances reached running (see
+    app/workers/reconciler.py). Returns instance counts per stored cloud state.
+    """
+    return InstanceReconciler().run_once()
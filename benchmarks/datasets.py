@@ -0,0 +1,80 @@
+import csv
+import io
+import json
+from typing import Dict, List
+
+# ------------------------------
+# Synthetic ECS batches for the benchmark harness
+# Rows are valid by construction and deterministic for a given size, so runs on
+# different machines/commits submit byte-identical uploads.
+# Shape follows ecs_instances.csv: a few regions/types/images shared by many rows
+# (what launch templates dedupe) plus per-instance name, tags and password.
+# ------------------------------
+
+REGIONS = ["cn-north-1", "cn-east-2", "ap-southeast-1"]
+INSTANCE_TYPES = ["t3.medium", "c5.large", "m5.xlarge"]
+IMAGE_IDS = ["ami-0c55b159cbfafe1f0", "ami-0a1b2c3d4e5f60718"]
+SUBNET_IDS = ["subnet-0123456789abcdef0", "subnet-0fedcba9876543210"]
+SECURITY_GROUP_IDS = ["sg-0123456789abcdef0", "sg-0123456789abcdef1"]
+
+FILE_COLUMNS = [
+    "instance_name", "instance_type", "region", "image_id", "subnet_id",
+    "security_group_ids", "key_name", "tags", "login_password",
+]
+
+
+def make_instances(count: int, prefix: str = "bench") -> List[Dict]:
+    """count ECSInstanceConfig-shaped dicts with unique instance names"""
+    return [
+        {
+            "instance_name": f"{prefix}-{i:05d}",
+            "instance_type": INSTANCE_TYPES[i % len(INSTANCE_TYPES)],
+            "region": REGIONS[i % len(REGIONS)],
+            "image_id": IMAGE_IDS[i % len(IMAGE_IDS)],
+            "subnet_id": SUBNET_IDS[i % len(SUBNET_IDS)],
+            "security_group_ids": SECURITY_GROUP_IDS[: 1 + i % len(SECURITY_GROUP_IDS)],
+            "key_name": "bench-key",
+            "tags": {"env": "bench", "shard": str(i % 16)},
+            "login_password": f"Bench!{i:05d}",
+        }
+        for i in range(count)
+    ]
+
+
+def _file_row(inst: Dict) -> List[str]:
+    # Same encoding normalize_frame() expects: comma-joined SGs, "k:v,k:v" tags
+    return [
+        inst["instance_name"], inst["instance_type"], inst["region"], inst["image_id"], inst["subnet_id"],
+        ",".join(inst["security_group_ids"]), inst["key_name"] or "",
+        ",".join(f"{k}:{v}" for k, v in (inst["tags"] or {}).items()), inst["login_password"] or "",
+    ]
+
+
+def to_json(instances: List[Dict], **extra) -> bytes:
+    """Body for POST /ecs_creation/json"""
+    return json.dumps({"instances": instances, **extra}).encode()
+
+
+def to_csv(instances: List[Dict]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FILE_COLUMNS)
+    writer.writerows(_file_row(inst) for inst in instances)
+    return buffer.getvalue().encode()
+
+
+def to_xlsx(instances: List[Dict]) -> bytes:
+    from openpyxl import Workbook
+
+    # write_only: constant memory even for the 10k-row sheet
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(FILE_COLUMNS)
+    for inst in instances:
+        sheet.append(_file_row(inst))
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+ENCODERS = {"json": to_json, "csv": to_csv, "xlsx": to_xlsx}
@@ -0,0 +1,361 @@
+"""
+Offline benchmark of the submit -> dispatch -> complete pipeline.
+
+Drives /ecs_creation/json and /ecs_creation/file in-process through an ASGI client,
+with a Celery worker on the in-memory broker and the fake cloud adapter, so no
+Redis, Kafka or provider is needed. SQLite is the default; point DATABASE_URL at a
+local Postgres to benchmark the real insert/UPDATE paths.
+
+Usage (from the repo root):
+    python -m benchmarks.pipeline_bench                               # 100/1k/10k x json/csv/xlsx
+    python -m benchmarks.pipeline_bench --sizes 100,1000 --formats json,csv --repeats 5
+    python -m benchmarks.pipeline_bench --scheduler --mixed 10            # small-job latency behind a large job
+    python -m benchmarks.pipeline_bench --save-baseline benchmarks/baseline.json
+    python -m benchmarks.pipeline_bench --baseline benchmarks/baseline.json --tolerance 0.25
+
+Exits 1 when --baseline is given and any metric regressed beyond the tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Settings are read at import time: the offline environment must be in place before `app` is imported
+BENCH_DIR = tempfile.mkdtemp(prefix="ecs-bench-")
+OFFLINE_ENV = {
+    "DATABASE_URL": f"sqlite:///{BENCH_DIR}/bench.db",
+    "CELERY_BROKER": "memory://",
+    "CELERY_BACKEND": "cache+memory://",
+    "DEFAULT_CLOUD": "fake",
+    "KAFKA_BACKEND": "memory",
+    "QUOTA_BACKEND": "memory",
+    "PROGRESS_BACKEND": "memory",
+    "IDEMPOTENCY_BACKEND": "memory",
+    "CLOUD_RATE_LIMIT_BACKEND": "memory",
+    "RESILIENCE_BACKEND": "memory",
+    "VALIDATION_CACHE_BACKEND": "memory",
+    "CLOUD_STATUS_CACHE_BACKEND": "memory",
+    "CLOUD_RATE_LIMIT_PER_SEC": "1000000",
+    "CLOUD_RATE_LIMIT_BURST": "1000000",
+    "DAILY_QUOTA": "1000000",
+    "RATE_LIMIT": "1000000/minute",
+    "WORKER_METRICS_PORT": "0",
+}
+
+# Reported metrics; all are "lower is better" for baseline comparison
+METRICS = [
+    "parse_s", "validate_s", "insert_s", "submit_p50_s", "dispatch_s",
+    "e2e_p50_s", "e2e_p99_s", "small_e2e_s", "large_e2e_s", "peak_rss_mb",
+]
+
+
+def configure_environment(args):
+    for key, value in OFFLINE_ENV.items():
+        os.environ.setdefault(key, value)
+    # Explicit flags win over the environment (the fake adapter defaults to 50ms per call)
+    os.environ["FAKE_CLOUD_CALL_LATENCY_MS"] = str(args.cloud_call_ms)
+    os.environ["FAKE_CLOUD_INSTANCE_LATENCY_MS"] = str(args.cloud_instance_ms)
+    os.environ["FAKE_CLOUD_ERROR_RATE"] = str(args.cloud_error_rate)
+    if args.batch_mode:
+        os.environ["WORKER_BATCH_MODE"] = "true"
+    if args.scheduler:
+        os.environ["SCHEDULER_ENABLED"] = "true"
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile (with few repeats p99 is the slowest run)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def rounded(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 4)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss: kilobytes on Linux, bytes on macOS; a process-wide high-water mark
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def phase_seconds(endpoint: str) -> Dict[str, float]:
+    """Cumulative INGEST_PHASE_SECONDS per phase for one endpoint (diffed around each run)"""
+    from app.core.metrics import metrics_registry
+
+    registry = metrics_registry()
+    return {
+        phase: registry.get_sample_value("ecs_ingest_phase_seconds_sum", {"endpoint": endpoint, "phase": phase}) or 0.0
+        for phase in ("parse", "validate", "insert")
+    }
+
+
+def time_json_body(body: bytes) -> Dict[str, float]:
+    """
+    /json bodies are decoded and validated by FastAPI before the handler runs, outside
+    INGEST_PHASE_SECONDS; time the same json.loads + model validation on the payload
+    """
+    from app.schemas.ecs_schema import BatchECSCreateRequest
+
+    started = time.perf_counter()
+    payload = json.loads(body)
+    parsed = time.perf_counter()
+    BatchECSCreateRequest.model_validate(payload)
+    return {"parse": parsed - started, "validate": time.perf_counter() - parsed}
+
+
+def wait_for_job(job_id: str, timeout: float, poll: float = 0.02):
+    from app.core.config import settings
+    from app.core.states import TERMINAL_JOB_STATES
+    from app.db.models import Job
+    from app.db.session import SessionLocal
+
+    deadline = time.monotonic() + timeout
+    db = SessionLocal()
+    try:
+        while True:
+            db.expire_all()
+            job = db.get(Job, job_id)
+            # Push mode records dispatch stats on meta after publish; wait for both
+            dispatch = (job.meta or {}).get("dispatch") if job is not None else None
+            if job is not None and job.status in TERMINAL_JOB_STATES and (dispatch or settings.SCHEDULER_ENABLED):
+                return job.status, dispatch, {"succeeded": job.succeeded, "failed": job.failed}
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Job {job_id} not finished after {timeout}s (status {job and job.status})")
+            db.rollback()
+            time.sleep(poll)
+    finally:
+        db.close()
+        SessionLocal.remove()
+
+
+async def submit(client, fmt: str, payload: bytes):
+    if fmt == "json":
+        return await client.post(
+            "/api/v1/jobs/ecs_creation/json", content=payload, headers={"content-type": "application/json"}
+        )
+    return await client.post(
+        "/api/v1/jobs/ecs_creation/file",
+        files={"file": (f"bench.{fmt}", payload)},
+        data={"stream": "false"},
+    )
+
+
+async def run_scenario(client, fmt: str, size: int, repeats: int, timeout: float) -> Dict:
+    from benchmarks.datasets import ENCODERS, make_instances
+
+    endpoint = "ecs_creation_json" if fmt == "json" else "ecs_creation_file"
+    phases = {"parse": [], "validate": [], "insert": []}
+    submits, dispatches, e2e = [], [], []
+    outcome = {}
+
+    for run in range(repeats):
+        # Fresh names per run: instance names are only unique within a batch, but keep runs independent
+        payload = ENCODERS[fmt](make_instances(size, prefix=f"{fmt}-{size}-{run}"))
+        before = phase_seconds(endpoint)
+
+        started = time.perf_counter()
+        response = await submit(client, fmt, payload)
+        submitted = time.perf_counter()
+        body = response.json()
+        if "job_id" not in body:
+            raise RuntimeError(f"{fmt}/{size}: submission rejected: {str(body)[:500]}")
+
+        status, dispatch, outcome = wait_for_job(body["job_id"], timeout)
+        finished = time.perf_counter()
+
+        after = phase_seconds(endpoint)
+        measured = time_json_body(payload) if fmt == "json" else {}
+        for phase in phases:
+            phases[phase].append(measured.get(phase, after[phase] - before[phase]))
+        submits.append(submitted - started)
+        if dispatch:  # None when the scheduler released the job in slices
+            dispatches.append(dispatch["seconds"])
+        e2e.append(finished - started)
+        outcome = {"status": status, **outcome}
+
+    return {
+        "format": fmt,
+        "size": size,
+        "repeats": repeats,
+        "parse_s": rounded(percentile(phases["parse"], 50)),
+        "validate_s": rounded(percentile(phases["validate"], 50)),
+        "insert_s": rounded(percentile(phases["insert"], 50)),
+        "submit_p50_s": rounded(percentile(submits, 50)),
+        "dispatch_s": rounded(percentile(dispatches, 50)),
+        "e2e_p50_s": rounded(percentile(e2e, 50)),
+        "e2e_p99_s": rounded(percentile(e2e, 99)),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "last_outcome": outcome,
+    }
+
+
+async def run_mixed(client, large: int, small: int, timeout: float) -> Dict:
+    """A `small` job submitted right behind a `large` one: the starvation case fair-share scheduling targets"""
+    from benchmarks.datasets import make_instances, to_json
+
+    started = time.perf_counter()
+    jobs = {}
+    for name, size in (("large", large), ("small", small)):
+        response = await submit(client, "json", to_json(make_instances(size, prefix=f"mixed-{name}")))
+        jobs[name] = response.json()["job_id"]
+    # The small job finishes first if it is not starved; wait for it, then for the large one
+    wait_for_job(jobs["small"], timeout)
+    small_done = time.perf_counter()
+    wait_for_job(jobs["large"], timeout)
+    return {
+        "format": "json",
+        "size": large,
+        "small_size": small,
+        "small_e2e_s": rounded(small_done - started),
+        "large_e2e_s": rounded(time.perf_counter() - started),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+async def run_benchmarks(args) -> Dict:
+    import httpx
+    from celery.contrib.testing.worker import start_worker
+    from app.core.config import settings
+    from app.db.base import Base
+    from app.db.session import engine
+    from app.main import app as fastapi_app
+    from app.workers.celery_app import celery
+    from app.workers.task_scheduler import TaskScheduler
+    import app.db.models  # noqa: F401  (register tables)
+
+    Base.metadata.create_all(engine)
+    # The memory transport runs the worker's blocking loop, which applies acks/QoS only every 2s drain
+    # cycle: with prefetch == concurrency it stalls after each `concurrency` tasks. A deep prefetch keeps
+    # the threads fed (the broker under test is not the point here), and short polls cut idle gaps.
+    celery.conf.worker_prefetch_multiplier = 10000
+    celery.conf.broker_transport_options = {"polling_interval": 0.005}
+    results = {}
+    scheduler = None
+    if settings.SCHEDULER_ENABLED:
+        scheduler = TaskScheduler(interval=0.05)
+        threading.Thread(target=scheduler.run, name="task-scheduler", daemon=True).start()
+    transport = httpx.ASGITransport(app=fastapi_app)
+    try:
+        with start_worker(celery, pool="threads", concurrency=args.concurrency, perform_ping_check=False, loglevel="error"):
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+                # Smallest first: peak RSS is a high-water mark, so each row reflects sizes up to its own
+                for size in sorted(args.sizes):
+                    for fmt in args.formats:
+                        key = f"{fmt}-{size}"
+                        results[key] = await run_scenario(client, fmt, size, args.repeats, args.timeout)
+                        print(format_row(key, results[key]), flush=True)
+                if args.mixed:
+                    key = f"mixed-{max(args.sizes)}"
+                    results[key] = await run_mixed(client, max(args.sizes), args.mixed, args.timeout)
+                    print(format_row(key, results[key]), flush=True)
+    finally:
+        if scheduler is not None:
+            scheduler.stop()
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": engine.url.get_backend_name(),
+            "worker_pool": f"threads x{args.concurrency}",
+            "worker_batch_mode": settings.WORKER_BATCH_MODE,
+            "scheduler": {
+                "window": settings.SCHEDULER_READY_WINDOW,
+                "job_cap": settings.SCHEDULER_MAX_INFLIGHT_PER_JOB,
+            } if settings.SCHEDULER_ENABLED else None,
+            "fake_cloud": {
+                "call_ms": settings.FAKE_CLOUD_CALL_LATENCY_MS,
+                "instance_ms": settings.FAKE_CLOUD_INSTANCE_LATENCY_MS,
+                "error_rate": settings.FAKE_CLOUD_ERROR_RATE,
+            },
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "scenarios": results,
+    }
+
+
+def format_row(key: str, result: Dict) -> str:
+    return f"{key:<12}" + " ".join(f"{metric}={result[metric]}" for metric in METRICS if metric in result)
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float, min_delta: float) -> List[str]:
+    """Metrics slower than baseline * (1 + tolerance); deltas under min_delta seconds are noise"""
+    regressions = []
+    for key, base in baseline.get("scenarios", {}).items():
+        result = current["scenarios"].get(key)
+        if result is None:
+            continue
+        for metric in METRICS:
+            old, new = base.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            floor = 0 if metric == "peak_rss_mb" else min_delta
+            if new > old * (1 + tolerance) and new - old > floor:
+                regressions.append(f"{key} {metric}: {old} -> {new} (+{(new / old - 1) * 100 if old else float('inf'):.0f}%)")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,1000,10000", type=lambda v: [int(s) for s in v.split(",")])
+    parser.add_argument("--formats", default="json,csv,xlsx", type=lambda v: v.split(","))
+    parser.add_argument("--repeats", type=int, default=3, help="Submissions per scenario (p50/p99 over these)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Worker threads")
+    parser.add_argument("--batch-mode", action="store_true", help="Enable WORKER_BATCH_MODE")
+    parser.add_argument("--scheduler", action="store_true", help="Enable SCHEDULER_ENABLED (scheduler runs in a thread)")
+    parser.add_argument("--mixed", type=int, default=0, metavar="N",
+                        help="Also time an N-instance job submitted right behind the largest size")
+    parser.add_argument("--cloud-call-ms", type=float, default=0.0, help="Fake provider latency per request")
+    parser.add_argument("--cloud-instance-ms", type=float, default=0.0, help="Fake provider latency per instance")
+    parser.add_argument("--cloud-error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=600.0, help="Max seconds for one job to finish")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--save-baseline", help="Write results as the new baseline JSON")
+    parser.add_argument("--baseline", help="Compare against this baseline JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown vs baseline (0.2 = 20%%)")
+    parser.add_argument("--min-delta", type=float, default=0.005, help="Ignore regressions smaller than this (s)")
+    args = parser.parse_args(argv)
+    unknown = set(args.formats) - {"json", "csv", "xlsx"}
+    if unknown:
+        parser.error(f"Unknown formats: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None) -> int:
+    import asyncio
+    import logging
+
+    args = parse_args(argv)
+    configure_environment(args)
+    logging.basicConfig(level=logging.WARNING)
+
+    results = asyncio.run(run_benchmarks(args))
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Wrote {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print(f"{len(regressions)} regression(s) vs {args.baseline} (tolerance {args.tolerance:.0%}):")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions vs {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+import os
+import shutil
+import tempfile
+import time
+
+import pytest
+
+# The test database lives in a throwaway directory, never in the directory pytest runs from
+TEST_DB_DIR = tempfile.mkdtemp(prefix="ecs-tests-")
+
+# Same offline switches as benchmarks.pipeline_bench: no Redis/Kafka/Postgres/cloud needed.
+# Set before any app module is imported (settings and backends are built at import time).
+OFFLINE_ENV = {
+    "DATABASE_URL": f"sqlite:///{os.path.join(TEST_DB_DIR, 'test.db')}",
+    "CELERY_BROKER": "memory://",
+    "CELERY_BACKEND": "cache+memory://",
+    "DEFAULT_CLOUD": "fake",
+    "KAFKA_BACKEND": "memory",
+    "QUOTA_BACKEND": "memory",
+    "PROGRESS_BACKEND": "memory",
+    "IDEMPOTENCY_BACKEND": "memory",
+    "CLOUD_RATE_LIMIT_BACKEND": "memory",
+    "RESILIENCE_BACKEND": "memory",
+    "VALIDATION_CACHE_BACKEND": "memory",
+    "CLOUD_STATUS_CACHE_BACKEND": "memory",
+}
+for key, value in OFFLINE_ENV.items():
+    os.environ.setdefault(key, value)
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(TEST_DB_DIR, ignore_errors=True)
+
+
+class FakeClock:
+    """Stands in for time.monotonic / time.time; tests move it with advance()"""
+
+    def __init__(self, start: float = 1_000_000.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+    def sleep(self, seconds: float):
+        # Like a real sleep, always lets some time pass (float rounding can leave ~1e-12s waits)
+        self.advance(max(seconds, 1e-6))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(time, "monotonic", fake)
+    monkeypatch.setattr(time, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def db():
+    """Sync session on a freshly created schema (dropped again after the test)"""
+    import app.db.models  # noqa: F401
+    from app.db.base import Base
+    from app.db.session import SessionLocal, engine
+
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        SessionLocal.remove()
+        Base.metadata.drop_all(engine)
+
+
+@pytest.fixture
+def run_async(db):
+    """Run a coroutine on a fresh loop; pooled aiosqlite connections are dropped after each run"""
+    import asyncio
+
+    from app.db.session import async_engine
+
+    def run(coro):
+        async def wrapped():
+            try:
+                return await coro
+            finally:
+                await async_engine.dispose()
+
+        return asyncio.run(wrapped())
+
+    return run
+
+
+@pytest.fixture
+def no_dispatch(monkeypatch):
+    """Record background dispatches instead of publishing them"""
+    from app.services.dispatch_service import DispatchService
+
+    calls = []
+    monkeypatch.setattr(
+        DispatchService, "dispatch_in_background",
+        staticmethod(lambda job_id, task_ids, priority=None: calls.append((job_id, list(task_ids), priority))),
+    )
+    return calls
+
+
+@pytest.fixture
+def make_instances():
+    """make_instances(n, prefix) -> n valid ECSInstanceConfig rows named prefix-0.."""
+    from app.schemas.ecs_schema import ECSInstanceConfig
+
+    def make(n, prefix="web", **overrides):
+        return [
+            ECSInstanceConfig(**{
+                "instance_name": f"{prefix}-{i}",
+                "instance_type": "t3.micro",
+                "region": "cn-north-1",
+                "image_id": "ami-0c55b159cbfafe1f0",
+                "subnet_id": "subnet-0123456789abcdef0",
+                "security_group_ids": ["sg-0123456789abcdef0"],
+                **overrides,
+            })
+            for i in range(n)
+        ]
+
+    return make
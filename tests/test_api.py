@@ -0,0 +1,112 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+
+from app.core.auth import API_KEY_HEADER, VALID_API_KEYS
+from app.core.states import JobStatus
+from app.db.models.job import Job
+
+OWNER = {API_KEY_HEADER: VALID_API_KEYS[0]}
+OTHER = {API_KEY_HEADER: VALID_API_KEYS[1]}
+
+
+@pytest.fixture
+def client(db, no_dispatch):
+    from app.db.session import async_engine
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+    asyncio.run(async_engine.dispose())
+
+
+def instance(name, **overrides):
+    return {
+        "instance_name": name,
+        "instance_type": "t3.micro",
+        "region": "cn-north-1",
+        "image_id": "ami-0c55b159cbfafe1f0",
+        "subnet_id": "subnet-0123456789abcdef0",
+        "security_group_ids": ["sg-0123456789abcdef0"],
+        **overrides,
+    }
+
+
+def create_job(client, count, headers=OWNER, **body):
+    response = client.post(
+        "/api/v1/jobs/ecs_creation/json",
+        json={"instances": [instance(f"web-{i}") for i in range(count)], **body},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_tasks_are_listed_page_by_page(client):
+    job_id = create_job(client, 5)["job_id"]
+
+    first = client.get(f"/api/v1/jobs/{job_id}/tasks", params={"limit": 2}, headers=OWNER).json()
+    assert [item["index"] for item in first["items"]] == [0, 1]
+    assert first["next_cursor"] == 1
+    rest = client.get(
+        f"/api/v1/jobs/{job_id}/tasks", params={"after": first["next_cursor"], "limit": 10}, headers=OWNER,
+    ).json()
+    assert [item["index"] for item in rest["items"]] == [2, 3, 4]
+    assert rest["next_cursor"] is None
+
+
+def test_task_listing_projects_only_public_columns(client):
+    job_id = create_job(client, 1)["job_id"]
+    url = f"/api/v1/jobs/{job_id}/tasks"
+
+    items = client.get(url, params={"fields": "id,status"}, headers=OWNER).json()["items"]
+    assert set(items[0]) == {"id", "status", "index"}  # index always comes along (the cursor)
+    assert "params" not in client.get(url, headers=OWNER).json()["items"][0]
+    response = client.get(url, params={"fields": "id,params"}, headers=OWNER)
+    assert response.status_code == 400 and "params" in response.json()["detail"]
+
+
+def test_another_submitters_job_reads_as_not_found(client):
+    job_id = create_job(client, 1)["job_id"]
+
+    assert client.get(f"/api/v1/jobs/{job_id}/tasks", headers=OTHER).status_code == 404
+    assert client.get("/api/v1/jobs/no-such-job/tasks", headers=OWNER).status_code == 404
+
+
+def test_resubmitted_batch_returns_the_existing_job(client, no_dispatch):
+    first = create_job(client, 2, batch_id="b1")
+    again = create_job(client, 2, batch_id="b1")
+
+    assert again["status"] == "batch_already_submitted"
+    assert again["job_id"] == first["job_id"]
+    assert [job_id for job_id, _, _ in no_dispatch] == [first["job_id"]]
+    # batch_ids are scoped to the submitter
+    assert create_job(client, 2, headers=OTHER, batch_id="b1")["job_id"] != first["job_id"]
+
+
+def test_job_status_reports_counters(client):
+    job_id = create_job(client, 3)["job_id"]
+
+    status = client.get(f"/api/v1/jobs/{job_id}", headers=OWNER).json()
+    assert (status["total"], status["succeeded"], status["failed"], status["pending"]) == (3, 0, 0, 3)
+    assert status["progress"] == 0.0
+    assert client.get("/api/v1/jobs/no-such-job", headers=OWNER).status_code == 404
+
+
+def test_progress_stream_of_a_finished_job_ends_with_done(client, db):
+    job_id = create_job(client, 2)["job_id"]
+    db.execute(update(Job).where(Job.id == job_id).values(succeeded=1, failed=1, status=JobStatus.PARTIAL))
+    db.commit()
+
+    with client.stream("GET", f"/api/v1/jobs/{job_id}/events", headers=OWNER) as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        body = "".join(response.iter_text())
+
+    events = [block.split("\n") for block in body.strip().split("\n\n")]
+    assert [lines[0] for lines in events] == ["event: progress", "event: done"]
+    done = json.loads(events[1][1][len("data: "):])
+    assert (done["status"], done["progress"], done["pending"]) == (JobStatus.PARTIAL, 100.0, 0)
+    assert client.get("/api/v1/jobs/no-such-job/events", headers=OWNER).status_code == 404
@@ -0,0 +1,49 @@
+import pytest
+
+from app.core.states import TaskStatus
+from app.db.models.task import Task
+from app.db.repositories.job_repo import JobRepo
+from app.db.repositories.task_repo import TaskRepo
+from app.services import dispatch_service
+from app.services.dispatch_service import DispatchService
+
+
+@pytest.fixture
+def job_tasks(db, make_instances, monkeypatch):
+    job = JobRepo.create(db, "key:a", 3, commit=False, priority="low")
+    task_ids = [ref.id for ref in TaskRepo.bulk_create(db, job.id, make_instances(3))]
+    # As dispatch_in_background would have counted them
+    monkeypatch.setattr(dispatch_service, "_pending_tasks", dispatch_service._pending_tasks + len(task_ids))
+    return job.id, task_ids
+
+
+def test_dispatch_marks_tasks_queued_and_published(db, job_tasks, monkeypatch):
+    job_id, task_ids = job_tasks
+    sent = []
+    monkeypatch.setattr(DispatchService, "publish", staticmethod(
+        lambda ids, queue=None: sent.append((queue, list(ids))) or {"count": len(ids), "seconds": 0, "rate_per_sec": None}
+    ))
+
+    DispatchService.dispatch_job(job_id, task_ids, "low")
+
+    assert sent == [("ecs-low", task_ids)]
+    db.expire_all()
+    tasks = [db.get(Task, task_id) for task_id in task_ids]
+    assert {task.status for task in tasks} == {TaskStatus.QUEUED}
+    assert all(task.published_at is not None for task in tasks)
+
+
+def test_failed_publish_returns_tasks_to_pending(db, job_tasks, monkeypatch):
+    job_id, task_ids = job_tasks
+
+    def broker_down(ids, queue=None):
+        raise ConnectionError("broker down")
+
+    monkeypatch.setattr(DispatchService, "publish", staticmethod(broker_down))
+    with pytest.raises(ConnectionError):
+        DispatchService.dispatch_job(job_id, task_ids, "low")
+
+    db.expire_all()
+    tasks = [db.get(Task, task_id) for task_id in task_ids]
+    assert {task.status for task in tasks} == {TaskStatus.PENDING}
+    assert all(task.published_at is None for task in tasks)
@@ -0,0 +1,76 @@
+import pytest
+
+from app.core.idempotency import ClaimHeartbeat, IdempotencyGuard, InMemoryClaimBackend, idempotency_key
+
+
+@pytest.fixture
+def guard(clock):
+    return IdempotencyGuard(InMemoryClaimBackend(), ttl=30)
+
+
+def test_key_stable_per_batch_row():
+    assert idempotency_key("b1", 3) == idempotency_key("b1", 3) == "b1:3"
+    assert idempotency_key("b1", 3) != idempotency_key("b2", 3)
+
+
+def test_key_scoped_to_submitter():
+    # batch_ids are only unique per submitter: two callers' rows must not share a claim
+    assert idempotency_key("b1", 3, "key:a") != idempotency_key("b1", 3, "key:b")
+    assert idempotency_key("b1", 3, "key:a") == "key:a:b1:3"
+
+
+def test_first_claim_wins(guard):
+    assert guard.claim("b1:0", "celery-1")
+    assert not guard.claim("b1:0", "celery-2")
+
+
+def test_owner_may_reclaim(guard):
+    # Celery keeps request.id across retries/redeliveries: a crashed attempt resumes
+    assert guard.claim("b1:0", "celery-1")
+    assert guard.claim("b1:0", "celery-1")
+
+
+def test_claim_expires(guard, clock):
+    guard.claim("b1:0", "celery-1")
+    clock.advance(30)
+    assert guard.claim("b1:0", "celery-2")
+
+
+def test_release_lets_a_new_message_claim(guard):
+    guard.claim("b1:0", "celery-1")
+    guard.release("b1:0")
+    assert guard.claim("b1:0", "celery-2")
+    guard.release("missing")  # releasing an unknown key is a no-op
+
+
+def test_heartbeat_keeps_the_claim_alive(guard, clock):
+    guard.claim("b1:0", "celery-1")
+    clock.advance(20)
+    assert guard.extend("b1:0", "celery-1")
+    clock.advance(20)
+    assert guard.is_claimed("b1:0")
+    assert not guard.claim("b1:0", "celery-2")
+    clock.advance(10)
+    assert not guard.is_claimed("b1:0")
+
+
+def test_only_the_owner_extends_a_live_claim(guard, clock):
+    guard.claim("b1:0", "celery-1")
+    assert not guard.extend("b1:0", "celery-2")
+    clock.advance(30)
+    assert not guard.extend("b1:0", "celery-1")  # lapsed: another delivery may own it now
+
+
+def test_heartbeat_is_throttled_to_a_third_of_the_ttl(guard, clock):
+    guard.claim("b1:0", "celery-1")
+    beat = ClaimHeartbeat(guard, ["b1:0", None], "celery-1")
+    clock.advance(9)
+    beat()  # too soon: no extension
+    clock.advance(21)
+    assert not guard.is_claimed("b1:0")
+
+    guard.claim("b1:0", "celery-1")
+    clock.advance(25)
+    beat()
+    clock.advance(25)
+    assert guard.is_claimed("b1:0")
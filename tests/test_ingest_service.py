@@ -0,0 +1,43 @@
+import asyncio
+import gzip
+
+import pytest
+
+from app.services.ingest_service import iter_ndjson_lines
+
+
+async def _stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def lines(*chunks, **kwargs):
+    async def run():
+        return [line async for line in iter_ndjson_lines(_stream(*chunks), **kwargs)]
+
+    return asyncio.run(run())
+
+
+def test_lines_split_across_chunks():
+    assert lines(b'{"a":1}\n{"b"', b':2}\n{"c":3}') == [b'{"a":1}', b'{"b":2}', b'{"c":3}']
+
+
+def test_over_long_complete_line_in_one_chunk_is_rejected():
+    with pytest.raises(ValueError, match="exceeds 8 bytes"):
+        lines(b"0123456789\nok\n", max_line_bytes=8)
+
+
+def test_over_long_partial_line_is_rejected():
+    with pytest.raises(ValueError, match="exceeds 8 bytes"):
+        lines(b"ok\n0123456789", b"more", max_line_bytes=8)
+
+
+def test_gzip_members_are_concatenated():
+    body = gzip.compress(b"one\ntwo\n") + gzip.compress(b"three\n")
+    assert lines(body[:5], body[5:], gzipped=True) == [b"one", b"two", b"three"]
+
+
+def test_truncated_gzip_is_rejected():
+    body = gzip.compress(b"one\ntwo\n")
+    with pytest.raises(ValueError, match="Truncated"):
+        lines(body[:-6], gzipped=True)
@@ -0,0 +1,92 @@
+import pytest
+
+from app.core.states import JobStatus
+from app.db.models import Job
+from app.db.repositories.job_repo import AsyncJobRepo
+from app.db.session import AsyncSessionLocal
+from app.services.ingest_service import IngestReport
+from app.services.job_service import JobService
+
+
+def submission(batch_id, instances, submitter="key:a"):
+    return {"batch_id": batch_id, "submitter": submitter, "instances": instances}
+
+
+def bulk(run_async, submissions):
+    async def run():
+        async with AsyncSessionLocal() as session:
+            return await JobService.create_jobs_bulk_async(session, submissions)
+
+    return run_async(run())
+
+
+def test_bulk_reports_existing_job_for_redelivered_batch(run_async, no_dispatch, make_instances):
+    [(job_id, _, created)] = bulk(run_async, [submission("b1", make_instances(2))])
+    assert created
+
+    results = bulk(run_async, [submission("b1", make_instances(2)), submission("b2", make_instances(1))])
+    assert results[0] == (job_id, "b1", False)
+    assert results[1][1:] == ("b2", True)
+
+
+def test_bulk_duplicate_within_one_poll_gets_the_new_job_id(run_async, no_dispatch, make_instances):
+    results = bulk(run_async, [submission("b1", make_instances(1)), submission("b1", make_instances(1))])
+    assert results[0][2] is True
+    assert results[1] == (results[0][0], "b1", False)
+
+
+def test_bulk_race_reports_duplicate_the_same_way(run_async, no_dispatch, make_instances, monkeypatch):
+    [(job_id, _, _)] = bulk(run_async, [submission("b1", make_instances(2))])
+
+    # A concurrent request inserts b1 between the existence check and the insert
+    async def nothing_yet(db, keys):
+        return {}
+
+    monkeypatch.setattr(AsyncJobRepo, "existing_batch_jobs", staticmethod(nothing_yet))
+    results = bulk(run_async, [submission("b1", make_instances(2)), submission("b2", make_instances(1))])
+
+    assert results[0] == (job_id, "b1", False)
+    assert results[1][1:] == ("b2", True)
+    assert [job for job, _, _ in no_dispatch] == [job_id, results[1][0]]
+
+
+def test_same_batch_id_from_another_submitter_is_a_new_job(run_async, no_dispatch, make_instances):
+    [(first, _, _)] = bulk(run_async, [submission("b1", make_instances(1), submitter="key:a")])
+    [(second, _, created)] = bulk(run_async, [submission("b1", make_instances(1), submitter="key:b")])
+    assert created and second != first
+
+
+def progressive(run_async, *batches, fail=None):
+    report = IngestReport()
+
+    async def stream():
+        for batch in batches:
+            report.row_count += len(batch)
+            yield batch
+        if fail:
+            raise fail
+
+    async def run():
+        async with AsyncSessionLocal() as session:
+            return await JobService.create_job_progressive_async(session, stream(), report, submitter="key:a")
+
+    return run_async(run())
+
+
+def test_progressive_upload_is_sealed_when_the_stream_aborts(run_async, no_dispatch, make_instances, db):
+    with pytest.raises(ValueError, match="line too long"):
+        progressive(run_async, make_instances(2), fail=ValueError("line too long"))
+
+    [(job_id, _, _)] = no_dispatch
+    job = db.get(Job, job_id)
+    assert job.status != JobStatus.RECEIVING
+    assert job.meta["ingest"] == {"row_count": 2, "written": 2, "error_count": 0, "aborted": "line too long"}
+
+
+def test_failing_seal_does_not_mask_the_upload_error(run_async, no_dispatch, make_instances, monkeypatch):
+    async def broken_seal(db, job_id, **meta_fields):
+        raise RuntimeError("database gone")
+
+    monkeypatch.setattr(AsyncJobRepo, "seal", staticmethod(broken_seal))
+    with pytest.raises(ValueError, match="line too long"):
+        progressive(run_async, make_instances(1), fail=ValueError("line too long"))
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+
+from app.core.progress import ProgressHub, sse_event
+
+
+def snapshot(job_id, succeeded, failed=0, total=10):
+    return {"job_id": job_id, "total": total, "succeeded": succeeded, "failed": failed, "status": "running"}
+
+
+def run(scenario):
+    """Run scenario(hub) on a fresh hub whose flush loop never fires on its own"""
+    async def main():
+        hub = ProgressHub(interval=3600)
+        try:
+            return await scenario(hub)
+        finally:
+            await hub.stop()
+
+    return asyncio.run(main())
+
+
+def test_snapshots_for_unwatched_jobs_are_dropped():
+    async def scenario(hub):
+        queue = hub.watch("j1")
+        hub.ingest(snapshot("j2", 1))
+        hub._flush()
+        return queue.qsize(), hub._latest
+
+    assert run(scenario) == (0, {})
+
+
+def test_flush_sends_only_the_newest_snapshot():
+    async def scenario(hub):
+        queue = hub.watch("j1")
+        hub.ingest(snapshot("j1", 1))
+        hub.ingest(snapshot("j1", 3))
+        hub.ingest(snapshot("j1", 2))  # late publish from another worker: older
+        hub._flush()
+        hub._flush()  # nothing new: nothing sent
+        return [queue.get_nowait()["succeeded"] for _ in range(queue.qsize())]
+
+    assert run(scenario) == [3]
+
+
+def test_slow_watcher_only_keeps_the_latest_snapshot():
+    async def scenario(hub):
+        queue = hub.watch("j1")
+        for done in (1, 2, 3):
+            hub.ingest(snapshot("j1", done))
+            hub._flush()
+        return queue.qsize(), queue.get_nowait()["succeeded"]
+
+    assert run(scenario) == (1, 3)
+
+
+def test_every_watcher_of_a_job_is_fed():
+    async def scenario(hub):
+        first, second = hub.watch("j1"), hub.watch("j1")
+        hub.ingest(snapshot("j1", 4, failed=1))
+        hub._flush()
+        return first.get_nowait(), second.get_nowait()
+
+    first, second = run(scenario)
+    assert first == second == snapshot("j1", 4, failed=1)
+
+
+def test_unwatch_forgets_the_job_once_the_last_watcher_leaves():
+    async def scenario(hub):
+        first, second = hub.watch("j1"), hub.watch("j1")
+        hub.ingest(snapshot("j1", 1))
+        hub.unwatch("j1", first)
+        kept = "j1" in hub._latest
+        hub.unwatch("j1", second)
+        hub.unwatch("j1", second)  # twice is harmless
+        hub.ingest(snapshot("j1", 2))
+        return kept, hub._latest, hub._dirty
+
+    assert run(scenario) == (True, {}, set())
+
+
+def test_ingest_threadsafe_delivers_on_the_hub_loop():
+    async def scenario(hub):
+        queue = hub.watch("j1")
+        worker = threading.Thread(target=hub.ingest_threadsafe, args=(snapshot("j1", 5),))
+        worker.start()
+        worker.join()
+        await asyncio.sleep(0)  # let the loop run the scheduled ingest
+        hub._flush()
+        return queue.get_nowait()["succeeded"]
+
+    assert run(scenario) == 5
+
+
+def test_flush_loop_pushes_on_its_interval():
+    async def main():
+        hub = ProgressHub(interval=0.01)
+        try:
+            queue = hub.watch("j1")
+            hub.ingest(snapshot("j1", 7))
+            return await asyncio.wait_for(queue.get(), timeout=1)
+        finally:
+            await hub.stop()
+
+    assert asyncio.run(main())["succeeded"] == 7
+
+
+def test_sse_event_format():
+    assert sse_event({"a": 1}) == 'event: progress\ndata: {"a": 1}\n\n'
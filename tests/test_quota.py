@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from app.core.auth import VALID_API_KEYS
+from app.core.limiter import quota_identity
+from app.core.quota import InMemoryQuotaBackend, QuotaDecision, QuotaLimiter
+
+
+def hits(limiter, identity, n):
+    async def run():
+        return [await limiter.hit(identity) for _ in range(n)]
+
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def make_limiter(clock):
+    def make(strategy, limit=3, window=60):
+        return QuotaLimiter(InMemoryQuotaBackend(), limit=limit, window=window, strategy=strategy)
+
+    return make
+
+
+def test_unknown_strategy_rejected():
+    with pytest.raises(ValueError):
+        QuotaLimiter(InMemoryQuotaBackend(), limit=1, window=1, strategy="leaky")
+
+
+@pytest.mark.parametrize("strategy", ["fixed_window", "sliding_window", "gcra"])
+def test_limit_then_reject(make_limiter, strategy):
+    limiter = make_limiter(strategy)
+    decisions = hits(limiter, "alice", 4)
+    assert [d.allowed for d in decisions] == [True, True, True, False]
+    assert decisions[-1].retry_after > 0
+    # Identities are counted separately
+    assert hits(limiter, "bob", 1)[0].allowed
+
+
+def test_fixed_window_resets_at_boundary(make_limiter, clock):
+    limiter = make_limiter("fixed_window")
+    hits(limiter, "alice", 4)
+    clock.advance(60)
+    assert hits(limiter, "alice", 1)[0] == QuotaDecision(True, 2, 0.0)
+
+
+def test_sliding_window_weights_previous_window(make_limiter, clock):
+    limiter = make_limiter("sliding_window", limit=4)
+    clock.now = 600.0  # start of a window
+    assert all(d.allowed for d in hits(limiter, "alice", 4))
+    # Halfway into the next window the previous 4 still weigh 2
+    clock.advance(90)
+    limiter._blocked.clear()
+    assert [d.allowed for d in hits(limiter, "alice", 3)] == [True, True, False]
+
+
+def test_gcra_spreads_quota_evenly(make_limiter, clock):
+    limiter = make_limiter("gcra", limit=3, window=60)
+    hits(limiter, "alice", 4)
+    limiter._blocked.clear()
+    # One emission interval (window / limit) frees exactly one request
+    clock.advance(20)
+    assert [d.allowed for d in hits(limiter, "alice", 2)] == [True, False]
+
+
+def test_rejections_cached_locally(make_limiter, clock):
+    limiter = make_limiter("fixed_window")
+    rejected = hits(limiter, "alice", 4)[-1]
+    assert limiter.blocked_for("alice") == pytest.approx(rejected.retry_after)
+    clock.advance(rejected.retry_after)
+    assert limiter.blocked_for("alice") is None
+
+
+def test_local_cache_is_bounded(clock):
+    limiter = QuotaLimiter(InMemoryQuotaBackend(), limit=1, window=60, local_cache_size=2)
+    for identity in ("a", "b", "c"):
+        hits(limiter, identity, 2)
+    assert list(limiter._blocked) == ["b", "c"]
+
+
+def test_retry_after_header_rounds_up():
+    assert QuotaLimiter.retry_after_header(QuotaDecision(False, 0, 0.2)) == "1"
+    assert QuotaLimiter.retry_after_header(QuotaDecision(False, 0, 2.1)) == "3"
+
+
+@pytest.mark.parametrize("strategy", ["fixed_window", "sliding_window"])
+def test_rejected_requests_are_not_counted(make_limiter, clock, strategy):
+    limiter = make_limiter(strategy, limit=4)
+    clock.now = 600.0  # start of a window
+    hits(limiter, "alice", 4)
+    for _ in range(10):
+        limiter._blocked.clear()  # bypass the local cache: every retry reaches the backend
+        assert not hits(limiter, "alice", 1)[0].allowed
+    # Halfway into the next window only the 4 admitted requests weigh (2 for sliding_window)
+    clock.advance(90)
+    limiter._blocked.clear()
+    expected = 4 if strategy == "fixed_window" else 2
+    assert sum(d.allowed for d in hits(limiter, "alice", 5)) == expected
+
+
+def _request(headers):
+    return Request({
+        "type": "http", "method": "GET", "path": "/", "query_string": b"",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        "client": ("10.0.0.7", 1234),
+    })
+
+
+def test_quota_identity_hashes_known_api_keys():
+    key = sorted(VALID_API_KEYS)[0]
+    identity = quota_identity(_request({"X-API-Key": key}))
+    assert identity.startswith("key:") and key not in identity
+
+
+def test_quota_identity_ignores_unknown_api_keys():
+    assert quota_identity(_request({"X-API-Key": "made-up-1"})) == "ip:10.0.0.7"
+    assert quota_identity(_request({"X-API-Key": "made-up-2"})) == "ip:10.0.0.7"
@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.core.idempotency import guard
+from app.core.states import TaskStatus
+from app.db.models.task import Task
+from app.db.repositories.job_repo import JobRepo
+from app.db.repositories.task_repo import TaskRepo
+from app.services.dispatch_service import DispatchService
+from app.workers.worker_tasks import reap_stuck_tasks
+
+LONG_AGO = datetime.utcnow() - timedelta(days=1)
+
+
+@pytest.fixture
+def published(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        DispatchService, "publish", staticmethod(lambda task_ids, queue=None: calls.append((queue, sorted(task_ids))))
+    )
+    return calls
+
+
+@pytest.fixture
+def task_ids(db, make_instances):
+    job = JobRepo.create(db, "key:a", 4, commit=False, priority="high")
+    return [ref.id for ref in TaskRepo.bulk_create(db, job.id, make_instances(4))]
+
+
+def set_tasks(db, ids, **values):
+    db.execute(update(Task).where(Task.id.in_(ids)).values(**values))
+    db.commit()
+
+
+def statuses(db, ids):
+    db.expire_all()
+    return [db.get(Task, task_id).status for task_id in ids]
+
+
+def test_pending_tasks_are_left_to_the_scheduler(db, task_ids, published, monkeypatch):
+    set_tasks(db, task_ids, created_at=LONG_AGO, updated_at=None)
+    monkeypatch.setattr(settings, "SCHEDULER_ENABLED", True)
+
+    assert reap_stuck_tasks.run() == {"requeued": 0, "failed": 0}
+    assert published == []
+    assert statuses(db, task_ids) == [TaskStatus.PENDING] * 4
+
+
+def test_pending_tasks_are_published_without_a_scheduler(db, task_ids, published, monkeypatch):
+    set_tasks(db, task_ids, created_at=LONG_AGO, updated_at=None)
+    monkeypatch.setattr(settings, "SCHEDULER_ENABLED", False)
+
+    assert reap_stuck_tasks.run()["requeued"] == 4
+    assert published == [("ecs-high", sorted(task_ids))]
+    assert statuses(db, task_ids) == [TaskStatus.QUEUED] * 4
+    assert all(db.get(Task, task_id).published_at for task_id in task_ids)
+
+
+def test_published_queued_tasks_are_never_republished(db, task_ids, published, monkeypatch):
+    monkeypatch.setattr(settings, "SCHEDULER_ENABLED", True)
+    never, already = task_ids[:2], task_ids[2:]
+    set_tasks(db, never, status=TaskStatus.QUEUED, updated_at=LONG_AGO, published_at=None)
+    set_tasks(db, already, status=TaskStatus.QUEUED, updated_at=LONG_AGO, published_at=LONG_AGO)
+
+    assert reap_stuck_tasks.run()["requeued"] == 2
+    assert published == [("ecs-high", sorted(never))]
+
+
+def test_abandoned_running_and_retrying_tasks_are_requeued_or_failed(db, task_ids, published, monkeypatch):
+    monkeypatch.setattr(settings, "SCHEDULER_ENABLED", True)
+    running, retrying, exhausted, recent = task_ids
+    set_tasks(db, [running], status=TaskStatus.RUNNING, attempts=1, updated_at=LONG_AGO)
+    set_tasks(db, [retrying], status=TaskStatus.RETRYING, attempts=2, updated_at=LONG_AGO)
+    set_tasks(db, [exhausted], status=TaskStatus.RETRYING, attempts=settings.TASK_MAX_RETRIES + 1, updated_at=LONG_AGO)
+    set_tasks(db, [recent], status=TaskStatus.RETRYING, attempts=1, updated_at=datetime.utcnow())
+
+    assert reap_stuck_tasks.run() == {"requeued": 2, "failed": 1}
+    assert published == [("ecs-high", sorted([running, retrying]))]
+    assert statuses(db, task_ids) == [TaskStatus.QUEUED, TaskStatus.QUEUED, TaskStatus.FAILED, TaskStatus.RETRYING]
+
+
+def test_tasks_whose_claim_is_still_held_are_left_to_their_worker(db, task_ids, published, monkeypatch):
+    monkeypatch.setattr(settings, "SCHEDULER_ENABLED", True)
+    set_tasks(db, task_ids, status=TaskStatus.RUNNING, attempts=1, updated_at=LONG_AGO)
+    live, *lapsed = task_ids
+    key = db.get(Task, live).idempotency_key
+    assert guard.claim(key, "celery-1")
+    try:
+        assert reap_stuck_tasks.run() == {"requeued": 3, "failed": 0}
+        assert published == [("ecs-high", sorted(lapsed))]
+        assert statuses(db, task_ids) == [TaskStatus.RUNNING] + [TaskStatus.QUEUED] * 3
+        assert guard.is_claimed(key)
+    finally:
+        guard.release(key)
+
+
+def test_failed_publish_hands_tasks_back_to_pending(db, task_ids, monkeypatch):
+    monkeypatch.setattr(settings, "SCHEDULER_ENABLED", True)
+    set_tasks(db, task_ids, status=TaskStatus.RUNNING, attempts=1, updated_at=LONG_AGO)
+
+    def broker_down(task_ids, queue=None):
+        raise ConnectionError("broker down")
+
+    monkeypatch.setattr(DispatchService, "publish", staticmethod(broker_down))
+    with pytest.raises(ConnectionError):
+        reap_stuck_tasks.run()
+    assert statuses(db, task_ids) == [TaskStatus.PENDING] * 4
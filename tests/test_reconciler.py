@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app.adapters.cloud_adapter_factory import CloudAdapterFactory
+from app.adapters.fake_adapter import FakeCloudAdapter
+from app.core.states import CloudState, JobStatus, TaskStatus
+from app.db.models.job import Job
+from app.db.models.task import Task
+from app.db.repositories.job_repo import JobRepo
+from app.db.repositories.task_repo import TaskRepo
+from app.workers.reconciler import InstanceReconciler, classify
+
+
+class ScriptedAdapter(FakeCloudAdapter):
+    """Answers describe calls from a fixed {instance_id: state} map (absent ids are missing)"""
+    max_describe_per_call = 2
+
+    def __init__(self, states, fail=False):
+        super().__init__("r1", call_latency_ms=0, instance_latency_ms=0)
+        self.states, self.fail, self.described = states, fail, []
+
+    def _describe(self, instance_ids):
+        self.described.append(list(instance_ids))
+        if self.fail:
+            raise ConnectionError("describe failed")
+        return {i: self.states[i] for i in instance_ids if i in self.states}
+
+
+class RecordingCache:
+    def __init__(self):
+        self.summaries = {}
+
+    def put_many(self, summaries):
+        self.summaries.update(summaries)
+
+
+@pytest.fixture
+def launched(db, make_instances):
+    """A job whose 4 tasks succeeded and launched i-0..i-3, ten minutes ago"""
+    job = JobRepo.create(db, "key:a", 4, commit=False)
+    ids = [ref.id for ref in TaskRepo.bulk_create(db, job.id, make_instances(4))]
+    for n, task_id in enumerate(ids):
+        db.execute(update(Task).where(Task.id == task_id).values(
+            status=TaskStatus.SUCCESS, cloud_state=CloudState.PENDING, cloud_instance_id=f"i-{n}",
+            updated_at=datetime.utcnow() - timedelta(minutes=10),
+        ))
+    db.execute(update(Job).where(Job.id == job.id).values(succeeded=4, status=JobStatus.SUCCESS))
+    db.commit()
+    return job.id, ids
+
+
+def run(monkeypatch, adapter, **kwargs):
+    monkeypatch.setattr(CloudAdapterFactory, "get", classmethod(lambda cls, cloud, region: adapter))
+    cache = RecordingCache()
+    reconciler = InstanceReconciler(pending_timeout=3600, missing_grace=60, cache=cache, **kwargs)
+    return reconciler.run_once(), cache
+
+
+def tasks(db, ids):
+    db.expire_all()
+    return [db.get(Task, task_id) for task_id in ids]
+
+
+def test_classify():
+    assert classify(CloudState.RUNNING, 5, 300, 60) == (CloudState.RUNNING, None)
+    assert classify(None, 9999, 300, 60) == (CloudState.PENDING, None)
+    assert classify(CloudState.MISSING, 30, 300, 60) == (CloudState.PENDING, None)
+    assert classify(CloudState.MISSING, 60, 300, 60)[1] == "Instance not found at the provider"
+    assert classify(CloudState.PENDING, 300, 300, 60)[1] == "Instance still pending 300s after launch"
+    assert classify(CloudState.TERMINATED, 0, 300, 60)[1] is not None
+
+
+def test_states_are_stored_and_dead_instances_fail_their_task(db, launched, monkeypatch):
+    job_id, ids = launched
+    adapter = ScriptedAdapter({"i-0": CloudState.RUNNING, "i-1": CloudState.TERMINATED, "i-2": CloudState.PENDING})
+
+    result, cache = run(monkeypatch, adapter)
+
+    assert result == {CloudState.RUNNING: 1, CloudState.TERMINATED: 1, CloudState.PENDING: 1, CloudState.MISSING: 1, "failed": 2}
+    assert sorted(map(len, adapter.described)) == [2, 2]  # batched, max_describe_per_call ids each
+    rows = tasks(db, ids)
+    assert [row.cloud_state for row in rows] == [
+        CloudState.RUNNING, CloudState.TERMINATED, CloudState.PENDING, CloudState.MISSING,
+    ]
+    assert [row.status for row in rows] == [TaskStatus.SUCCESS, TaskStatus.FAILED, TaskStatus.SUCCESS, TaskStatus.FAILED]
+    assert all(row.reconciled_at for row in rows)
+    job = db.get(Job, job_id)
+    assert (job.succeeded, job.failed, job.status) == (2, 2, JobStatus.PARTIAL)
+    assert cache.summaries[job_id] == {CloudState.RUNNING: 1, CloudState.TERMINATED: 1, CloudState.PENDING: 1, CloudState.MISSING: 1}
+
+
+def test_failed_describe_leaves_instances_pending(db, launched, monkeypatch):
+    job_id, ids = launched
+
+    result, _ = run(monkeypatch, ScriptedAdapter({}, fail=True))
+
+    assert result == {CloudState.PENDING: 4, "failed": 0}
+    assert [row.status for row in tasks(db, ids)] == [TaskStatus.SUCCESS] * 4
+    assert db.get(Job, job_id).failed == 0
+
+
+def test_each_instance_is_checked_once_per_run(db, launched, monkeypatch):
+    _, ids = launched
+    adapter = ScriptedAdapter({f"i-{n}": CloudState.PENDING for n in range(4)})
+
+    result, _ = run(monkeypatch, adapter, batch_size=3)
+
+    assert result == {CloudState.PENDING: 4, "failed": 0}
+    assert sorted(i for call in adapter.described for i in call) == ["i-0", "i-1", "i-2", "i-3"]
@@ -0,0 +1,40 @@
+import pytest
+
+from app.core.resilience import CLOSED, HALF_OPEN, CircuitBreaker, InMemoryResilienceBackend
+from app.errors import CircuitOpenError
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker(InMemoryResilienceBackend(), threshold=2, window=60, open_for=10, probes=1)
+
+
+def open_circuit(breaker, clock):
+    for _ in range(2):
+        breaker.record("fake", "r1", False, CLOSED)
+    clock.advance(10)
+
+
+def test_released_probe_can_be_handed_out_again(breaker, clock):
+    open_circuit(breaker, clock)
+    assert breaker.before_call("fake", "r1") == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call("fake", "r1")
+
+    breaker.release("fake", "r1", HALF_OPEN)
+    assert breaker.before_call("fake", "r1") == HALF_OPEN
+
+
+def test_release_never_exceeds_the_probe_count(breaker, clock):
+    open_circuit(breaker, clock)
+    breaker.before_call("fake", "r1")
+    breaker.release("fake", "r1", HALF_OPEN)
+    breaker.release("fake", "r1", HALF_OPEN)
+    breaker.before_call("fake", "r1")
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call("fake", "r1")
+
+
+def test_release_in_closed_state_is_a_no_op(breaker):
+    breaker.release("fake", "r1", CLOSED)
+    assert breaker.before_call("fake", "r1") == CLOSED
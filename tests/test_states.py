@@ -0,0 +1,45 @@
+from app.core.states import (
+    TASK_TRANSITIONS,
+    TERMINAL_TASK_STATES,
+    TaskStatus,
+    sources_for,
+)
+
+
+def test_terminal_states_have_no_way_out():
+    for status in TERMINAL_TASK_STATES:
+        assert TASK_TRANSITIONS[status] == frozenset()
+        assert all(status not in sources_for(target) for target in TASK_TRANSITIONS)
+
+
+def test_sources_for_inverts_transitions():
+    for target in TASK_TRANSITIONS:
+        for source, targets in TASK_TRANSITIONS.items():
+            assert (source in sources_for(target)) == (target in targets)
+
+
+def test_success_only_from_running():
+    assert sources_for(TaskStatus.SUCCESS) == {TaskStatus.RUNNING}
+
+
+def test_failed_reachable_from_every_live_state():
+    assert sources_for(TaskStatus.FAILED) == {
+        TaskStatus.PENDING, TaskStatus.QUEUED, TaskStatus.RUNNING, TaskStatus.RETRYING,
+    }
+
+
+def test_running_claimable_after_publish_or_retry():
+    # RUNNING -> RUNNING lets the claim owner resume after a worker crash
+    assert sources_for(TaskStatus.RUNNING) == {
+        TaskStatus.PENDING, TaskStatus.QUEUED, TaskStatus.RUNNING, TaskStatus.RETRYING,
+    }
+
+
+def test_requeue_sources():
+    # The reaper requeues RUNNING tasks; retries are republished from RETRYING
+    assert sources_for(TaskStatus.QUEUED) == {TaskStatus.PENDING, TaskStatus.RUNNING, TaskStatus.RETRYING}
+
+
+def test_only_unpublished_tasks_go_back_to_pending():
+    # A failed publish hands QUEUED tasks back; nothing that reached a worker returns
+    assert sources_for(TaskStatus.PENDING) == {TaskStatus.QUEUED}
@@ -0,0 +1,64 @@
+import pytest
+
+from app.core.config import settings
+from app.db.repositories.job_repo import JobRepo
+from app.db.repositories.task_repo import TaskRepo
+from app.services import submission_queue
+from app.services.job_service import JobService
+from app.services.submission_queue import InMemorySubmissionLog, encode_submission
+from app.workers.submission_consumer import SubmissionConsumer
+
+
+@pytest.fixture
+def consumer(db, no_dispatch, monkeypatch):
+    monkeypatch.setattr(settings, "KAFKA_CONSUMER_RETRY_SECONDS", 0)
+    monkeypatch.setattr(settings, "KAFKA_MAX_DELIVERY_ATTEMPTS", 2)
+    return SubmissionConsumer(InMemorySubmissionLog())
+
+
+def send(run_async, consumer, batch_id, instances):
+    run_async(consumer.consumer.send(batch_id, encode_submission(batch_id, instances, submitter="key:a")))
+
+
+def test_submissions_are_persisted_and_committed(run_async, consumer, make_instances):
+    send(run_async, consumer, "b1", make_instances(3))
+    [(job_id, batch_id, created)] = run_async(consumer.run_once())
+    assert (batch_id, created) == ("b1", True)
+    assert consumer.consumer.lag == 0
+
+
+def test_poison_submission_is_dead_lettered_after_max_attempts(run_async, consumer, make_instances, monkeypatch):
+    dead_letters = submission_queue.memory_log.other_topics.setdefault(settings.KAFKA_DEAD_LETTER_TOPIC, [])
+    dead_letters.clear()
+    persist = JobService.create_jobs_bulk_async
+
+    async def failing(db, submissions):
+        if any(s["batch_id"] == "poison" for s in submissions):
+            raise ValueError("cannot persist")
+        return await persist(db, submissions)
+
+    monkeypatch.setattr(JobService, "create_jobs_bulk_async", staticmethod(failing))
+    send(run_async, consumer, "poison", make_instances(1))
+    send(run_async, consumer, "good", make_instances(1))
+
+    assert run_async(consumer.run_once()) == []
+    assert run_async(consumer.run_once()) == []
+    assert consumer.consumer.lag == 2
+
+    [(_, batch_id, created)] = run_async(consumer.run_once())
+    assert (batch_id, created) == ("good", True)
+    assert consumer.consumer.lag == 0
+    assert [record.key for record in dead_letters] == ["poison"]
+    assert "cannot persist" in dead_letters[0].value["error"]
+
+
+def test_backlog_counts_pending_tasks_when_the_scheduler_releases_them(run_async, db, monkeypatch, make_instances):
+    job = JobRepo.create(db, "key:a", 5, commit=False)
+    TaskRepo.bulk_create(db, job.id, make_instances(5), commit=True)
+    monkeypatch.setattr(settings, "KAFKA_MAX_PENDING_DISPATCH", 3)
+
+    monkeypatch.setattr(settings, "SCHEDULER_ENABLED", True)
+    assert run_async(SubmissionConsumer.dispatch_backlog()) == 4  # counted up to limit + 1
+
+    monkeypatch.setattr(settings, "SCHEDULER_ENABLED", False)
+    assert run_async(SubmissionConsumer.dispatch_backlog()) == 0
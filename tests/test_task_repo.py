@@ -0,0 +1,282 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects import postgresql
+
+from app.core import progress
+from app.core.states import CloudState, JobPriority, JobStatus, TaskStatus
+from app.db.models.job import Job
+from app.db.models.launch_template import LaunchTemplate
+from app.db.models.task import Task
+from app.db.repositories.job_repo import JobRepo
+from app.db.repositories.task_repo import AsyncTaskRepo, TaskOutcome, TaskRef, TaskRepo
+from app.db.session import AsyncSessionLocal
+
+
+def new_job(db, total=0, **kwargs):
+    return JobRepo.create(db, "key:a", total, commit=False, **kwargs)
+
+
+def job_with_tasks(db, make_instances, n, status=TaskStatus.RUNNING, **kwargs):
+    job = new_job(db, n, **kwargs)
+    ids = [ref.id for ref in TaskRepo.bulk_create(db, job.id, make_instances(n), commit=False)]
+    db.execute(update(Task).where(Task.id.in_(ids)).values(status=status))
+    db.commit()
+    return job.id, ids
+
+
+def set_tasks(db, ids, **values):
+    db.execute(update(Task).where(Task.id.in_(ids)).values(**values))
+    db.commit()
+
+
+def counters(db, job_id):
+    db.expire_all()
+    job = db.get(Job, job_id)
+    return job.succeeded, job.failed, job.status
+
+
+def tasks_of(db, job_id):
+    db.expire_all()
+    return db.execute(select(Task).where(Task.job_id == job_id).order_by(Task.index)).scalars().all()
+
+
+def test_bulk_create_inserts_every_chunk(db, make_instances):
+    job = new_job(db, 5)
+    refs = TaskRepo.bulk_create(db, job.id, make_instances(5), start_index=10, chunk_size=2)
+
+    assert [ref.index for ref in refs] == [10, 11, 12, 13, 14]
+    assert all(isinstance(ref, TaskRef) for ref in refs)
+    rows = tasks_of(db, job.id)
+    assert [(row.id, row.index) for row in rows] == [(ref.id, ref.index) for ref in refs]
+    assert {row.status for row in rows} == {TaskStatus.PENDING}
+
+
+def test_bulk_create_stores_shared_fields_once_as_a_template(db, make_instances):
+    job = new_job(db, 4)
+    TaskRepo.bulk_create(db, job.id, make_instances(3) + make_instances(1, prefix="db", instance_type="m5.large"))
+
+    rows = tasks_of(db, job.id)
+    assert db.execute(select(func.count()).select_from(LaunchTemplate)).scalar_one() == 2
+    assert len({row.template_id for row in rows[:3]}) == 1 and rows[3].template_id != rows[0].template_id
+    assert rows[0].params == {"instance_name": "web-0"}  # only the per-task delta
+
+
+def test_bulk_create_keys_rows_by_submitter_and_batch(db, make_instances):
+    job = new_job(db, 2, batch_id="b1")
+    TaskRepo.bulk_create(db, job.id, make_instances(2), batch_id="b1", submitter="key:a")
+    other = new_job(db, 1)
+    TaskRepo.bulk_create(db, other.id, make_instances(1))
+
+    assert [row.idempotency_key for row in tasks_of(db, job.id)] == ["key:a:b1:0", "key:a:b1:1"]
+    assert [row.idempotency_key for row in tasks_of(db, other.id)] == [f"{other.id}:0"]
+
+
+def test_bulk_create_leaves_the_transaction_open_without_commit(db, make_instances):
+    job = new_job(db, 2)
+    TaskRepo.bulk_create(db, job.id, make_instances(2), commit=False)
+    db.rollback()
+
+    assert tasks_of(db, job.id) == []
+
+
+def test_async_bulk_create_writes_the_same_rows(db, run_async, make_instances):
+    job = new_job(db, 3)
+    db.commit()
+
+    async def run():
+        async with AsyncSessionLocal() as session:
+            return await AsyncTaskRepo.bulk_create(session, job.id, make_instances(3), chunk_size=2)
+
+    refs = run_async(run())
+    rows = tasks_of(db, job.id)
+    assert [row.id for row in rows] == [ref.id for ref in refs]
+    assert rows[2].params == {"instance_name": "web-2"}
+
+
+@pytest.fixture
+def published(monkeypatch):
+    snapshots = []
+    monkeypatch.setattr(progress, "publish_progress", snapshots.extend)
+    return snapshots
+
+
+def test_finished_tasks_move_the_job_counters_and_status(db, make_instances, published):
+    job_id, ids = job_with_tasks(db, make_instances, 3)
+
+    assert TaskRepo.mark_success(db, ids[0], "i-1")
+    assert counters(db, job_id) == (1, 0, JobStatus.RUNNING)
+    assert TaskRepo.mark_failed(db, ids[1], "bad params")
+    assert TaskRepo.mark_success(db, ids[2], "i-3")
+    assert counters(db, job_id) == (2, 1, JobStatus.PARTIAL)
+
+
+def test_redelivered_result_is_counted_once(db, make_instances, published):
+    job_id, ids = job_with_tasks(db, make_instances, 1)
+
+    assert TaskRepo.mark_success(db, ids[0], "i-1")
+    assert not TaskRepo.mark_success(db, ids[0], "i-1")
+    assert not TaskRepo.mark_failed(db, ids[0], "late failure")
+    assert counters(db, job_id) == (1, 0, JobStatus.SUCCESS)
+
+
+def test_receiving_job_keeps_its_status_until_sealed(db, make_instances, published):
+    job_id, ids = job_with_tasks(db, make_instances, 1)
+    db.execute(update(Job).where(Job.id == job_id).values(status=JobStatus.RECEIVING))
+    db.commit()
+
+    TaskRepo.mark_success(db, ids[0], "i-1")
+    assert counters(db, job_id) == (1, 0, JobStatus.RECEIVING)
+
+
+def test_progress_is_published_only_after_commit(db, make_instances, published):
+    job_id, ids = job_with_tasks(db, make_instances, 2)
+
+    TaskRepo._bump_job(db, job_id, failed=1)
+    assert published == []
+    db.rollback()
+    db.commit()
+    assert published == []
+
+    TaskRepo._bump_job(db, job_id, succeeded=2)
+    db.commit()
+    assert published == [{"job_id": job_id, "total": 2, "succeeded": 2, "failed": 0, "status": JobStatus.SUCCESS}]
+
+
+class PostgresSession:
+    """Just enough of a Session for finish_many's PostgreSQL branch: records statements"""
+
+    def __init__(self, finished):
+        self.finished, self.statements, self.info = finished, [], {}
+
+    def get_bind(self):
+        return SimpleNamespace(dialect=postgresql.psycopg2.dialect())
+
+    def execute(self, statement):
+        self.statements.append(statement)
+        rows = self.finished if len(self.statements) == 1 else []
+
+        class Result:
+            def all(self):
+                return rows
+
+            def first(self):
+                return rows[0] if rows else None
+
+        return Result()
+
+    def commit(self):
+        pass
+
+
+def test_finish_many_per_row_path_guards_each_task(db, make_instances, published):
+    job_id, ids = job_with_tasks(db, make_instances, 4)
+    other_id, other_ids = job_with_tasks(db, make_instances, 1)
+    TaskRepo.mark_success(db, ids[3], "i-4")
+
+    finished = TaskRepo.finish_many(db, [
+        TaskOutcome(ids[0], TaskStatus.SUCCESS, "i-1", None),
+        TaskOutcome(ids[1], TaskStatus.FAILED, None, "bad params"),
+        TaskOutcome(ids[3], TaskStatus.FAILED, None, "redelivered"),  # already SUCCESS: left alone
+        TaskOutcome(other_ids[0], TaskStatus.SUCCESS, "i-9", None),
+    ])
+
+    assert finished == 3
+    rows = tasks_of(db, job_id)
+    assert [row.status for row in rows] == [TaskStatus.SUCCESS, TaskStatus.FAILED, TaskStatus.RUNNING, TaskStatus.SUCCESS]
+    assert (rows[0].cloud_instance_id, rows[0].cloud_state) == ("i-1", CloudState.PENDING)
+    assert (rows[1].last_error, rows[1].cloud_state) == ("bad params", None)
+    assert counters(db, job_id) == (2, 1, JobStatus.RUNNING)
+    assert counters(db, other_id) == (1, 0, JobStatus.SUCCESS)
+    assert TaskRepo.finish_many(db, []) == 0
+
+
+def test_finish_many_values_path_is_one_guarded_update():
+    session = PostgresSession([("j1", TaskStatus.SUCCESS), ("j1", TaskStatus.FAILED), ("j2", TaskStatus.SUCCESS)])
+
+    finished = TaskRepo.finish_many(session, [
+        TaskOutcome("t1", TaskStatus.SUCCESS, "i-1", None),
+        TaskOutcome("t2", TaskStatus.FAILED, None, "bad params"),
+        TaskOutcome("t3", TaskStatus.SUCCESS, "i-3", None),
+    ])
+
+    assert finished == 3
+    tasks_update, *job_updates = session.statements
+    sql = str(tasks_update.compile(dialect=postgresql.psycopg2.dialect()))
+    assert "FROM (VALUES" in sql and "RETURNING tasks.job_id, tasks.status" in sql
+    assert sql.count("tasks.status IN") == 2  # one guard per outcome status
+    assert len(job_updates) == 2  # one counter UPDATE per job
+
+
+def test_transition_many_moves_only_allowed_sources(db, make_instances):
+    job_id, ids = job_with_tasks(db, make_instances, 3, status=TaskStatus.QUEUED)
+    set_tasks(db, ids[2:], status=TaskStatus.SUCCESS)
+
+    moved = TaskRepo.transition_many(db, ids, TaskStatus.RUNNING, count_attempt=True)
+
+    assert sorted(moved) == sorted((task_id, job_id) for task_id in ids[:2])
+    rows = tasks_of(db, job_id)
+    assert [row.status for row in rows] == [TaskStatus.RUNNING, TaskStatus.RUNNING, TaskStatus.SUCCESS]
+    assert [row.attempts for row in rows[:2]] == [1, 1]
+    assert all(row.updated_at for row in rows[:2])
+    assert TaskRepo.transition_many(db, [], TaskStatus.RUNNING) == []
+
+
+def test_transition_many_sets_extra_values(db, make_instances):
+    job_id, ids = job_with_tasks(db, make_instances, 1)
+
+    TaskRepo.transition_many(db, ids, TaskStatus.RETRYING, last_error="throttled")
+    assert tasks_of(db, job_id)[0].last_error == "throttled"
+
+
+def test_find_stuck_picks_each_abandoned_state_past_its_cutoff(db, make_instances):
+    now = datetime.utcnow()
+    old, older, recent = now - timedelta(minutes=20), now - timedelta(hours=1), now - timedelta(minutes=1)
+    _, ids = job_with_tasks(db, make_instances, 8, priority=JobPriority.HIGH)
+    running, retrying, unpublished, published, pending, fresh_running, fresh_retrying, oldest = ids
+    set_tasks(db, [running], status=TaskStatus.RUNNING, updated_at=old)
+    set_tasks(db, [retrying], status=TaskStatus.RETRYING, updated_at=older)
+    set_tasks(db, [unpublished], status=TaskStatus.QUEUED, updated_at=older, published_at=None)
+    set_tasks(db, [published], status=TaskStatus.QUEUED, updated_at=older, published_at=older)
+    set_tasks(db, [pending], status=TaskStatus.PENDING, created_at=older, updated_at=None)
+    set_tasks(db, [fresh_running], status=TaskStatus.RUNNING, updated_at=recent)
+    set_tasks(db, [fresh_retrying], status=TaskStatus.RETRYING, updated_at=old)  # past running, not retrying cutoff
+    set_tasks(db, [oldest], status=TaskStatus.RUNNING, updated_at=now - timedelta(days=1))
+    cutoffs = (now - timedelta(minutes=15), now - timedelta(minutes=30), now - timedelta(minutes=30))
+
+    stuck = TaskRepo.find_stuck(db, *cutoffs, limit=10)
+    assert [row.id for row in stuck][0] == oldest  # oldest first
+    assert {row.id for row in stuck} == {running, retrying, unpublished, oldest}
+    assert {row.priority for row in stuck} == {JobPriority.HIGH}
+
+    with_pending = TaskRepo.find_stuck(db, *cutoffs, limit=10, include_pending=True)
+    assert {row.id for row in with_pending} == {running, retrying, unpublished, oldest, pending}
+    assert len(TaskRepo.find_stuck(db, *cutoffs, limit=2)) == 2
+
+
+def test_fail_unlaunched_moves_counts_from_succeeded_to_failed(db, make_instances, published):
+    job_id, ids = job_with_tasks(db, make_instances, 4, status=TaskStatus.SUCCESS)
+    set_tasks(db, ids, cloud_state=CloudState.PENDING)
+    set_tasks(db, ids[3:], cloud_state=CloudState.RUNNING)  # confirmed meanwhile: left alone
+    db.execute(update(Job).where(Job.id == job_id).values(succeeded=4, status=JobStatus.SUCCESS))
+    db.commit()
+    checked_at = datetime.utcnow()
+
+    failed = TaskRepo.fail_unlaunched(db, [
+        (ids[0], CloudState.TERMINATED, "Instance terminated before reaching running"),
+        (ids[1], CloudState.TERMINATED, "Instance terminated before reaching running"),
+        (ids[2], CloudState.MISSING, "Instance not found at the provider"),
+        (ids[3], CloudState.MISSING, "Instance not found at the provider"),
+    ], checked_at)
+
+    assert failed == {job_id: 3}
+    rows = tasks_of(db, job_id)
+    assert [row.status for row in rows] == [TaskStatus.FAILED] * 3 + [TaskStatus.SUCCESS]
+    assert [row.cloud_state for row in rows] == [
+        CloudState.TERMINATED, CloudState.TERMINATED, CloudState.MISSING, CloudState.RUNNING,
+    ]
+    assert rows[2].last_error == "Instance not found at the provider" and rows[0].reconciled_at == checked_at
+    assert counters(db, job_id) == (1, 3, JobStatus.PARTIAL)
+    assert TaskRepo.fail_unlaunched(db, [(ids[0], CloudState.TERMINATED, "again")], checked_at) == {}
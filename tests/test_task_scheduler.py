@@ -0,0 +1,58 @@
+from app.workers import task_scheduler
+from app.workers.task_scheduler import TaskScheduler, fair_share, plan_release
+
+
+def test_fair_share_splits_by_weight():
+    assert fair_share(60, {"high": (4.0, 100), "normal": (2.0, 100)}) == {"high": 40, "normal": 20}
+
+
+def test_fair_share_never_exceeds_caps():
+    shares = fair_share(100, {"a": (1.0, 5), "b": (1.0, 7)})
+    assert shares == {"a": 5, "b": 7}
+
+
+def test_fair_share_redistributes_what_capped_keys_cannot_use():
+    # "a" only wants 2 of its 5; the other 3 go to "b" and "c" equally
+    assert fair_share(15, {"a": (1.0, 2), "b": (1.0, 100), "c": (1.0, 100)}) == {"a": 2, "b": 7, "c": 6}
+
+
+def test_fair_share_rounding_leftovers_go_to_earliest_keys():
+    shares = fair_share(10, {"a": (1.0, 100), "b": (1.0, 100), "c": (1.0, 100)})
+    assert shares == {"a": 4, "b": 3, "c": 3}
+    assert sum(shares.values()) == 10
+
+
+def test_fair_share_ignores_zero_weight_and_zero_cap():
+    assert fair_share(10, {"a": (0.0, 5), "b": (1.0, 0), "c": (1.0, 3)}) == {"a": 0, "b": 0, "c": 3}
+
+
+def test_plan_release_respects_per_job_cap():
+    pending_jobs = [
+        ("big", "t1", "normal", None, 1000),
+        ("small", "t2", "normal", None, 3),
+    ]
+    release = plan_release(100, pending_jobs, in_flight={"big": 45}, weights={"normal": 1.0}, job_cap=50)
+    assert release == {"big": 5, "small": 3}
+
+
+def test_tick_returns_tasks_to_pending_when_publish_fails(monkeypatch):
+    pending_jobs = [("j1", "t1", "high", None, 2), ("j2", "t2", "low", None, 1)]
+    pending = {"j1": ["a", "b"], "j2": ["c"]}
+    unmarked = []
+    repo = task_scheduler.TaskRepo
+    monkeypatch.setattr(repo, "in_flight_by_job", staticmethod(lambda db: {}))
+    monkeypatch.setattr(repo, "pending_by_job", staticmethod(lambda db: pending_jobs))
+    monkeypatch.setattr(repo, "pending_ids", staticmethod(lambda db, job_id, count: pending[job_id][:count]))
+    monkeypatch.setattr(repo, "mark_queued", staticmethod(lambda db, job_id, ids: [(i, job_id) for i in ids]))
+    monkeypatch.setattr(repo, "unmark_queued", staticmethod(lambda db, ids: unmarked.extend(ids)))
+    monkeypatch.setattr(repo, "mark_published", staticmethod(lambda db, ids: None))
+
+    def publish(task_ids, queue=None):
+        if queue == "ecs-high":
+            raise ConnectionError("broker down")
+
+    monkeypatch.setattr(task_scheduler.DispatchService, "publish", staticmethod(publish))
+    scheduler = TaskScheduler(window=10, job_cap=10, weights={"high": 4.0, "low": 1.0}, interval=0)
+
+    assert scheduler.tick(db=None) == {"j2": 1}
+    assert unmarked == ["a", "b"]
@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event
+
+from app.db.models.task import Task
+from app.db.repositories.job_repo import JobRepo
+from app.db.repositories.task_repo import TaskRepo
+from app.db.repositories.template_repo import TEMPLATE_FIELDS, split_params, template_id_for
+from app.db.session import engine
+from app.services.template_service import TemplateResolver
+
+
+@pytest.fixture
+def queries():
+    """Count SELECTs on launch_templates while the test runs"""
+    seen = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and "launch_templates" in statement:
+            seen.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    yield seen
+    event.remove(engine, "before_cursor_execute", count)
+
+
+def stored_tasks(db, *batches):
+    job = JobRepo.create(db, "key:a", 0, commit=False)
+    instances = [inst for batch in batches for inst in batch]
+    refs = TaskRepo.bulk_create(db, job.id, instances)
+    return [db.get(Task, ref.id) for ref in refs], instances
+
+
+def test_split_params_keeps_shared_fields_in_the_template():
+    template, delta = split_params({"region": "r1", "instance_name": "web-0", "login_password": None})
+    assert set(template) == set(TEMPLATE_FIELDS) and template["region"] == "r1"
+    assert delta == {"instance_name": "web-0"}
+    assert template_id_for(template) == template_id_for(dict(reversed(list(template.items()))))
+
+
+def test_resolve_many_rebuilds_full_params(db, make_instances, queries):
+    tasks, instances = stored_tasks(db, make_instances(2), make_instances(1, prefix="db", instance_type="m5.large"))
+    resolver = TemplateResolver(maxsize=8)
+
+    resolved = resolver.resolve_many(db, tasks)
+
+    for params, inst in zip(resolved, instances):
+        # Template fields are kept as given (None included); None-valued deltas are dropped
+        assert params == {k: v for k, v in inst.dict().items() if k in TEMPLATE_FIELDS or v is not None}
+    assert resolved[2]["instance_type"] == "m5.large"
+    assert len(queries) == 1  # both templates in one IN query
+
+
+def test_templates_are_cached_per_process(db, make_instances, queries):
+    tasks, _ = stored_tasks(db, make_instances(2))
+    resolver = TemplateResolver(maxsize=8)
+
+    first = resolver.resolve(db, tasks[0])
+    assert resolver.resolve(db, tasks[1])["region"] == first["region"]
+    assert len(queries) == 1
+    resolver.clear()
+    resolver.resolve(db, tasks[0])
+    assert len(queries) == 2
+
+
+def test_cache_evicts_least_recently_used(db, make_instances, queries):
+    tasks, _ = stored_tasks(db, make_instances(1, prefix="a", instance_type="t3.small"), make_instances(1, prefix="b"))
+    resolver = TemplateResolver(maxsize=1)
+
+    resolver.resolve(db, tasks[0])
+    resolver.resolve(db, tasks[1])
+    resolver.resolve(db, tasks[0])
+    assert len(queries) == 3
+
+
+def test_legacy_tasks_without_template_carry_full_params(db):
+    legacy = SimpleNamespace(template_id=None, params={"region": "r1", "instance_name": "old"})
+    assert TemplateResolver(maxsize=8).resolve(db, legacy) == legacy.params
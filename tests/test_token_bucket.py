@@ -0,0 +1,92 @@
+import pytest
+
+from app.core.token_bucket import InMemoryTokenBucketBackend, TokenBucketLimiter
+
+
+@pytest.fixture
+def limiter(clock):
+    return TokenBucketLimiter(InMemoryTokenBucketBackend(), rate=10, capacity=5, overrides={"aws": 20, "aws:eu-west-1": 5})
+
+
+def test_burst_up_to_capacity_then_wait(limiter):
+    for _ in range(5):
+        assert limiter.try_acquire("t1", "fake", "r1") == 0.0
+    assert limiter.try_acquire("t1", "fake", "r1") == pytest.approx(0.1)
+
+
+def test_refill_at_rate(limiter, clock):
+    for _ in range(5):
+        limiter.try_acquire("t1", "fake", "r1")
+    clock.advance(0.25)
+    assert limiter.try_acquire("t1", "fake", "r1", n=2) == 0.0
+    assert limiter.try_acquire("t1", "fake", "r1") == pytest.approx(0.05)
+
+
+def test_refill_capped_at_capacity(limiter, clock):
+    clock.advance(3600)
+    assert limiter.try_acquire("t1", "fake", "r1", n=5) == 0.0
+    assert limiter.try_acquire("t1", "fake", "r1") > 0
+
+
+def test_buckets_are_per_tenant_and_region(limiter):
+    limiter.try_acquire("t1", "fake", "r1", n=5)
+    assert limiter.try_acquire("t2", "fake", "r1", n=5) == 0.0
+    assert limiter.try_acquire("t1", "fake", "r2", n=5) == 0.0
+
+
+def test_overrides_scale_burst(limiter):
+    # Region override wins over cloud override; burst stays proportional to the rate
+    assert limiter.limits_for("aws", "eu-west-1") == (5, 2)
+    assert limiter.limits_for("aws", "us-east-1") == (20, 10)
+    assert limiter.limits_for("fake", "r1") == (10, 5)
+
+
+def test_request_larger_than_capacity_rejected(limiter):
+    with pytest.raises(ValueError):
+        limiter.try_acquire("t1", "fake", "r1", n=6)
+
+
+def test_acquire_times_out_instead_of_sleeping(limiter):
+    limiter.try_acquire("t1", "fake", "r1", n=5)
+    with pytest.raises(TimeoutError):
+        limiter.acquire("t1", "fake", "r1", n=5, timeout=0.1)
+
+
+def test_acquire_sleeps_until_refilled(limiter, clock, monkeypatch):
+    monkeypatch.setattr("app.core.token_bucket.time.sleep", clock.sleep)
+    limiter.try_acquire("t1", "fake", "r1", n=5)
+    assert limiter.acquire("t1", "fake", "r1", n=3) == pytest.approx(0.3, abs=1e-5)
+
+
+def test_acquire_many_splits_into_capacity_sized_rounds(limiter, clock, monkeypatch):
+    monkeypatch.setattr("app.core.token_bucket.time.sleep", clock.sleep)
+    # 12 tokens from an empty-start bucket of 5 at 10/s: 5 now, then 7 more at 10/s
+    assert limiter.acquire_many("t1", "fake", "r1", n=12) == pytest.approx(0.7, abs=1e-5)
+
+
+def test_acquire_many_takes_available_tokens_before_waiting(limiter, clock, monkeypatch):
+    seen_by_others = []
+
+    def sleep(seconds):
+        # Another worker calling while the batch waits: the 3 leftover tokens are already taken
+        seen_by_others.append(limiter.try_acquire("t2" if seen_by_others else "t1", "fake", "r1"))
+        clock.sleep(seconds)
+
+    monkeypatch.setattr("app.core.token_bucket.time.sleep", sleep)
+    limiter.try_acquire("t1", "fake", "r1", n=2)
+    limiter.acquire_many("t1", "fake", "r1", n=8)
+    assert seen_by_others[0] > 0
+
+
+def test_try_take_grants_partial(limiter):
+    backend = limiter.backend
+    assert backend.try_take("k", 3, 10, 5) == (3, 0.0)
+    granted, wait = backend.try_take("k", 4, 10, 5)
+    # 2 left now; the other 2 accrue in 0.2s
+    assert granted == 2 and wait == pytest.approx(0.2)
+
+
+def test_acquire_many_timeout_bounds_the_whole_batch(limiter):
+    # 5 tokens now, the next 5 would take 0.5s
+    with pytest.raises(TimeoutError):
+        limiter.acquire_many("t1", "fake", "r1", n=12, timeout=0.4)
@@ -0,0 +1,47 @@
+import asyncio
+
+from app.services.validation_cache import (
+    REDACTED, InMemoryValidationBackend, ValidationCache, _key, content_token, redact,
+)
+
+ROWS = [
+    {"instance_name": "web-1", "login_password": "S3cret!pass"},
+    {"instance_name": "web-2", "login_password": None},
+]
+
+
+def make_cache():
+    return ValidationCache(InMemoryValidationBackend(), ttl=60, local_size=4)
+
+
+def test_token_is_scoped_to_the_submitter():
+    data = b"instance_name\nweb-1\n"
+    assert content_token(data, "key:a") == content_token(data, "key:a")
+    assert content_token(data, "key:a") != content_token(data, "key:b")
+
+
+def test_entry_is_a_miss_for_another_submitter():
+    cache = make_cache()
+
+    async def run():
+        await cache.put("tok", "key:a", "csv", 2, ROWS)
+        return await cache.get("tok", "key:a"), await cache.get("tok", "key:b")
+
+    mine, theirs = asyncio.run(run())
+    assert mine.instances == ROWS
+    assert theirs is None
+
+
+def test_stored_payload_does_not_contain_secrets():
+    cache = make_cache()
+    asyncio.run(cache.put("tok", "key:a", "csv", 2, ROWS))
+    blob = asyncio.run(cache.backend.get(_key("tok")))
+    assert b"S3cret" not in blob and b"web-1" not in blob
+
+
+def test_redact_masks_only_set_secrets():
+    assert redact(ROWS) == [
+        {"instance_name": "web-1", "login_password": REDACTED},
+        {"instance_name": "web-2", "login_password": None},
+    ]
+    assert ROWS[0]["login_password"] == "S3cret!pass"
@@ -0,0 +1,38 @@
+import pandas as pd
+
+from app.services.ingest_service import normalize_frame
+from app.services.validation_service import validate_frame
+
+
+def frame(**overrides):
+    row = {
+        "instance_name": "web-1",
+        "instance_type": "t3.medium",
+        "region": "cn-north-1",
+        "image_id": "ami-0c55b159cbfafe1f0",
+        "subnet_id": "subnet-0123456789abcdef0",
+        "security_group_ids": "sg-0123456789abcdef0",
+        "login_password": " secret ",
+    }
+    row.update(overrides)
+    return normalize_frame(pd.DataFrame([row], dtype=str))
+
+
+def test_models_get_the_stripped_values_that_were_checked():
+    result = validate_frame(frame(instance_name=" web-1 ", region=" cn-north-1 ", key_name=" ops "))
+    assert result.errors == []
+    instance = result.instances[0]
+    assert (instance.instance_name, instance.region, instance.key_name) == ("web-1", "cn-north-1", "ops")
+    # Passwords are kept verbatim
+    assert instance.login_password == " secret "
+
+
+def test_duplicates_compared_after_stripping():
+    seen = {"web-1"}
+    result = validate_frame(frame(instance_name="web-1 "), seen)
+    assert [error["field"] for error in result.errors] == ["instance_name"]
+
+
+def test_whitespace_only_is_blank():
+    result = validate_frame(frame(instance_type="   "))
+    assert result.errors == [{"row": 2, "field": "instance_type", "error": "Field required"}]
@@ -0,0 +1,131 @@
+import pytest
+from celery.exceptions import Retry
+from sqlalchemy import update
+
+from app.adapters.base import CreateResult
+from app.adapters.cloud_adapter_factory import CloudAdapterFactory
+from app.core.resilience import HALF_OPEN
+from app.core.states import TaskStatus
+from app.db.models.task import Task
+from app.db.repositories.job_repo import JobRepo
+from app.db.repositories.task_repo import TaskRepo
+from app.workers import worker_tasks
+from app.workers.worker_tasks import create_instance, create_instances_batch
+
+
+class RecordingBreaker:
+    """Always lets a half-open probe through and records what happened to it"""
+
+    def __init__(self):
+        self.calls = []
+
+    def before_call(self, cloud, region):
+        return HALF_OPEN
+
+    def record(self, cloud, region, ok, state=HALF_OPEN):
+        self.calls.append(("record", ok))
+
+    def release(self, cloud, region, state):
+        self.calls.append(("release", None))
+
+
+class BrokenAdapter:
+    def create_instance(self, params):
+        raise ValueError("unexpected response")
+
+    def create_instances(self, members):
+        raise ValueError("unexpected response")
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    recording = RecordingBreaker()
+    monkeypatch.setattr(worker_tasks, "breaker", recording)
+    return recording
+
+
+@pytest.fixture
+def retries(monkeypatch):
+    """Celery retries requested by the tasks (returned as Retry, which the task raises)"""
+    calls = []
+
+    def retry(task):
+        def record(**kwargs):
+            calls.append(kwargs)
+            return Retry()
+        return record
+
+    monkeypatch.setattr(create_instance, "retry", retry(create_instance))
+    monkeypatch.setattr(create_instances_batch, "retry", retry(create_instances_batch))
+    return calls
+
+
+@pytest.fixture
+def task_ids(db, make_instances):
+    job = JobRepo.create(db, "key:a", 2, commit=False)
+    ids = [ref.id for ref in TaskRepo.bulk_create(db, job.id, make_instances(2))]
+    db.execute(update(Task).where(Task.id.in_(ids)).values(status=TaskStatus.QUEUED))
+    db.commit()
+    return ids
+
+
+def statuses(db, ids):
+    db.expire_all()
+    return [db.get(Task, task_id).status for task_id in ids]
+
+
+def test_limiter_failure_hands_the_probe_back_and_retries(db, task_ids, breaker, retries, monkeypatch):
+    def limiter_down(*args, **kwargs):
+        raise ConnectionError("limiter unavailable")
+
+    monkeypatch.setattr(worker_tasks.limiter, "acquire", limiter_down)
+    with pytest.raises(Retry):
+        create_instance.run(task_ids[0])
+
+    assert breaker.calls == [("release", None)]
+    assert statuses(db, task_ids[:1]) == [TaskStatus.RETRYING]
+    assert isinstance(retries[0]["exc"], ConnectionError)
+
+
+def test_unexpected_adapter_error_counts_against_the_circuit_and_retries(db, task_ids, breaker, retries, monkeypatch):
+    monkeypatch.setattr(CloudAdapterFactory, "get", classmethod(lambda cls, cloud, region: BrokenAdapter()))
+    with pytest.raises(Retry):
+        create_instance.run(task_ids[0])
+
+    assert breaker.calls == [("record", False)]
+    assert statuses(db, task_ids[:1]) == [TaskStatus.RETRYING]
+
+
+def test_success_records_the_probe_once(db, task_ids, breaker, retries, monkeypatch):
+    class Adapter:
+        def create_instance(self, params):
+            return "i-1"
+
+    monkeypatch.setattr(CloudAdapterFactory, "get", classmethod(lambda cls, cloud, region: Adapter()))
+    create_instance.run(task_ids[0])
+
+    assert breaker.calls == [("record", True)]
+    assert statuses(db, task_ids[:1]) == [TaskStatus.SUCCESS]
+    assert retries == []
+
+
+def test_batch_provider_error_retries_every_started_task(db, task_ids, breaker, retries, monkeypatch):
+    monkeypatch.setattr(CloudAdapterFactory, "get", classmethod(lambda cls, cloud, region: BrokenAdapter()))
+    with pytest.raises(Retry):
+        create_instances_batch.run(task_ids)
+
+    assert breaker.calls == [("record", False)]
+    assert statuses(db, task_ids) == [TaskStatus.RETRYING] * 2
+    assert sorted(retries[0]["args"][0]) == sorted(task_ids)
+
+
+def test_batch_limiter_error_hands_the_probe_back(db, task_ids, breaker, retries, monkeypatch):
+    def limiter_down(*args, **kwargs):
+        raise ConnectionError("limiter unavailable")
+
+    monkeypatch.setattr(worker_tasks.limiter, "acquire_many", limiter_down)
+    with pytest.raises(Retry):
+        create_instances_batch.run(task_ids)
+
+    assert breaker.calls == [("release", None)]
+    assert statuses(db, task_ids) == [TaskStatus.RETRYING] * 2